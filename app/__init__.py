@@ -6,8 +6,11 @@ import os
 from flask import Flask, send_from_directory
 from flask_cors import CORS
 from app.models.database import setup_db, ensure_test_data
-from app.config.settings import DEBUG, PORT, HOST
+from app.config.settings import DEBUG, PORT, HOST, ASSETS_ENABLED, DB_READ_MODE
 from app.api.routes import api_bp
+from app.api.admission import register_admission
+from app.services.assets import asset_url, build_assets
+from app.commands import register_commands
 
 
 def create_app(test_config=None):
@@ -44,6 +47,21 @@ def create_app(test_config=None):
     # Register blueprints
     app.register_blueprint(api_bp)
     
+    # Link templates to fingerprinted assets, building them if needed
+    app.jinja_env.globals["asset_url"] = asset_url
+    if ASSETS_ENABLED:
+        try:
+            build_assets()
+        except Exception as e:
+            # Pages then link the raw files under /static
+            logger.error(f"Error building static assets: {str(e)}")
+    
+    # Rate-limit clients and cap concurrent expensive requests
+    register_admission(app)
+    
+    # Register CLI commands
+    register_commands(app)
+    
     # Add CORS headers to all responses
     @app.after_request
     def after_request(response):
@@ -53,8 +71,39 @@ def create_app(test_config=None):
         response.headers.add('Access-Control-Allow-Methods', 'GET,PUT,POST,DELETE,OPTIONS')
         return response
     
-    # Ensure database is set up and has test data
-    setup_db()
-    ensure_test_data()
+    # Ensure database is set up and has test data. Replica-mode workers leave
+    # both to the writer process, so starting them never takes the write lock
+    if DB_READ_MODE != "replica":
+        setup_db()
+        ensure_test_data()
+    
+    return app
+
+
+def create_asgi_app(test_config=None):
+    """
+    Create an ASGI application for async serving.
+    
+    Read endpoints are served by async handlers; every other route falls
+    through to the Flask app, so both modes expose the same API. Admission
+    control runs once, in front of both.
     
-    return app
\ No newline at end of file
+    Args:
+        test_config: Configuration to use for testing.
+        
+    Returns:
+        Starlette application instance
+    """
+    from a2wsgi import WSGIMiddleware
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.routing import Mount
+    from app.api.admission import AdmissionMiddleware
+    from app.api.async_routes import routes
+    
+    flask_app = create_app(test_config)
+    flask_app.config["ADMISSION_CONTROL"] = False
+    return Starlette(
+        routes=routes + [Mount("/", app=WSGIMiddleware(flask_app))],
+        middleware=[Middleware(AdmissionMiddleware)]
+    )
@@ -0,0 +1,273 @@
+"""
+Admission control for the API.
+
+Every request passes two checks before a handler runs:
+
+1. Rate: each client address has a token bucket (ADMISSION_RATE tokens per
+   second, bursts up to ADMISSION_BURST). A request spends its endpoint's
+   cost, so an expensive call uses up more of the budget than a listing.
+   Once the bucket is empty the client gets 429 with a Retry-After.
+2. Capacity: endpoints with a `concurrency` in ENDPOINT_POLICIES run at most
+   that many requests at once. A few more may wait for a slot, each for at
+   most `queue_timeout` seconds. Anything beyond that gets 503 at once and
+   never ties up a worker.
+
+Cheap reads keep their workers and database threads because expensive
+endpoints can never hold more than their share. Their latency stays flat
+when one client floods the API or a traffic spike hits the model-backed
+endpoints.
+
+The Flask app installs the checks as request hooks (register_admission). In
+ASGI mode, AdmissionMiddleware wraps the whole app, including the Flask
+fallthrough, and the Flask hooks stand down.
+
+Buckets and gates are kept in memory, so each worker process enforces the
+limits on its own share of the traffic.
+"""
+import asyncio
+import fnmatch
+import math
+import threading
+import time
+from collections import OrderedDict
+
+import orjson
+from flask import g, jsonify, request
+
+from app.config.settings import (
+    ADMISSION_ENABLED,
+    ADMISSION_RATE,
+    ADMISSION_BURST,
+    ADMISSION_MAX_CLIENTS,
+    ADMISSION_TRUST_PROXY,
+    ENDPOINT_POLICIES
+)
+
+RATE_LIMITED = "Too many requests, slow down"
+OVERLOADED = "Server busy, try again shortly"
+
+
+class ClientBuckets:
+    """Token buckets keyed by client, least recently seen dropped first past `max_clients`."""
+
+    def __init__(self, rate=ADMISSION_RATE, burst=ADMISSION_BURST, max_clients=ADMISSION_MAX_CLIENTS):
+        self.rate = rate
+        self.burst = burst
+        self.max_clients = max_clients
+        self._buckets = OrderedDict()
+        self._lock = threading.Lock()
+
+    def take(self, client, cost=1, now=None):
+        """
+        Spend `cost` tokens from a client's bucket.
+
+        Returns:
+            float: 0 if the request is admitted, else seconds until it would be
+        """
+        now = time.monotonic() if now is None else now
+        cost = min(cost, self.burst)
+        with self._lock:
+            tokens, updated = self._buckets.pop(client, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - updated) * self.rate)
+            if tokens >= cost:
+                tokens -= cost
+                wait = 0.0
+            else:
+                wait = (cost - tokens) / self.rate
+            self._buckets[client] = (tokens, now)
+            if len(self._buckets) > self.max_clients:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+class Gate:
+    """Concurrency limit with a bounded, time-limited wait queue, for threaded workers."""
+
+    def __init__(self, concurrency, queue=0, queue_timeout=0.0):
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(concurrency)
+        self._waiting = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot, waiting only if the queue has room; False if none came free in time."""
+        if self._slots.acquire(blocking=False):
+            return True
+        with self._lock:
+            if self._waiting >= self.queue:
+                return False
+            self._waiting += 1
+        try:
+            return self._slots.acquire(timeout=self.queue_timeout)
+        finally:
+            with self._lock:
+                self._waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+
+class AsyncGate:
+    """Gate for the event loop: waiting requests hold no thread."""
+
+    def __init__(self, concurrency, queue=0, queue_timeout=0.0):
+        self.queue = queue
+        self.queue_timeout = queue_timeout
+        self._slots = asyncio.Semaphore(concurrency)
+        self._waiting = 0
+
+    async def acquire(self):
+        if not self._slots.locked():
+            await self._slots.acquire()
+            return True
+        if self._waiting >= self.queue:
+            return False
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self._waiting -= 1
+
+    def release(self):
+        self._slots.release()
+
+
+class AdmissionController:
+    """Per-client rate limits and per-endpoint capacity limits for one app."""
+
+    def __init__(self, policies=ENDPOINT_POLICIES, buckets=None):
+        self.policies = policies
+        self.buckets = buckets or ClientBuckets()
+        self._gates = {}
+        self._lock = threading.Lock()
+
+    def policy(self, path):
+        """(pattern, policy) of the endpoint a path belongs to; ("", {}) if it has none."""
+        if path in self.policies:
+            return path, self.policies[path]
+        for pattern, policy in self.policies.items():
+            if "*" in pattern and fnmatch.fnmatchcase(path, pattern):
+                return pattern, policy
+        return "", {}
+
+    def retry_after(self, client, path):
+        """0 if the client may make this request now, else seconds to wait."""
+        cost = self.policy(path)[1].get("cost", 1)
+        return self.buckets.take(client, cost) if cost else 0.0
+
+    def gate(self, path, gate_type=Gate):
+        """The path's endpoint gate, or None if the endpoint has no concurrency limit."""
+        pattern, policy = self.policy(path)
+        if "concurrency" not in policy:
+            return None
+        key = (pattern, gate_type)
+        with self._lock:
+            if key not in self._gates:
+                self._gates[key] = gate_type(policy["concurrency"], policy.get("queue", 0),
+                                             policy.get("queue_timeout", 0.0))
+            return self._gates[key]
+
+
+def client_address(remote_addr, forwarded_for=None):
+    """The address requests are limited by: the proxy-reported client if trusted, else the peer."""
+    if ADMISSION_TRUST_PROXY and forwarded_for:
+        return forwarded_for.split(",")[-1].strip()
+    return remote_addr or "unknown"
+
+
+def register_admission(app, controller=None):
+    """
+    Install admission control on a Flask app as request hooks.
+
+    The controller is kept in app.extensions["admission"]. Set
+    app.config["ADMISSION_CONTROL"] = False to turn it off, as the ASGI app
+    does when AdmissionMiddleware already governs every request.
+    """
+    app.extensions["admission"] = controller or AdmissionController()
+
+    @app.before_request
+    def admit_request():
+        if not app.config.get("ADMISSION_CONTROL", ADMISSION_ENABLED):
+            return None
+        controller = app.extensions["admission"]
+        client = client_address(request.remote_addr, request.headers.get("X-Forwarded-For"))
+        wait = controller.retry_after(client, request.path)
+        if wait:
+            response = jsonify({"error": RATE_LIMITED})
+            response.headers["Retry-After"] = str(math.ceil(wait))
+            return response, 429
+        gate = controller.gate(request.path)
+        if gate is not None:
+            if not gate.acquire():
+                response = jsonify({"error": OVERLOADED})
+                response.headers["Retry-After"] = "1"
+                return response, 503
+            g.admission_gate = gate
+        return None
+
+    @app.after_request
+    def hold_slot_until_sent(response):
+        # A streamed body is still being produced after the request context
+        # is torn down, so the slot is released once the server closes the response
+        gate = g.pop("admission_gate", None)
+        if gate is not None:
+            response.call_on_close(gate.release)
+        return response
+
+    @app.teardown_request
+    def release_slot(exc=None):
+        # Only reached with the slot still held if no response was produced
+        gate = g.pop("admission_gate", None)
+        if gate is not None:
+            gate.release()
+
+
+class AdmissionMiddleware:
+    """ASGI middleware applying admission control before any route runs."""
+
+    def __init__(self, app, controller=None):
+        self.app = app
+        self.controller = controller or AdmissionController()
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not ADMISSION_ENABLED:
+            return await self.app(scope, receive, send)
+
+        headers = dict(scope.get("headers") or [])
+        forwarded = headers.get(b"x-forwarded-for")
+        peer = scope.get("client")
+        client = client_address(peer[0] if peer else None, forwarded.decode("latin-1") if forwarded else None)
+        path = scope["path"]
+
+        wait = self.controller.retry_after(client, path)
+        if wait:
+            return await _refuse(send, 429, RATE_LIMITED, math.ceil(wait))
+        gate = self.controller.gate(path, AsyncGate)
+        if gate is None:
+            return await self.app(scope, receive, send)
+        if not await gate.acquire():
+            return await _refuse(send, 503, OVERLOADED, 1)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
+
+
+async def _refuse(send, status, message, retry_after):
+    """Send a JSON error response with a Retry-After header."""
+    body = orjson.dumps({"error": message})
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode()),
+            (b"retry-after", str(retry_after).encode()),
+            (b"access-control-allow-origin", b"*"),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
@@ -0,0 +1,395 @@
+"""
+Async read API for the Hacky News application.
+
+Serves the read-only endpoints from an event loop so idle keep-alive and
+/stream connections cost no worker. DuckDB calls run on a bounded thread
+pool; responses match the Flask routes exactly.
+"""
+import asyncio
+import logging
+import anyio
+from starlette.concurrency import iterate_in_threadpool
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import JSONResponse, Response, StreamingResponse
+from starlette.routing import Route
+
+from app.models.database import (
+    get_stories,
+    search_stories,
+    search_with_facets,
+    get_categories,
+    get_stats,
+    get_top_stories,
+    get_trending_stories,
+    get_domain_leaderboard,
+    get_author_leaderboard,
+    get_hourly_histogram,
+    get_autocomplete_suggestions
+)
+from app.services.broadcaster import broadcaster
+from app.services.feed import rank_feed, load_profile
+from app.services.export import export_format_error, export_stories, export_filters, export_headers
+from app.services.vectors import SEARCH_MODES, semantic_search, related_stories, load_matches
+from app.utils.formatters import (
+    FormatError,
+    ParameterError,
+    parse_format,
+    fetch_mode,
+    parse_flag,
+    parse_limit,
+    serialize_stories,
+    serialize_faceted_stories,
+    serialize_top_stories,
+    serialize_trending_stories,
+    serialize_related_stories,
+    serialize_feed,
+    format_categories,
+    format_suggestions,
+    format_leaderboard,
+    format_histogram
+)
+from app.config.settings import (
+    DEFAULT_DISPLAY_LIMIT,
+    TRENDING_WINDOW_HOURS,
+    LEADERBOARD_DAYS,
+    LEADERBOARD_MAX_DAYS,
+    HISTOGRAM_HOURS,
+    HISTOGRAM_MAX_HOURS,
+    STREAM_HEARTBEAT_SECONDS,
+    ASYNC_DB_THREADS,
+    RELATED_LIMIT
+)
+
+logger = logging.getLogger(__name__)
+
+# Caps how many DuckDB calls run at once, however many requests are waiting
+_db_limiter = None
+
+
+def db_limiter():
+    """The limiter shared by every DuckDB call, created on first use inside the event loop."""
+    global _db_limiter
+    if _db_limiter is None:
+        _db_limiter = anyio.CapacityLimiter(ASYNC_DB_THREADS)
+    return _db_limiter
+
+
+async def run_db(func, *args):
+    """Run a blocking database call on the bounded thread pool."""
+    return await anyio.to_thread.run_sync(func, *args, limiter=db_limiter())
+
+
+async def stream_db(iterator):
+    """
+    Stream a blocking iterator that reads from DuckDB, such as an export.
+
+    The stream holds one database slot until it ends, so a long export
+    counts against ASYNC_DB_THREADS for as long as its cursor is open. Each
+    item is produced on a worker thread.
+    """
+    async with db_limiter():
+        try:
+            async for item in iterate_in_threadpool(iterator):
+                yield item
+        finally:
+            # A client that disconnects mid-export leaves the generator suspended with its cursor open
+            await anyio.to_thread.run_sync(iterator.close)
+
+
+async def listing_response(request, query, serializer):
+    """
+    Serve a story listing in the requested `format`.
+
+    Args:
+        query: Async callable taking the DuckDB fetch mode and the collapse_duplicates flag; returns the stories
+        serializer: One of the serialize_* formatters
+    """
+    try:
+        fmt = parse_format(request.query_params.get('format'))
+    except FormatError as e:
+        return JSONResponse({"error": str(e)}, status_code=e.status)
+    collapse = parse_flag(request.query_params.get('collapse_duplicates', 'false'))
+    body, mimetype = serializer(await query(fetch_mode(fmt), collapse), fmt)
+    return Response(body, media_type=mimetype)
+
+
+async def news(request):
+    """Fetch latest stories from DuckDB"""
+    try:
+        category = request.query_params.get('category')
+        limit = parse_limit(request.query_params.get('limit'), DEFAULT_DISPLAY_LIMIT)
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(get_stories, category, limit, fetch, collapse), serialize_stories
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in news: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def search(request):
+    """Search for stories by keyword, or by meaning with mode=semantic"""
+    try:
+        search_term = request.query_params.get('q', '')
+        category = request.query_params.get('category')
+        limit = parse_limit(request.query_params.get('limit'), 50)
+        mode = request.query_params.get('mode', 'keyword')
+        if mode not in SEARCH_MODES:
+            return JSONResponse({"error": f"Unsupported search mode: {mode}"}, status_code=400)
+
+        if not search_term.strip():
+            return JSONResponse({"error": "Search query is required"}, status_code=400)
+
+        facets = parse_flag(request.query_params.get('facets', 'false'))
+        if facets and mode == "semantic":
+            return JSONResponse({"error": "Facets are only available for keyword search"}, status_code=400)
+
+        if mode == "semantic":
+            async def semantic(fetch, collapse):
+                # Over-fetch so a category filter still leaves enough matches
+                matches = await run_db(semantic_search, search_term, limit * 4 if category else limit)
+                return await run_db(load_matches, matches, category, limit, fetch)
+
+            return await listing_response(request, semantic, serialize_related_stories)
+
+        if facets:
+            return await listing_response(
+                request,
+                lambda fetch, collapse: run_db(search_with_facets, search_term, category, limit, fetch, collapse),
+                serialize_faceted_stories
+            )
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(search_stories, search_term, category, limit, fetch, collapse),
+            serialize_stories
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in search: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def related(request):
+    """Get the stories closest in meaning to a story"""
+    try:
+        story_id = int(request.path_params['story_id'])
+    except ValueError:
+        return JSONResponse({"error": "Not found"}, status_code=404)
+    try:
+        limit = parse_limit(request.query_params.get('limit'), RELATED_LIMIT)
+        matches = await run_db(related_stories, story_id, limit)
+        if matches is None:
+            return JSONResponse({"error": f"Story {story_id} not found"}, status_code=404)
+
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(load_matches, matches, None, limit, fetch),
+            serialize_related_stories
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in related: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def feed(request):
+    """Get stories ranked for a user's profile (or by gravity alone without one)"""
+    try:
+        user_id = request.query_params.get('user')
+        limit = parse_limit(request.query_params.get('limit'), DEFAULT_DISPLAY_LIMIT)
+        profile = await run_db(load_profile, user_id) if user_id else None
+        # Ranked in memory, so the fetch mode doesn't apply
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(rank_feed, profile, limit), serialize_feed
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in feed: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def autocomplete(request):
+    """Get autocomplete suggestions based on title prefix"""
+    try:
+        prefix = request.query_params.get('q', '')
+        limit = parse_limit(request.query_params.get('limit'), 7)
+
+        if not prefix.strip():
+            return JSONResponse([])
+
+        collapse = parse_flag(request.query_params.get('collapse_duplicates', 'false'))
+        result = await run_db(get_autocomplete_suggestions, prefix, limit, collapse)
+        return JSONResponse(format_suggestions(result))
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in autocomplete: %s", str(e))
+        return JSONResponse([], status_code=500)
+
+
+async def categories(request):
+    """Get all available categories and their counts"""
+    try:
+        result = await run_db(get_categories)
+        return JSONResponse(format_categories(result))
+    except Exception as e:
+        logger.error("Error in categories: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def stats(request):
+    """Get basic stats about the database"""
+    try:
+        return JSONResponse(await run_db(get_stats))
+    except Exception as e:
+        logger.error("Error in stats: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def top_recent(request):
+    """Get top stories by points, sorted by most recent date"""
+    try:
+        limit = parse_limit(request.query_params.get('limit'), 15)
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(get_top_stories, "recent", limit, fetch, collapse),
+            serialize_top_stories
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in top_recent: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def top_alltime(request):
+    """Get top stories by points of all time"""
+    try:
+        limit = parse_limit(request.query_params.get('limit'), 15)
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(get_top_stories, "alltime", limit, fetch, collapse),
+            serialize_top_stories
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in top_alltime: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def trending(request):
+    """Get stories gaining points fastest over a recent window"""
+    try:
+        hours = float(request.query_params.get('hours', TRENDING_WINDOW_HOURS))
+        limit = parse_limit(request.query_params.get('limit'), 15)
+        return await listing_response(
+            request, lambda fetch, collapse: run_db(get_trending_stories, hours, limit, fetch),
+            serialize_trending_stories
+        )
+    except ParameterError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in trending: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def leaderboard_response(request, get_leaderboard, key):
+    """Serve a domain or author leaderboard read from the daily rollups"""
+    try:
+        days = parse_limit(request.query_params.get('days'), LEADERBOARD_DAYS, LEADERBOARD_MAX_DAYS)
+        limit = parse_limit(request.query_params.get('limit'), 20)
+        sort = request.query_params.get('sort', 'stories')
+        rows = await run_db(get_leaderboard, days, limit, sort)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    except Exception as e:
+        logger.error("Error in %s leaderboard: %s", key, str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+    return JSONResponse({"days": days, "sort": sort, f"{key}s": format_leaderboard(rows, key)})
+
+
+async def domains(request):
+    """Get the domains with the most stories, points or comments over recent days"""
+    return await leaderboard_response(request, get_domain_leaderboard, "domain")
+
+
+async def authors(request):
+    """Get the authors with the most stories, points or comments over recent days"""
+    return await leaderboard_response(request, get_author_leaderboard, "author")
+
+
+async def hourly(request):
+    """Get stories, points and comments posted in each recent hour"""
+    try:
+        hours = parse_limit(request.query_params.get('hours'), HISTOGRAM_HOURS, HISTOGRAM_MAX_HOURS)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+    try:
+        return JSONResponse(format_histogram(await run_db(get_hourly_histogram, hours)))
+    except Exception as e:
+        logger.error("Error in hourly: %s", str(e))
+        return JSONResponse({"error": str(e)}, status_code=500)
+
+
+async def export(request):
+    """Stream every story matching the filters as NDJSON, CSV or Parquet"""
+    fmt = request.query_params.get('format', 'ndjson')
+    error = export_format_error(fmt)
+    if error:
+        return JSONResponse({"error": error[0]}, status_code=error[1])
+    try:
+        filters = export_filters(request.query_params)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    return StreamingResponse(stream_db(export_stories(fmt, **filters)), headers=export_headers(fmt))
+
+
+async def stream(request):
+    """Push new and updated stories to the client as Server-Sent Events"""
+    async def events():
+        client = broadcaster.subscribe_async()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield await asyncio.wait_for(client.get(), timeout=STREAM_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(client)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+# Same CORS policy as the Flask app
+_cors = [Middleware(
+    CORSMiddleware,
+    allow_origins=["*"],
+    allow_methods=["GET", "PUT", "POST", "DELETE", "OPTIONS"],
+    allow_headers=["Content-Type", "Authorization"]
+)]
+
+routes = [
+    Route("/news", news, middleware=_cors),
+    Route("/search", search, middleware=_cors),
+    Route("/stories/{story_id}/related", related, middleware=_cors),
+    Route("/feed", feed, middleware=_cors),
+    Route("/autocomplete", autocomplete, middleware=_cors),
+    Route("/categories", categories, middleware=_cors),
+    Route("/stats", stats, middleware=_cors),
+    Route("/stats/top-recent", top_recent, middleware=_cors),
+    Route("/stats/top-alltime", top_alltime, middleware=_cors),
+    Route("/stats/trending", trending, middleware=_cors),
+    Route("/stats/domains", domains, middleware=_cors),
+    Route("/stats/authors", authors, middleware=_cors),
+    Route("/stats/hourly", hourly, middleware=_cors),
+    Route("/export", export, middleware=_cors),
+    Route("/stream", stream, middleware=_cors),
+]
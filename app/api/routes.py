@@ -1,22 +1,67 @@
 """
 API routes for the Hacky News application.
 """
+import gzip
+import hashlib
 import logging
+import mimetypes
+import queue
 import time
-from flask import Blueprint, jsonify, request, render_template
+from flask import Blueprint, Response, current_app, jsonify, request, render_template, send_from_directory
 from app.models.database import (
     get_stories,
     search_stories,
+    search_with_facets,
     get_categories,
     get_stats,
     get_top_stories,
+    get_trending_stories,
+    get_domain_leaderboard,
+    get_author_leaderboard,
+    get_hourly_histogram,
     get_autocomplete_suggestions,
     setup_db,
     ensure_test_data,
     execute_query
 )
-from app.services.classifier import sync_news
-from app.config.settings import DEFAULT_DISPLAY_LIMIT
+from app.services.ingest import sync_news
+from app.services.reclassifier import start_reclassification_job, get_job_status
+from app.services.broadcaster import broadcaster
+from app.services.feed import rank_feed, load_profile, normalize_profile, store_profile
+from app.services.export import export_format_error, export_stories, export_filters, export_headers
+from app.services.assets import find_asset, manifest_version
+from app.services.vectors import SEARCH_MODES, semantic_search, related_stories, load_matches
+from app.utils.formatters import (
+    FormatError,
+    ParameterError,
+    parse_format,
+    fetch_mode,
+    parse_flag,
+    parse_limit,
+    serialize_stories,
+    serialize_faceted_stories,
+    serialize_top_stories,
+    serialize_trending_stories,
+    serialize_related_stories,
+    serialize_feed,
+    format_categories,
+    format_suggestions,
+    format_leaderboard,
+    format_histogram
+)
+from app.config.settings import (
+    DEFAULT_DISPLAY_LIMIT,
+    TRENDING_WINDOW_HOURS,
+    LEADERBOARD_DAYS,
+    LEADERBOARD_MAX_DAYS,
+    HISTOGRAM_HOURS,
+    HISTOGRAM_MAX_HOURS,
+    STREAM_HEARTBEAT_SECONDS,
+    RELATED_LIMIT,
+    MAX_SYNC_LIMIT,
+    ASSET_DIR,
+    ASSET_MAX_AGE
+)
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -25,10 +70,72 @@ logger = logging.getLogger(__name__)
 api_bp = Blueprint('api', __name__)
 
 
+def listing_response(query, serializer):
+    """
+    Serve a story listing in the requested `format`.
+
+    Args:
+        query: Called with the DuckDB fetch mode and the collapse_duplicates flag; returns the stories
+        serializer: One of the serialize_* formatters
+    """
+    try:
+        fmt = parse_format(request.args.get('format'))
+    except FormatError as e:
+        return jsonify({"error": str(e)}), e.status
+    collapse = parse_flag(request.args.get('collapse_duplicates', 'false'))
+    body, mimetype = serializer(query(fetch_mode(fmt), collapse), fmt)
+    logger.debug("Returning %s bytes for %s", len(body), request.path)
+    return Response(body, mimetype=mimetype)
+
+
+# Rendered index page for the current asset build: (version, etag, body, gzipped body)
+_index_page = (None, None, b"", b"")
+
+
+def _render_index():
+    """The index page, rendered once per asset build rather than on every request."""
+    global _index_page
+    version = manifest_version()
+    if current_app.debug or version is None or _index_page[0] != version:
+        body = render_template('index.html').encode("utf-8")
+        etag = hashlib.sha256(body).hexdigest()[:16]
+        page = (version, etag, body, gzip.compress(body, 6, mtime=0))
+        if current_app.debug or version is None:
+            return page
+        _index_page = page
+    return _index_page
+
+
 @api_bp.route("/", methods=["GET"])
 def index():
     """Serve the index.html file"""
-    return render_template('index.html')
+    _, etag, body, compressed = _render_index()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    elif request.accept_encodings["gzip"]:
+        response = Response(compressed, mimetype="text/html")
+        response.headers["Content-Encoding"] = "gzip"
+    else:
+        response = Response(body, mimetype="text/html")
+    response.set_etag(etag)
+    # The page names the current asset build, so browsers revalidate it every time
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+@api_bp.route("/assets/<path:filename>", methods=["GET"])
+def asset(filename):
+    """Serve a fingerprinted static asset, precompressed when the client accepts it"""
+    name, encoding = find_asset(filename, lambda e: request.accept_encodings[e] > 0)
+    response = send_from_directory(ASSET_DIR, name, mimetype=mimetypes.guess_type(filename)[0],
+                                   max_age=ASSET_MAX_AGE)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    if encoding:
+        response.headers["Content-Encoding"] = encoding
+    response.vary.add("Accept-Encoding")
+    return response
 
 
 @api_bp.route("/debug", methods=["GET"])
@@ -72,33 +179,56 @@ def get_news():
     """Fetch latest stories from DuckDB"""
     try:
         category = request.args.get('category', None)
-        limit = int(request.args.get('limit', DEFAULT_DISPLAY_LIMIT))
+        limit = parse_limit(request.args.get('limit'), DEFAULT_DISPLAY_LIMIT)
         logger.debug("Getting news with category: %s, limit: %s", category, limit)
         
-        # Get stories from database
-        result = get_stories(category, limit)
-        
-        # Format response
-        news_list = [
-            {
-                "id": row[0],
-                "title": row[1],
-                "url": row[2],
-                "by": row[3],
-                "time": row[4],
-                "score": row[5],
-                "category": row[6]
-            }
-            for row in result
-        ]
-        
-        logger.debug("Returning %s news items", len(news_list))
-        return jsonify(news_list)
+        # Stories are fetched column-wise and serialized straight to response bytes
+        return listing_response(lambda fetch, collapse: get_stories(category, limit, fetch, collapse),
+                                serialize_stories)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error("Error in get_news: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
 
+@api_bp.route("/export", methods=["GET"])
+def export():
+    """Stream every story matching the filters as NDJSON, CSV or Parquet"""
+    fmt = request.args.get('format', 'ndjson')
+    error = export_format_error(fmt)
+    if error:
+        return jsonify({"error": error[0]}), error[1]
+    try:
+        filters = export_filters(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    return Response(export_stories(fmt, **filters), headers=export_headers(fmt))
+
+
+@api_bp.route("/stream", methods=["GET"])
+def stream():
+    """Push new and updated stories to the client as Server-Sent Events"""
+    def events():
+        client = broadcaster.subscribe()
+        try:
+            yield "retry: 5000\n\n"
+            while True:
+                try:
+                    yield client.get(timeout=STREAM_HEARTBEAT_SECONDS)
+                except queue.Empty:
+                    # Comment line keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        finally:
+            broadcaster.unsubscribe(client)
+    
+    return Response(events(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
 @api_bp.route("/categories", methods=["GET"])
 def get_all_categories():
     """Get all available categories and their counts"""
@@ -107,13 +237,7 @@ def get_all_categories():
         result = get_categories()
         
         # Format response
-        categories = [
-            {
-                "name": row[0] if row[0] else "Uncategorized",
-                "count": row[1]
-            }
-            for row in result
-        ]
+        categories = format_categories(result)
         
         logger.debug("Returning %s categories", len(categories))
         return jsonify(categories)
@@ -141,27 +265,11 @@ def get_top_recent_stories():
     """Get top stories by points, sorted by most recent date"""
     try:
         logger.debug("Getting top recent stories")
-        limit = int(request.args.get('limit', 15))
-        
-        # Get stories from database
-        stories = get_top_stories("recent", limit)
-        
-        # Format response
-        result = [
-            {
-                "id": story[0],
-                "title": story[1],
-                "url": story[2],
-                "by": story[3],
-                "score": story[4],
-                "time": story[5],
-                "category": story[6] if story[6] else "Uncategorized"
-            }
-            for story in stories
-        ]
-        
-        logger.debug("Returning %s recent top stories", len(result))
-        return jsonify(result)
+        limit = parse_limit(request.args.get('limit'), 15)
+        return listing_response(lambda fetch, collapse: get_top_stories("recent", limit, fetch, collapse),
+                                serialize_top_stories)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error("Error in get_top_recent: %s", str(e))
         return jsonify({"error": str(e)}), 500
@@ -172,32 +280,73 @@ def get_top_alltime_stories():
     """Get top stories by points of all time"""
     try:
         logger.debug("Getting all-time top stories")
-        limit = int(request.args.get('limit', 15))
-        
-        # Get stories from database
-        stories = get_top_stories("alltime", limit)
-        
-        # Format response
-        result = [
-            {
-                "id": story[0],
-                "title": story[1],
-                "url": story[2],
-                "by": story[3],
-                "score": story[4],
-                "time": story[5],
-                "category": story[6] if story[6] else "Uncategorized"
-            }
-            for story in stories
-        ]
-        
-        logger.debug("Returning %s all-time top stories", len(result))
-        return jsonify(result)
+        limit = parse_limit(request.args.get('limit'), 15)
+        return listing_response(lambda fetch, collapse: get_top_stories("alltime", limit, fetch, collapse),
+                                serialize_top_stories)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error("Error in get_top_alltime: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
 
+@api_bp.route("/stats/trending", methods=["GET"])
+def get_trending():
+    """Get stories gaining points fastest over a recent window"""
+    try:
+        logger.debug("Getting trending stories")
+        hours = float(request.args.get('hours', TRENDING_WINDOW_HOURS))
+        limit = parse_limit(request.args.get('limit'), 15)
+        return listing_response(lambda fetch, collapse: get_trending_stories(hours, limit, fetch),
+                                serialize_trending_stories)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error in get_trending: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+def _leaderboard_response(get_leaderboard, key):
+    """Serve a domain or author leaderboard read from the daily rollups"""
+    try:
+        days = parse_limit(request.args.get('days'), LEADERBOARD_DAYS, LEADERBOARD_MAX_DAYS)
+        limit = parse_limit(request.args.get('limit'), 20)
+        sort = request.args.get('sort', 'stories')
+        rows = get_leaderboard(days, limit, sort)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error in %s leaderboard: %s", key, str(e))
+        return jsonify({"error": str(e)}), 500
+    return jsonify({"days": days, "sort": sort, f"{key}s": format_leaderboard(rows, key)})
+
+
+@api_bp.route("/stats/domains", methods=["GET"])
+def get_domain_stats():
+    """Get the domains with the most stories, points or comments over recent days"""
+    return _leaderboard_response(get_domain_leaderboard, "domain")
+
+
+@api_bp.route("/stats/authors", methods=["GET"])
+def get_author_stats():
+    """Get the authors with the most stories, points or comments over recent days"""
+    return _leaderboard_response(get_author_leaderboard, "author")
+
+
+@api_bp.route("/stats/hourly", methods=["GET"])
+def get_hourly_stats():
+    """Get stories, points and comments posted in each recent hour"""
+    try:
+        hours = parse_limit(request.args.get('hours'), HISTOGRAM_HOURS, HISTOGRAM_MAX_HOURS)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        return jsonify(format_histogram(get_hourly_histogram(hours)))
+    except Exception as e:
+        logger.error("Error in get_hourly_stats: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
 @api_bp.route("/update", methods=["GET"])
 def update_news():
     """Update news data from Hacker News API"""
@@ -205,21 +354,54 @@ def update_news():
         # Ensure database is set up
         setup_db()
         
-        # Get limit parameter
-        limit = int(request.args.get('limit', 50))
+        # Get limit parameter, capped so one request can't trigger an unbounded sync
+        limit = parse_limit(request.args.get('limit'), 50, MAX_SYNC_LIMIT)
         
-        # Synchronize news
+        # Synchronize news, unless the scheduler (or another request) is already at it
         news_count = sync_news(limit)
+        if news_count is None:
+            return jsonify({
+                "status": "error",
+                "message": "An update is already running. Try again once it has finished."
+            }), 409
         
         return jsonify({
             "status": "success", 
             "message": f"Successfully updated news data. Processed {news_count} stories."
         })
+    except ParameterError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     except Exception as e:
         logger.error("Error updating news: %s", str(e))
         return jsonify({"status": "error", "message": str(e)}), 500
 
 
+@api_bp.route("/reclassify", methods=["GET"])
+def reclassify_news():
+    """Start reclassifying every stored story in the background"""
+    try:
+        dry_run = request.args.get('dry_run', 'false').lower() in ('1', 'true', 'yes')
+        resume = request.args.get('resume', 'true').lower() in ('1', 'true', 'yes')
+        use_model = request.args.get('rules_only', 'false').lower() not in ('1', 'true', 'yes')
+        
+        if not start_reclassification_job(dry_run=dry_run, resume=resume, use_model=use_model):
+            return jsonify({"status": "error", "message": "A reclassification job is already running."}), 409
+        
+        return jsonify({
+            "status": "started",
+            "message": "Reclassification started. Poll /reclassify/status for progress."
+        }), 202
+    except Exception as e:
+        logger.error("Error starting reclassification: %s", str(e))
+        return jsonify({"status": "error", "message": str(e)}), 500
+
+
+@api_bp.route("/reclassify/status", methods=["GET"])
+def reclassify_status():
+    """Get the progress of the current or last reclassification job"""
+    return jsonify(get_job_status())
+
+
 @api_bp.route("/test-data", methods=["GET"])
 def test_data():
     """Return test data for debugging"""
@@ -258,59 +440,131 @@ def test_data():
 
 @api_bp.route("/search", methods=["GET"])
 def search_news():
-    """Search for stories by keyword"""
+    """Search for stories by keyword, or by meaning with mode=semantic"""
     try:
         search_term = request.args.get('q', '')
         category = request.args.get('category', None)
-        limit = int(request.args.get('limit', 50))
+        limit = parse_limit(request.args.get('limit'), 50)
+        mode = request.args.get('mode', 'keyword')
+        if mode not in SEARCH_MODES:
+            return jsonify({"error": f"Unsupported search mode: {mode}"}), 400
         logger.debug("Searching for: '%s' in category: %s, limit: %s", search_term, category, limit)
         
         if not search_term.strip():
             return jsonify({"error": "Search query is required"}), 400
         
-        # Get stories from database
-        result = search_stories(search_term, category, limit)
+        facets = parse_flag(request.args.get('facets', 'false'))
+        if facets and mode == "semantic":
+            return jsonify({"error": "Facets are only available for keyword search"}), 400
         
-        # Format response
-        news_list = [
-            {
-                "id": row[0],
-                "title": row[1],
-                "url": row[2],
-                "by": row[3],
-                "time": row[4],
-                "score": row[5],
-                "category": row[6]
-            }
-            for row in result
-        ]
+        if mode == "semantic":
+            # Over-fetch so a category filter still leaves enough matches
+            return listing_response(
+                lambda fetch, collapse: load_matches(semantic_search(search_term, limit * 4 if category else limit),
+                                                     category, limit, fetch),
+                serialize_related_stories
+            )
+        
+        if facets:
+            # Results and category/domain/age counts from one scan of the stories
+            return listing_response(
+                lambda fetch, collapse: search_with_facets(search_term, category, limit, fetch, collapse),
+                serialize_faceted_stories
+            )
         
-        logger.debug("Search returned %s results", len(news_list))
-        return jsonify(news_list)
+        return listing_response(lambda fetch, collapse: search_stories(search_term, category, limit, fetch, collapse),
+                                serialize_stories)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error("Error in search_news: %s", str(e))
         return jsonify({"error": str(e)}), 500
 
 
+@api_bp.route("/stories/<int(signed=True):story_id>/related", methods=["GET"])
+def get_related(story_id):
+    """Get the stories closest in meaning to a story"""
+    try:
+        limit = parse_limit(request.args.get('limit'), RELATED_LIMIT)
+        matches = related_stories(story_id, limit)
+        if matches is None:
+            return jsonify({"error": f"Story {story_id} not found"}), 404
+        
+        return listing_response(lambda fetch, collapse: load_matches(matches, limit=limit, fetch=fetch),
+                                serialize_related_stories)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error in get_related: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/feed", methods=["GET"])
+def get_feed():
+    """Get stories ranked for a user's profile (or by gravity alone without one)"""
+    try:
+        user_id = request.args.get('user')
+        limit = parse_limit(request.args.get('limit'), DEFAULT_DISPLAY_LIMIT)
+        profile = load_profile(user_id) if user_id else None
+        # Ranked in memory, so the fetch mode doesn't apply
+        return listing_response(lambda fetch, collapse: rank_feed(profile, limit), serialize_feed)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        logger.error("Error in get_feed: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/profiles/<user_id>", methods=["GET"])
+def get_user_profile(user_id):
+    """Get a user's feed preferences"""
+    try:
+        profile = load_profile(user_id)
+        if profile is None:
+            return jsonify({"error": f"Profile {user_id} not found"}), 404
+        return jsonify(profile)
+    except Exception as e:
+        logger.error("Error in get_user_profile: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
+@api_bp.route("/profiles/<user_id>", methods=["PUT"])
+def put_user_profile(user_id):
+    """Create or replace a user's feed preferences"""
+    try:
+        profile = normalize_profile(request.get_json(silent=True) or {})
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    try:
+        store_profile(user_id, profile)
+        return jsonify(profile)
+    except Exception as e:
+        logger.error("Error in put_user_profile: %s", str(e))
+        return jsonify({"error": str(e)}), 500
+
+
 @api_bp.route("/autocomplete", methods=["GET"])
 def autocomplete():
     """Get autocomplete suggestions based on title prefix"""
     try:
         prefix = request.args.get('q', '')
-        limit = int(request.args.get('limit', 7))  # Default to 7 suggestions
+        limit = parse_limit(request.args.get('limit'), 7)  # Default to 7 suggestions
         logger.debug("Getting autocomplete suggestions for: '%s'", prefix)
         
         if not prefix.strip():
             return jsonify([])
         
         # Get suggestions from database
-        result = get_autocomplete_suggestions(prefix, limit)
+        collapse = parse_flag(request.args.get('collapse_duplicates', 'false'))
+        result = get_autocomplete_suggestions(prefix, limit, collapse)
         
         # Format the results as an array of suggestion objects
-        suggestions = [{"value": row[0]} for row in result]
+        suggestions = format_suggestions(result)
         
         logger.debug("Returning %s autocomplete suggestions", len(suggestions))
         return jsonify(suggestions)
+    except ParameterError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         logger.error("Error in get_autocomplete_suggestions: %s", str(e))
         return jsonify([]), 500
\ No newline at end of file
@@ -0,0 +1,201 @@
+"""
+Command-line tasks registered on the Flask app (run with `flask --app wsgi <command>`).
+"""
+import calendar
+import json
+import time
+import click
+from datetime import date
+from app.models.database import (
+    MIN_STORY_ID,
+    execute_query,
+    compact_snapshots,
+    get_story_chunk,
+    rebuild_daily_rollups,
+    rebuild_story_rollups,
+    save_digest_subscriber
+)
+from app.models.archive import archive_stories, compact_archive, apply_retention
+from app.models.replica import publish_replica
+from app.services.assets import build_assets
+from app.services.comments import sync_queued_threads
+from app.services.ingest import sync_news
+from app.services.item_cache import ItemCache
+from app.services.classifier import (
+    LABELED_TITLES,
+    INFERENCE_BACKENDS,
+    evaluate_backend,
+    measure_agreement,
+    classify_by_rules
+)
+from app.services.reclassifier import reclassify_corpus
+from app.services.vectors import index_stories, index_queued_stories
+from app.services.digest import generate_digests, default_mailer, digest_window
+from app.config.settings import (
+    RECLASSIFY_CHUNK_SIZE,
+    DIGEST_WINDOW_DAYS,
+    DIGEST_ROLLUP_SIZE,
+    DEFAULT_FETCH_LIMIT,
+    ITEM_CACHE_RETENTION_DAYS
+)
+
+
+def load_labeled_titles(path):
+    """Load (title, category) pairs from a JSON Lines file."""
+    samples = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                row = json.loads(line)
+                samples.append((row["title"], row["category"]))
+    return samples
+
+
+def register_commands(app):
+    """Attach the CLI commands to the Flask app."""
+
+    @app.cli.command("classifier-eval")
+    @click.option("--backend", type=click.Choice(sorted(INFERENCE_BACKENDS)), default="quantized",
+                  help="Inference backend to compare against the fp32 baseline.")
+    @click.option("--samples", "samples_path", type=click.Path(exists=True), default=None,
+                  help="JSON Lines file of {\"title\", \"category\"} rows (defaults to the built-in set).")
+    def classifier_eval(backend, samples_path):
+        """Check an inference backend's accuracy and latency against fp32."""
+        samples = load_labeled_titles(samples_path) if samples_path else LABELED_TITLES
+        try:
+            report = evaluate_backend(samples, backend)
+        except ImportError as e:
+            raise click.ClickException(f"{str(e)}. Install its dependencies to evaluate it.")
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("classifier-agreement")
+    @click.option("--limit", default=200, show_default=True,
+                  help="Number of recent stored titles to compare.")
+    def classifier_agreement(limit):
+        """Compare the embedding classifier with the NLI path on stored titles."""
+        # Only titles the keyword rules don't match ever reach the model tier
+        rows = execute_query("SELECT title FROM hackernews WHERE title IS NOT NULL ORDER BY time DESC LIMIT ?",
+                             [limit * 5])
+        titles = [row[0] for row in rows if classify_by_rules(row[0]) is None][:limit]
+        report = measure_agreement(titles)
+        click.echo(json.dumps(report, indent=2))
+
+    @app.cli.command("reclassify")
+    @click.option("--dry-run", is_flag=True, help="Report category changes without writing them.")
+    @click.option("--restart", is_flag=True, help="Ignore any saved checkpoint and start from the first story.")
+    @click.option("--rules-only", is_flag=True, help="Skip the model tier; unmatched stories keep their category.")
+    @click.option("--chunk-size", default=RECLASSIFY_CHUNK_SIZE, show_default=True,
+                  help="Stories read, classified and written per step.")
+    def reclassify(dry_run, restart, rules_only, chunk_size):
+        """Reclassify every stored story with the current rules and model."""
+        def report(status):
+            click.echo(f"{status['processed']}/{status['total']} stories, {status['changed']} changed")
+
+        result = reclassify_corpus(chunk_size=chunk_size, dry_run=dry_run, resume=not restart,
+                                   use_model=not rules_only, progress=report)
+        if result["state"] == "failed":
+            raise click.ClickException(f"{result['message']}. Run again to resume from the last checkpoint.")
+        if dry_run:
+            click.echo(json.dumps({"diff": result["diff"], "samples": result["samples"]}, indent=2))
+
+    @app.cli.command("compact-snapshots")
+    def compact_snapshots_command():
+        """Downsample old score/comment snapshots and apply retention."""
+        if not compact_snapshots():
+            raise click.ClickException("Snapshot compaction failed, see the log for details.")
+        count = execute_query("SELECT COUNT(*) FROM story_snapshots")[0][0]
+        click.echo(f"Compaction complete, {count} snapshots kept.")
+
+    @app.cli.command("embed-stories")
+    @click.option("--chunk-size", default=1000, show_default=True,
+                  help="Stories read and embedded per step.")
+    def embed_stories(chunk_size):
+        """Add every stored story missing from the semantic index."""
+        after_id, added = MIN_STORY_ID, 0
+        while True:
+            rows = get_story_chunk(after_id, chunk_size)
+            if not rows:
+                break
+            added += index_stories([{"id": row[0], "title": row[1]} for row in rows])
+            after_id = rows[-1][0]
+            click.echo(f"Up to story {after_id}, {added} added")
+        click.echo(f"Embedding complete, {added} stories added.")
+
+    @app.cli.command("digest")
+    @click.option("--days", default=DIGEST_WINDOW_DAYS, show_default=True, help="Window length in days.")
+    @click.option("--end", "end", default=None, help="First day after the window, YYYY-MM-DD (defaults to today).")
+    @click.option("--rebuild-rollups", is_flag=True,
+                  help="Recompute the daily top lists for the window from stored stories first.")
+    @click.option("--no-mail", is_flag=True, help="Only write the outbox, even if SMTP is configured.")
+    def digest(days, end, rebuild_rollups, no_mail):
+        """Render the weekly digest for every subscriber."""
+        end = date.fromisoformat(end) if end else None
+        if rebuild_rollups:
+            start, _ = digest_window(end, days)
+            rebuild_daily_rollups(calendar.timegm(start.timetuple()), DIGEST_ROLLUP_SIZE)
+        summary = generate_digests(end=end, days=days, mailer=None if no_mail else default_mailer())
+        click.echo(json.dumps(summary, indent=2))
+
+    @app.cli.command("digest-subscribe")
+    @click.argument("email")
+    @click.option("--category", "categories", multiple=True,
+                  help="Only include this category (repeatable; defaults to every category).")
+    def digest_subscribe(email, categories):
+        """Subscribe an address to the weekly digest."""
+        save_digest_subscriber(email, list(categories) or None)
+        click.echo(f"Subscribed {email}.")
+
+    @app.cli.command("archive")
+    @click.option("--before", type=int, default=None,
+                  help="Archive stories posted before this Unix time (defaults to HOT_STORAGE_DAYS ago).")
+    @click.option("--skip-compaction", is_flag=True, help="Don't merge each month's Parquet parts.")
+    def archive(before, skip_compaction):
+        """Move old stories to monthly Parquet partitions, compact them and apply retention."""
+        moved = archive_stories(before)
+        compacted = 0 if skip_compaction else compact_archive()
+        expired = apply_retention()
+        click.echo(json.dumps({"archived": moved, "compacted": compacted, "expired": expired}, indent=2))
+
+    @app.cli.command("publish-replica")
+    def publish_replica_command():
+        """Publish a read-only copy of the database for DB_READ_MODE=replica readers."""
+        path = publish_replica()
+        if path is None:
+            raise click.ClickException("Publishing the replica failed; see the log.")
+        click.echo(f"Published {path}.")
+
+    @app.cli.command("build-assets")
+    def build_assets_command():
+        """Minify, fingerprint and precompress the stylesheets and scripts under static/."""
+        click.echo(json.dumps(build_assets(), indent=2))
+
+    @app.cli.command("rebuild-stats")
+    def rebuild_stats():
+        """Recompute the domain, author and hourly rollups behind /stats/domains, /stats/authors and /stats/hourly."""
+        if not rebuild_story_rollups():
+            raise click.ClickException("Rebuilding the rollups failed; see the log.")
+        click.echo("Rebuilt story rollups.")
+
+    @app.cli.command("sync")
+    @click.option("--limit", type=int, default=DEFAULT_FETCH_LIMIT, show_default=True, help="Stories to ingest.")
+    @click.option("--replay", is_flag=True, help="Read the feed and items from the item cache only, without network requests.")
+    def sync(limit, replay):
+        """Ingest the newest Hacker News stories once and report the throughput."""
+        start = time.perf_counter()
+        count = sync_news(limit, replay=replay or None)
+        if count is None:
+            raise click.ClickException("An ingest of hn-new is already running.")
+        elapsed = time.perf_counter() - start
+        # Comment threads and embeddings are left to background workers; finish them before the process exits
+        comments = sync_queued_threads()
+        index_queued_stories()
+        click.echo(json.dumps({"stories": count, "seconds": round(elapsed, 3),
+                               "stories_per_second": round(count / elapsed, 1) if elapsed else None,
+                               "comments": comments}, indent=2))
+
+    @app.cli.command("prune-item-cache")
+    @click.option("--retention-days", type=int, default=ITEM_CACHE_RETENTION_DAYS, show_default=True,
+                  help="Drop items not fetched for this many days.")
+    def prune_item_cache_command(retention_days):
+        """Expire old items from the raw item cache and delete the objects no item refers to."""
+        click.echo(json.dumps(ItemCache().prune(retention_days), indent=2))
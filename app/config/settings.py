@@ -9,15 +9,112 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__fil
 # Database settings
 DB_FILE = os.path.join(BASE_DIR, "hackernews.duckdb")
 
+# Read replicas: with DB_READ_MODE="replica", queries read the newest read-only
+# copy published under REPLICA_DIR instead of DB_FILE, so web workers never wait
+# on the ingester's write lock. The ingester publishes a copy every
+# REPLICA_PUBLISH_INTERVAL seconds (0 disables publishing) and keeps REPLICA_KEEP.
+DB_READ_MODE = os.environ.get("DB_READ_MODE", "direct")
+REPLICA_DIR = os.path.join(BASE_DIR, "data", "replicas")
+REPLICA_PUBLISH_INTERVAL = int(os.environ.get("REPLICA_PUBLISH_INTERVAL", 0))
+REPLICA_KEEP = 3
+# Attempts to open DB_FILE while another process holds its lock
+DB_LOCK_RETRIES = 5
+
+# Storage tiers: stories stay in the hot `hackernews` table for HOT_STORAGE_DAYS,
+# then move to monthly Parquet partitions under ARCHIVE_DIR (read through the
+# `all_stories` view). Archived months older than ARCHIVE_RETENTION_MONTHS are
+# deleted; None keeps them forever.
+HOT_STORAGE_DAYS = 30
+ARCHIVE_DIR = os.path.join(BASE_DIR, "data", "archive")
+ARCHIVE_RETENTION_MONTHS = None
+
 # API settings
 HN_TOP_STORIES_URL = "https://hacker-news.firebaseio.com/v0/newstories.json"
 HN_ITEM_URL = "https://hacker-news.firebaseio.com/v0/item/{}.json"
+HN_FEED_URLS = {
+    "new": HN_TOP_STORIES_URL,
+    "top": "https://hacker-news.firebaseio.com/v0/topstories.json",
+    "best": "https://hacker-news.firebaseio.com/v0/beststories.json",
+    "ask": "https://hacker-news.firebaseio.com/v0/askstories.json",
+    "show": "https://hacker-news.firebaseio.com/v0/showstories.json",
+}
+
+# News sources ingested on a schedule by server.py. Each source has its own
+# interval (minutes), story limit per run and request rate limit (per second).
+# Types: "hn" (with a `feed` from HN_FEED_URLS) and "rss" (RSS 2.0 or Atom `url`).
+NEWS_SOURCES = [
+    {"name": "hn-new", "type": "hn", "feed": "new", "interval": 15, "limit": 100, "rate": 10},
+    # {"name": "hn-top", "type": "hn", "feed": "top", "interval": 30, "limit": 100, "rate": 10},
+    # {"name": "hn-show", "type": "hn", "feed": "show", "interval": 60, "limit": 50, "rate": 5},
+    # {"name": "lobsters", "type": "rss", "url": "https://lobste.rs/rss", "interval": 30, "limit": 50, "rate": 1},
+]
+SOURCE_FETCH_CONCURRENCY = 8  # parallel item requests per source
+SOURCE_BATCH_SIZE = 50  # stories fetched, classified and written per step
+SOURCE_REQUEST_TIMEOUT = 10  # seconds
+
+# Comment trees of HN stories (COMMENTS=1 to enable). A story's thread is
+# refetched, one tree level at a time, only when its comment count changed.
+COMMENTS_ENABLED = os.environ.get("COMMENTS", "0") == "1"
+COMMENT_FETCH_CONCURRENCY = 32  # parallel comment requests per level
+COMMENT_FETCH_RATE = 250  # comment requests per second
+
+# On-disk cache of raw HN items (ITEM_CACHE=0 to disable). Fetched items are
+# stored compressed under ITEM_CACHE_DIR and a cached copy is served while it
+# is fresh. How long that is depends on the item's age, as old stories rarely
+# change. REPLAY=1 serves feeds and items from the cache alone, with no network
+# requests, so ingests and throughput tests are repeatable.
+ITEM_CACHE_ENABLED = os.environ.get("ITEM_CACHE", "1") != "0"
+ITEM_CACHE_REPLAY = os.environ.get("REPLAY", "0") == "1"
+ITEM_CACHE_DIR = os.path.join(BASE_DIR, "data", "items")
+# (item age up to, seconds a cached copy stays fresh); older items use the last entry
+ITEM_CACHE_TTLS = [(3600, 60), (86400, 600), (7 * 86400, 3600), (30 * 86400, 6 * 3600), (None, 86400)]
+ITEM_CACHE_RETENTION_DAYS = 30  # items not fetched for this long are dropped by the nightly prune
+
+# Search facets (/search?facets=true): age buckets are cumulative, newest first
+SEARCH_TIME_FACETS = [("day", 86400), ("week", 7 * 86400), ("month", 30 * 86400), ("year", 365 * 86400)]
+SEARCH_DOMAIN_FACETS = 10  # most frequent domains reported
+
+# Near-duplicate detection (same canonical URL, or MinHash-similar title)
+DEDUP_ENABLED = True
+DEDUP_THRESHOLD = 0.8  # estimated title Jaccard similarity for a duplicate
+DEDUP_WINDOW_DAYS = 7  # title matches only count against stories this recent
 
 # Server settings
 DEBUG = True
-PORT = 5001
+PORT = int(os.environ.get("PORT", 5001))
 HOST = "0.0.0.0"
 
+# Admission control (ADMISSION_CONTROL=0 disables). Every client address has a
+# token bucket refilled at ADMISSION_RATE tokens per second up to ADMISSION_BURST.
+# A request spends its endpoint's `cost` (default 1) and is refused with 429
+# once the bucket runs dry. An endpoint with a `concurrency` runs at most that
+# many requests at once: up to `queue` more wait at most `queue_timeout` seconds
+# for a slot, and the rest are refused with 503. Patterns may use `*`.
+# All of these limits are per worker process: buckets and gates live in memory,
+# so under N workers (e.g. gunicorn --workers 4) a client may get up to N times
+# the rate and burst, and each endpoint runs up to N times its concurrency.
+ADMISSION_ENABLED = os.environ.get("ADMISSION_CONTROL", "1") != "0"
+ADMISSION_RATE = 20
+ADMISSION_BURST = 60
+ADMISSION_MAX_CLIENTS = 100000  # buckets kept; the least recently seen client is forgotten first
+# Behind a reverse proxy, identify clients by the address it appends to X-Forwarded-For
+ADMISSION_TRUST_PROXY = os.environ.get("TRUST_PROXY", "0") == "1"
+ENDPOINT_POLICIES = {
+    "/update": {"cost": 30, "concurrency": 1, "queue": 0},
+    "/reclassify": {"cost": 30, "concurrency": 1, "queue": 0},
+    "/search": {"cost": 2, "concurrency": 8, "queue": 32, "queue_timeout": 0.5},
+    "/stories/*/related": {"cost": 2, "concurrency": 8, "queue": 32, "queue_timeout": 0.5},
+    "/stats/trending": {"cost": 2, "concurrency": 4, "queue": 16, "queue_timeout": 0.5},
+    "/feed": {"concurrency": 16, "queue": 64, "queue_timeout": 0.5},
+    "/autocomplete": {"concurrency": 8, "queue": 64, "queue_timeout": 0.2},
+    "/export": {"cost": 10, "concurrency": 2, "queue": 0},
+    "/static/*": {"cost": 0},
+    "/assets/*": {"cost": 0},
+}
+# Largest `limit` a listing endpoint serves, and the most stories /update syncs
+MAX_RESULT_LIMIT = 200
+MAX_SYNC_LIMIT = 500
+
 # Classification categories
 CATEGORIES = [
     "Programming",
@@ -38,6 +135,96 @@ CATEGORIES = [
     "Ask HN"
 ]
 
+# Marker for stories stored before the model tier has classified them
+PENDING_CATEGORY = "Pending"
+PENDING_BATCH_SIZE = 32
+PENDING_POLL_INTERVAL = 60  # seconds between sweeps when no sync signals new work
+PENDING_RETRY_DELAY = 1  # seconds before retrying a failed batch, doubled per failure up to the poll interval
+
+# Bulk reclassification of stored stories
+RECLASSIFY_CHUNK_SIZE = 5000
+RECLASSIFY_DIFF_SAMPLES = 50  # changed titles kept for dry-run reports
+
+# Score/comment snapshots: raw samples are downsampled to one per hour after
+# SNAPSHOT_HOURLY_AFTER_HOURS, to one per day after SNAPSHOT_DAILY_AFTER_DAYS,
+# and dropped after SNAPSHOT_RETENTION_DAYS
+SNAPSHOT_HOURLY_AFTER_HOURS = 48
+SNAPSHOT_DAILY_AFTER_DAYS = 14
+SNAPSHOT_RETENTION_DAYS = 180
+TRENDING_WINDOW_HOURS = 6
+
+# Domain/author leaderboards and the hourly histogram, read from rollups kept current at ingest
+LEADERBOARD_DAYS = 30  # default window of /stats/domains and /stats/authors
+LEADERBOARD_MAX_DAYS = 3650
+HISTOGRAM_HOURS = 48  # default window of /stats/hourly
+HISTOGRAM_MAX_HOURS = 24 * 90
+
+# Server-Sent Events stream of story updates
+STREAM_CLIENT_BUFFER = 64  # messages queued per client before it is told to resync
+STREAM_HEARTBEAT_SECONDS = 15
+# Processes on one host (gunicorn/uvicorn workers, the ingester) relay published
+# updates to each other through Unix sockets in this directory, so a client gets
+# every update whichever worker it is connected to. STREAM_RELAY=0 keeps them per process.
+STREAM_RELAY = os.environ.get("STREAM_RELAY", "1") != "0"
+STREAM_RELAY_DIR = os.environ.get("STREAM_RELAY_DIR", os.path.join(BASE_DIR, "data", "stream"))
+
+# Async (ASGI) serving mode: DuckDB reads run on a bounded thread pool
+ASYNC_DB_THREADS = 16
+
+# Static assets: stylesheets and scripts under STATIC_DIR are minified,
+# content-hashed and precompressed into ASSET_DIR when the app starts, then
+# served from /assets with immutable cache headers. ASSETS=0 serves the raw
+# files from /static instead (handy while editing them).
+ASSETS_ENABLED = os.environ.get("ASSETS", "1") != "0"
+STATIC_DIR = os.path.join(BASE_DIR, "static")
+ASSET_DIR = os.path.join(STATIC_DIR, "dist")
+ASSET_MAX_AGE = 365 * 86400  # seconds
+
+# Rows fetched and encoded per step of an /export stream
+EXPORT_BATCH_ROWS = 10000
+
 # Default fetch limit
 DEFAULT_FETCH_LIMIT = 50
-DEFAULT_DISPLAY_LIMIT = 30
\ No newline at end of file
+DEFAULT_DISPLAY_LIMIT = 30
+# Classifier inference settings
+# Model tier used for titles the keyword rules don't match: "nli" runs the
+# zero-shot model once per candidate label, "embedding" compares one sentence
+# embedding per title against cached category-description embeddings
+CLASSIFIER_MODE = os.environ.get("CLASSIFIER_MODE", "nli")
+EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+# Backend for the zero-shot model: "pytorch" (fp32), "quantized" (dynamic int8)
+# or "onnx" (ONNX Runtime, requires the optional `optimum[onnxruntime]` package)
+ZERO_SHOT_MODEL = "facebook/bart-large-mnli"
+CLASSIFIER_BACKEND = os.environ.get("CLASSIFIER_BACKEND", "pytorch")
+CLASSIFIER_THREADS = int(os.environ.get("CLASSIFIER_THREADS", 0))  # 0 = library default
+CLASSIFIER_BATCH_SIZE = 16
+ONNX_MODEL_DIR = os.path.join(BASE_DIR, "models", "onnx")
+
+# Semantic story index (related stories and semantic search)
+# Title embeddings from EMBEDDING_MODEL, stored int8-quantized in memory-mapped
+# files. Corpora under VECTOR_IVF_MIN_ROWS are searched exactly; past that an
+# inverted-file index narrows each query to the VECTOR_IVF_PROBES nearest clusters.
+SEMANTIC_INDEX_ENABLED = os.environ.get("SEMANTIC_INDEX", "1") != "0"
+VECTOR_DIR = os.path.join(BASE_DIR, "data", "vectors")
+VECTOR_IVF_MIN_ROWS = 50000
+VECTOR_IVF_PROBES = 8
+RELATED_LIMIT = 10
+
+# Personalized feed (/feed)
+FEED_WINDOW_HOURS = 72  # candidates are stories from this recent window
+FEED_CANDIDATES_PER_CATEGORY = 300
+FEED_CANDIDATE_TTL = 60  # seconds before the shared candidate pool is reloaded
+FEED_GRAVITY = 1.8  # age decay, as in the HN front-page formula
+FEED_FOLLOW_BOOST = 1.0  # followed authors' stories score (1 + boost) times higher
+
+# Weekly digest
+DIGEST_WINDOW_DAYS = 7
+DIGEST_STORIES_PER_CATEGORY = 5
+DIGEST_ROLLUP_SIZE = 50  # stories kept per day and category in daily_top_stories
+DIGEST_OUTBOX = os.path.join(BASE_DIR, "outbox")
+# Digests are always written to DIGEST_OUTBOX; set DIGEST_SMTP_HOST to also send them
+DIGEST_SMTP_HOST = os.environ.get("DIGEST_SMTP_HOST")
+DIGEST_SMTP_PORT = int(os.environ.get("DIGEST_SMTP_PORT", 587))
+DIGEST_SMTP_USER = os.environ.get("DIGEST_SMTP_USER")
+DIGEST_SMTP_PASSWORD = os.environ.get("DIGEST_SMTP_PASSWORD")
+DIGEST_FROM = os.environ.get("DIGEST_FROM", "digest@hacky-news.local")
@@ -0,0 +1,168 @@
+"""
+Hot/cold storage tiers for stories.
+
+New and recently updated stories live in the hot `hackernews` table. Once
+they are older than HOT_STORAGE_DAYS they move to Parquet files in monthly
+partitions (ARCHIVE_DIR/month=YYYY-MM/part-*.parquet). The database file
+then only holds recent history. The `all_stories` view unions both tiers,
+and newest-first queries read archive months only when the hot table can't
+fill them (see database.query_recent).
+"""
+import calendar
+import glob
+import logging
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+from app.config.settings import ARCHIVE_DIR, HOT_STORAGE_DAYS, ARCHIVE_RETENTION_MONTHS
+from app.models.database import get_connection, archived_months, story_union_sql
+
+logger = logging.getLogger(__name__)
+
+
+def _sql_path(path):
+    """Quote a file path as an SQL string literal."""
+    return "'" + path.replace("'", "''") + "'"
+
+
+def _month_bounds(month):
+    """Unix times of the start of a "YYYY-MM" month and of the next month (UTC)."""
+    year, number = map(int, month.split("-"))
+    start = calendar.timegm((year, number, 1, 0, 0, 0))
+    end = calendar.timegm((year + number // 12, number % 12 + 1, 1, 0, 0, 0))
+    return start, end
+
+
+def _part_name():
+    return f"part-{int(time.time() * 1000):015d}.parquet"
+
+
+def refresh_story_view(conn):
+    """Point the `all_stories` view at the hot table and the current archive months."""
+    conn.execute(f"CREATE OR REPLACE VIEW all_stories AS {story_union_sql(archived_months())}")
+
+
+def archive_stories(before=None):
+    """
+    Move stories posted before a Unix time from the hot table to monthly Parquet partitions.
+
+    Args:
+        before: Cut-off time (defaults to HOT_STORAGE_DAYS ago)
+
+    Returns:
+        int: Number of stories moved
+    """
+    before = before if before is not None else int(time.time()) - HOT_STORAGE_DAYS * 86400
+    conn = get_connection()
+    moved = 0
+    try:
+        months = [row[0] for row in conn.execute(
+            "SELECT DISTINCT strftime(to_timestamp(time) AT TIME ZONE 'UTC', '%Y-%m') "
+            "FROM hackernews WHERE time < ?", [before]
+        ).fetchall()]
+        for month in sorted(months):
+            start, end = _month_bounds(month)
+            end = min(end, before)
+            directory = os.path.join(ARCHIVE_DIR, f"month={month}")
+            os.makedirs(directory, exist_ok=True)
+            path = os.path.join(directory, _part_name())
+
+            # The copy and the delete commit together, so a story is never in neither tier
+            conn.execute("BEGIN TRANSACTION")
+            try:
+                conn.execute(
+                    f"COPY (SELECT * FROM hackernews WHERE time >= {start} AND time < {end} ORDER BY time) "
+                    f"TO {_sql_path(path)} (FORMAT PARQUET)"
+                )
+                moved += conn.execute("DELETE FROM hackernews WHERE time >= ? AND time < ?",
+                                      [start, end]).fetchone()[0]
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                if os.path.exists(path):
+                    os.remove(path)
+                raise
+
+        refresh_story_view(conn)
+        # Let the freed blocks be reused so the database file stops growing
+        conn.execute("CHECKPOINT")
+    finally:
+        conn.close()
+    logger.info(f"Archived {moved} stories from {len(months)} months")
+    return moved
+
+
+def compact_archive():
+    """
+    Merge each month's Parquet parts into one file, keeping the newest copy of each story.
+
+    Returns:
+        int: Number of months compacted
+    """
+    compacted = 0
+    conn = get_connection()
+    try:
+        for month in archived_months():
+            directory = os.path.join(ARCHIVE_DIR, f"month={month}")
+            parts = sorted(glob.glob(os.path.join(directory, "*.parquet")))
+            if len(parts) < 2:
+                continue
+            files = ", ".join(_sql_path(part) for part in parts)
+            tmp = os.path.join(directory, "compacting.tmp")
+            conn.execute(f"""
+                COPY (
+                    SELECT * EXCLUDE (filename)
+                    FROM read_parquet([{files}], union_by_name = true, filename = true, hive_partitioning = false)
+                    QUALIFY row_number() OVER (PARTITION BY id ORDER BY filename DESC) = 1
+                    ORDER BY time
+                ) TO {_sql_path(tmp)} (FORMAT PARQUET)
+            """)
+            os.replace(tmp, os.path.join(directory, _part_name()))
+            for part in parts:
+                os.remove(part)
+            compacted += 1
+    finally:
+        conn.close()
+    logger.info(f"Compacted {compacted} archive months")
+    return compacted
+
+
+def apply_retention(keep_months=ARCHIVE_RETENTION_MONTHS, today=None):
+    """
+    Delete archive months older than the retention window.
+
+    Returns:
+        list: Months deleted
+    """
+    if keep_months is None:
+        return []
+    today = today or datetime.now(timezone.utc).date()
+    index = today.year * 12 + today.month - 1 - keep_months
+    oldest = f"{index // 12:04d}-{index % 12 + 1:02d}"
+    expired = [month for month in archived_months() if month < oldest]
+    for month in expired:
+        shutil.rmtree(os.path.join(ARCHIVE_DIR, f"month={month}"))
+
+    if expired:
+        conn = get_connection()
+        try:
+            refresh_story_view(conn)
+        finally:
+            conn.close()
+        logger.info(f"Deleted {len(expired)} archive months older than {oldest}")
+    return expired
+
+
+def maintain_storage():
+    """Archive, compact and apply retention in one pass (run daily)."""
+    try:
+        return {
+            "archived": archive_stories(),
+            "compacted": compact_archive(),
+            "expired": apply_retention(),
+        }
+    except Exception as e:
+        logger.error(f"Error maintaining story storage: {str(e)}")
+        return None
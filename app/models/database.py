@@ -2,18 +2,94 @@
 Database module for DuckDB operations.
 """
 import logging
+import os
+import threading
+import time
 import duckdb
-from app.config.settings import DB_FILE
+from app.config.settings import (
+    DB_FILE,
+    DB_READ_MODE,
+    DB_LOCK_RETRIES,
+    REPLICA_DIR,
+    ARCHIVE_DIR,
+    PENDING_CATEGORY,
+    SNAPSHOT_HOURLY_AFTER_HOURS,
+    SEARCH_TIME_FACETS,
+    SEARCH_DOMAIN_FACETS,
+    SNAPSHOT_DAILY_AFTER_DAYS,
+    SNAPSHOT_RETENTION_DAYS
+)
 
 logger = logging.getLogger(__name__)
 
+# Appended to a WHERE clause to keep only canonical stories
+DUPLICATE_FILTER = "AND canonical_id IS NULL"
+# Host of a story's link, lowercased and without "www."
+DOMAIN_SQL = "LOWER(regexp_extract(url, '^[A-Za-z]+://(www\\.)?([^/:?#]+)', 2))"
+# UTC day and hour a story was posted
+DAY_SQL = "CAST(to_timestamp(time) AT TIME ZONE 'UTC' AS DATE)"
+HOUR_SQL = "date_trunc('hour', to_timestamp(time) AT TIME ZONE 'UTC')"
+# Story counts, points and comments kept current as stories are written: table -> {key column: expression}
+STORY_ROLLUPS = {
+    "domain_daily": {"day": DAY_SQL, "domain": DOMAIN_SQL},
+    "author_daily": {"day": DAY_SQL, "author": "by"},
+    "hourly_stories": {"hour": HOUR_SQL},
+}
+# Story columns the rollups are computed from
+ROLLUP_COLUMNS = ["time", "url", "by", "score", "descendants"]
+LEADERBOARD_SORTS = ("stories", "points", "comments")
+# Lower bound for ID-ordered scans: below every HN ID and the negative IDs of other sources
+MIN_STORY_ID = -(2 ** 31)
+# Rollup rows are shared by every batch (the current hour, busy domains), so
+# concurrent ingest threads would conflict on them: writers take turns
+_rollup_lock = threading.Lock()
+
 def get_connection():
-    """Get a DuckDB connection."""
+    """Get a read-write DuckDB connection, retrying while another process holds the file lock."""
+    for attempt in range(DB_LOCK_RETRIES):
+        try:
+            return duckdb.connect(DB_FILE)
+        except duckdb.IOException as e:
+            if "lock" not in str(e).lower() or attempt == DB_LOCK_RETRIES - 1:
+                logger.error(f"Error connecting to database: {str(e)}")
+                raise
+            time.sleep(0.05 * 2 ** attempt)
+        except Exception as e:
+            logger.error(f"Error connecting to database: {str(e)}")
+            raise
+
+# Latest published replica, cached by the pointer file's modification time
+_replica = (None, None)
+
+def current_replica():
+    """Path of the newest published read replica, or None if none has been published."""
+    global _replica
+    pointer = os.path.join(REPLICA_DIR, "CURRENT")
     try:
-        return duckdb.connect(DB_FILE)
-    except Exception as e:
-        logger.error(f"Error connecting to database: {str(e)}")
-        raise
+        mtime = os.stat(pointer).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    if _replica[0] != mtime:
+        with open(pointer) as f:
+            _replica = (mtime, os.path.join(REPLICA_DIR, f.read().strip()))
+    return _replica[1]
+
+def get_read_connection():
+    """
+    Get a connection for read-only queries.
+    
+    In replica mode this opens the newest published replica read-only, so
+    queries never contend with the ingester; each new connection picks up
+    the latest replica.
+    """
+    if DB_READ_MODE == "replica":
+        path = current_replica()
+        if path:
+            try:
+                return duckdb.connect(path, read_only=True)
+            except Exception as e:
+                logger.error(f"Error opening replica {path}, reading the primary instead: {str(e)}")
+    return get_connection()
 
 def setup_db():
     """Initialize the DuckDB database and ensure the schema is correct."""
@@ -30,10 +106,159 @@ def setup_db():
                 score INTEGER,
                 descendants INTEGER,
                 type TEXT,
-                category TEXT DEFAULT 'Uncategorized'
+                category TEXT DEFAULT 'Uncategorized',
+                source TEXT DEFAULT 'hn',
+                canonical_id INTEGER
+            )
+            """
+        )
+        # Databases created before multi-source ingestion lack the column
+        conn.execute("ALTER TABLE hackernews ADD COLUMN IF NOT EXISTS source TEXT DEFAULT 'hn'")
+        # Set on near-duplicates to the ID of the earliest story in their cluster
+        conn.execute("ALTER TABLE hackernews ADD COLUMN IF NOT EXISTS canonical_id INTEGER")
+        # Stories from non-HN sources get negative IDs so they never clash with HN item IDs
+        conn.execute(
+            """
+            CREATE SEQUENCE IF NOT EXISTS external_story_ids
+            START -1 INCREMENT BY -1 MINVALUE -2147483647 MAXVALUE -1
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS source_items (
+                source TEXT,
+                guid TEXT,
+                id INTEGER DEFAULT nextval('external_story_ids'),
+                PRIMARY KEY (source, guid)
+            )
+            """
+        )
+        # Append-only score/comment history; no key so inserts stay cheap
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS story_snapshots (
+                id INTEGER,
+                ts INTEGER,
+                score INTEGER,
+                descendants INTEGER
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS reclassify_jobs (
+                job TEXT PRIMARY KEY,
+                last_id INTEGER,
+                processed INTEGER,
+                changed INTEGER,
+                updated_at INTEGER
+            )
+            """
+        )
+        # Best stories of each day and category, kept small for digests
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS daily_top_stories (
+                day DATE,
+                id INTEGER,
+                category TEXT,
+                title TEXT,
+                url TEXT,
+                by TEXT,
+                score INTEGER,
+                descendants INTEGER,
+                PRIMARY KEY (day, id)
             )
             """
         )
+        # Digest recipients; NULL categories means every category
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS digest_subscribers (
+                email TEXT PRIMARY KEY,
+                categories TEXT[],
+                created_at INTEGER
+            )
+            """
+        )
+        # Personalized feed preferences; category weights are a JSON object
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS user_profiles (
+                user_id TEXT PRIMARY KEY,
+                category_weights TEXT,
+                followed_authors TEXT[],
+                muted_domains TEXT[],
+                updated_at INTEGER
+            )
+            """
+        )
+        # Comments of HN stories, flat; `story` is the thread's root story
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS comments (
+                id INTEGER PRIMARY KEY,
+                parent INTEGER,
+                story INTEGER,
+                by TEXT,
+                time INTEGER,
+                text TEXT
+            )
+            """
+        )
+        # Story comment count at its last complete comment sync
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS comment_threads (
+                story INTEGER PRIMARY KEY,
+                descendants INTEGER,
+                synced_at INTEGER
+            )
+            """
+        )
+        # Per-day domain and author totals and per-hour totals, see STORY_ROLLUPS
+        new_rollups = not conn.execute(
+            "SELECT COUNT(*) FROM duckdb_tables() WHERE database_name = current_database() AND table_name = 'hourly_stories'"
+        ).fetchone()[0]
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS domain_daily (
+                day DATE,
+                domain TEXT,
+                stories INTEGER,
+                points BIGINT,
+                comments BIGINT,
+                PRIMARY KEY (day, domain)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS author_daily (
+                day DATE,
+                author TEXT,
+                stories INTEGER,
+                points BIGINT,
+                comments BIGINT,
+                PRIMARY KEY (day, author)
+            )
+            """
+        )
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS hourly_stories (
+                hour TIMESTAMP PRIMARY KEY,
+                stories INTEGER,
+                points BIGINT,
+                comments BIGINT
+            )
+            """
+        )
+        # Every story, hot and archived; recreated whenever the archive changes
+        conn.execute(f"CREATE OR REPLACE VIEW all_stories AS {story_union_sql(archived_months())}")
+        # Databases created before the rollups existed start from their stored stories
+        if new_rollups:
+            _rebuild_story_rollups(conn)
         conn.close()
         logger.info("Database setup complete.")
         return True
@@ -41,14 +266,32 @@ def setup_db():
         logger.error(f"Error setting up database: {str(e)}")
         return False
 
-def execute_query(query, params=None):
-    """Execute a query and return the results."""
+# How query results are materialized, see execute_query
+FETCHERS = {
+    None: lambda cursor: cursor.fetchall(),
+    "numpy": lambda cursor: cursor.fetchnumpy(),
+    "arrow": lambda cursor: cursor.fetch_arrow_table(),
+}
+
+def execute_query(query, params=None, fetch=None, primary=False):
+    """
+    Execute a query and return the results.
+    
+    Args:
+        query: SQL query
+        params: Query parameters
+        fetch: None for a list of row tuples, "numpy" for a dict of column
+            arrays, or "arrow" for a pyarrow Table (requires pyarrow)
+        primary: Read the primary database even in replica mode, for reads
+            that decide what gets written (a replica can lag a publish interval)
+    """
     try:
-        conn = get_connection()
+        conn = get_connection() if primary else get_read_connection()
         if params:
-            result = conn.execute(query, params).fetchall()
+            cursor = conn.execute(query, params)
         else:
-            result = conn.execute(query).fetchall()
+            cursor = conn.execute(query)
+        result = FETCHERS[fetch](cursor)
         conn.close()
         return result
     except Exception as e:
@@ -57,6 +300,69 @@ def execute_query(query, params=None):
         logger.error(f"Params: {params}")
         raise
 
+def archived_months():
+    """Months ("YYYY-MM") with cold Parquet partitions, newest first."""
+    try:
+        names = os.listdir(ARCHIVE_DIR)
+    except FileNotFoundError:
+        return []
+    months = [
+        name[len("month="):] for name in names
+        if name.startswith("month=")
+        and any(f.endswith(".parquet") for f in os.listdir(os.path.join(ARCHIVE_DIR, name)))
+    ]
+    return sorted(months, reverse=True)
+
+def story_union_sql(months):
+    """
+    SQL for the hot table plus the given archive months.
+    
+    Archived copies of stories that are back in the hot table are skipped.
+    """
+    if not months:
+        return "SELECT * FROM hackernews"
+    files = ", ".join(
+        "'" + os.path.join(ARCHIVE_DIR, f"month={month}", "*.parquet").replace("'", "''") + "'"
+        for month in months
+    )
+    return f"""
+        SELECT * FROM hackernews
+        UNION ALL BY NAME
+        SELECT * EXCLUDE (month)
+        FROM read_parquet([{files}], hive_partitioning = true, union_by_name = true)
+        WHERE id NOT IN (SELECT id FROM hackernews)
+    """
+
+def _id_list_sql(ids):
+    """
+    Literal SQL list of story IDs.
+    
+    Unlike a parameter, a literal list is pushed into the archive's Parquet
+    scan, which then skips every row group whose ID range holds none of them.
+    """
+    return ", ".join(str(int(story_id)) for story_id in ids) or "NULL"
+
+def _result_size(result):
+    """Row count of a result in any fetch mode."""
+    if isinstance(result, dict):
+        return len(next(iter(result.values()), []))
+    if hasattr(result, "num_rows"):
+        return result.num_rows
+    return len(result)
+
+def query_recent(query, params, limit, fetch=None):
+    """
+    Run a newest-first query against as few storage tiers as possible.
+    
+    The query reads from a `{stories}` placeholder. It runs on the hot table
+    first, and only when that returns fewer than `limit` rows does it run
+    once more over `all_stories`, so the archive is scanned at most once.
+    """
+    result = execute_query(query.format(stories="hackernews"), params, fetch)
+    if _result_size(result) < limit and archived_months():
+        result = execute_query(query.format(stories="all_stories"), params, fetch)
+    return result
+
 def execute_and_commit(query, params=None):
     """Execute a query that modifies the database."""
     try:
@@ -73,107 +379,869 @@ def execute_and_commit(query, params=None):
         logger.error(f"Params: {params}")
         raise
 
-def insert_or_update_story(story, category):
-    """Insert a new story or update an existing one."""
-    if not story.get("title"):
-        return False  # Skip stories without titles
+def _fold_story_rollups(conn, source, params, sign):
+    """
+    Add (sign=1) or take out (sign=-1) a set of story versions in every STORY_ROLLUPS table.
     
-    try:
-        # Check if story exists
+    Args:
+        source: Subquery yielding the stories' time, url, by, score and descendants
+        params: Parameters of the subquery
+    """
+    for table, keys in STORY_ROLLUPS.items():
+        columns = ", ".join(keys)
+        query = f"""
+            INSERT INTO {table} ({columns}, stories, points, comments)
+            SELECT {", ".join(f"{expression} AS {column}" for column, expression in keys.items())},
+                   ? * COUNT(*), ? * COALESCE(SUM(score), 0), ? * COALESCE(SUM(descendants), 0)
+            FROM {source}
+            WHERE {" AND ".join(f"{expression} IS NOT NULL" for expression in keys.values())}
+            GROUP BY ALL
+            ON CONFLICT ({columns}) DO UPDATE SET
+                stories = {table}.stories + excluded.stories,
+                points = {table}.points + excluded.points,
+                comments = {table}.comments + excluded.comments
+        """
+        conn.execute(query, [sign, sign, sign] + params)
+
+def _prune_story_rollups(conn):
+    """Drop rollup rows no stored story contributes to any more."""
+    for table in STORY_ROLLUPS:
+        conn.execute(f"DELETE FROM {table} WHERE stories <= 0")
+
+def _rebuild_story_rollups(conn):
+    """Recompute every STORY_ROLLUPS table from all stored stories, hot and archived."""
+    for table, keys in STORY_ROLLUPS.items():
+        conn.execute(f"DELETE FROM {table}")
+        conn.execute(
+            f"""
+            INSERT INTO {table} ({", ".join(keys)}, stories, points, comments)
+            SELECT {", ".join(f"{expression} AS {column}" for column, expression in keys.items())},
+                   COUNT(*), COALESCE(SUM(score), 0), COALESCE(SUM(descendants), 0)
+            FROM all_stories
+            WHERE {" AND ".join(f"{expression} IS NOT NULL" for expression in keys.values())}
+            GROUP BY ALL
+            """
+        )
+
+def rebuild_story_rollups():
+    """Recompute the domain, author and hourly rollups from scratch, in one transaction."""
+    with _rollup_lock:
         conn = get_connection()
-        exists = conn.execute(
-            "SELECT COUNT(*) FROM hackernews WHERE id = ?", 
-            [story["id"]]
-        ).fetchone()[0] > 0
+        try:
+            conn.execute("BEGIN TRANSACTION")
+            _rebuild_story_rollups(conn)
+            conn.execute("COMMIT")
+            return True
+        except Exception as e:
+            conn.execute("ROLLBACK")
+            logger.error(f"Error rebuilding story rollups: {str(e)}")
+            return False
+        finally:
+            conn.close()
+
+def upsert_stories(stories):
+    """
+    Insert or update a batch of stories in a single statement.
+    
+    Args:
+        stories: Dicts in the common story schema (id, title, url, by, time,
+            score, descendants, type, category, source, canonical_id)
         
-        if exists:
-            query = """
-                UPDATE hackernews 
-                SET title = ?, url = ?, by = ?, time = ?, score = ?,
-                descendants = ?, type = ?, category = ? 
-                WHERE id = ?
-            """
-            params = [
-                story.get("title"), story.get("url"), story.get("by"), 
-                story.get("time"), story.get("score"), story.get("descendants"),
-                story.get("type"), category, story["id"]
-            ]
-        else:
-            query = """
-                INSERT INTO hackernews 
-                (id, title, url, by, time, score, descendants, type, category)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    Returns:
+        int: Number of stories written
+    """
+    # Last copy wins if the batch repeats an ID
+    stories = list({story["id"]: story for story in stories if story.get("title")}.values())
+    if not stories:
+        return 0
+    columns = ["id", "title", "url", "by", "time", "score", "descendants", "type", "category", "source",
+               "canonical_id"]
+    types = ["INTEGER", "TEXT", "TEXT", "TEXT", "INTEGER", "INTEGER", "INTEGER", "TEXT", "TEXT", "TEXT",
+             "INTEGER"]
+    unnest = ", ".join(f"UNNEST(?::{t}[]) AS {c}" for c, t in zip(columns, types))
+    # A pending marker never replaces a category the story already has
+    query = f"""
+        INSERT INTO hackernews ({", ".join(columns)})
+        SELECT * FROM (SELECT {unnest})
+        ON CONFLICT (id) DO UPDATE SET
+            title = excluded.title, url = excluded.url, by = excluded.by,
+            time = excluded.time, score = excluded.score,
+            descendants = excluded.descendants, type = excluded.type,
+            source = excluded.source,
+            canonical_id = COALESCE(excluded.canonical_id, hackernews.canonical_id),
+            category = CASE WHEN excluded.category = ? THEN hackernews.category
+                            ELSE excluded.category END
+    """
+    params = [[story.get(column) for story in stories] for column in columns]
+    ids = [story["id"] for story in stories]
+    with _rollup_lock:
+        conn = get_connection()
+        try:
+            previous = _previous_versions(conn, ids)
+            conn.execute(query, params + [PENDING_CATEGORY])
+        except Exception as e:
+            conn.close()
+            logger.error(f"Error upserting {len(stories)} stories: {str(e)}")
+            return 0
+        try:
+            _update_story_rollups(conn, previous, ids)
+        finally:
+            conn.close()
+    return len(stories)
+
+def _previous_versions(conn, ids):
+    """
+    ROLLUP_COLUMNS rows of the stored versions of stories about to be written.
+    
+    A story refetched after it was archived is already counted in the
+    rollups, so IDs missing from the hot table are looked up in the archive.
+    New stories have IDs above every archived one, so that lookup skips
+    every Parquet row group.
+    """
+    columns = ", ".join(ROLLUP_COLUMNS)
+    rows = conn.execute(
+        f"SELECT id, {columns} FROM hackernews WHERE id IN (SELECT UNNEST(?::INTEGER[]))", [ids]
+    ).fetchall()
+    missing = set(ids) - {row[0] for row in rows}
+    if missing and archived_months():
+        rows += conn.execute(f"SELECT id, {columns} FROM all_stories WHERE id IN ({_id_list_sql(missing)})").fetchall()
+    return [row[1:] for row in rows]
+
+def _update_story_rollups(conn, previous, ids):
+    """
+    Swap the previous versions of written stories for their stored ones in the rollups.
+    
+    Runs in its own transaction after the stories are written, so a failure
+    costs the rollups (rebuild_story_rollups repairs them), never the stories.
+    
+    Args:
+        previous: ROLLUP_COLUMNS rows of the stories as they were before the write
+        ids: IDs of the written stories
+    """
+    types = ["INTEGER", "TEXT", "TEXT", "INTEGER", "INTEGER"]
+    stored = f"(SELECT {', '.join(ROLLUP_COLUMNS)} FROM hackernews WHERE id IN (SELECT UNNEST(?::INTEGER[])))"
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        if previous:
+            unnest = ", ".join(f"UNNEST(?::{t}[]) AS {c}" for c, t in zip(ROLLUP_COLUMNS, types))
+            _fold_story_rollups(conn, f"(SELECT {unnest})", [list(column) for column in zip(*previous)], -1)
+        _fold_story_rollups(conn, stored, [list(ids)], 1)
+        _prune_story_rollups(conn)
+        conn.execute("COMMIT")
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        logger.error(f"Error updating story rollups: {str(e)}")
+
+def resolve_external_ids(source, guids):
+    """
+    Map item identifiers from a non-HN source to story IDs, assigning new ones as needed.
+    
+    Returns:
+        dict: guid -> story ID
+    """
+    guids = list(dict.fromkeys(guids))
+    if not guids:
+        return {}
+    # Read back on the same (primary) connection, never from a replica that predates the insert
+    conn = get_connection()
+    try:
+        conn.execute(
             """
-            params = [
-                story["id"], story.get("title"), story.get("url"), 
-                story.get("by"), story.get("time"), story.get("score"),
-                story.get("descendants"), story.get("type"), category
-            ]
+            INSERT INTO source_items (source, guid)
+            SELECT ?, UNNEST(?::TEXT[])
+            ON CONFLICT DO NOTHING
+            """,
+            [source, guids]
+        )
+        rows = conn.execute(
+            "SELECT guid, id FROM source_items WHERE source = ? AND guid IN (SELECT UNNEST(?::TEXT[]))",
+            [source, guids]
+        ).fetchall()
+    finally:
+        conn.close()
+    return dict(rows)
+
+def get_pending_stories(limit=32):
+    """
+    Get stories still waiting for the model tier.
+    
+    Ordered by an HN-style gravity score so fresh, fast-rising stories
+    are classified first.
+    """
+    try:
+        query = """
+            SELECT id, title
+            FROM hackernews
+            WHERE category = ?
+            ORDER BY (COALESCE(score, 0) + 1)
+                / POW(GREATEST(epoch(now()) - COALESCE(time, 0), 0) / 3600 + 2, 1.8) DESC
+            LIMIT ?
+        """
+        return execute_query(query, [PENDING_CATEGORY, limit], primary=True)
+    except Exception as e:
+        logger.error(f"Error getting pending stories: {str(e)}")
+        return []
+
+def update_categories(ids, categories, only_pending=False):
+    """
+    Write categories for many stories in a single UPDATE.
+    
+    Archived stories are first copied back into the hot table, where the
+    new category shadows the archived copy until the next archive run.
+    
+    Args:
+        ids: Story IDs
+        categories: Category for each ID
+        only_pending: Only touch rows still marked as pending
         
-        conn.execute(query, params)
+    Returns:
+        list: IDs of the stories actually updated, or None if the write failed
+    """
+    if not ids:
+        return []
+    query = """
+        UPDATE hackernews
+        SET category = u.category
+        FROM (SELECT UNNEST(?::INTEGER[]) AS id, UNNEST(?::TEXT[]) AS category) u
+        WHERE hackernews.id = u.id
+    """
+    params = [list(ids), list(categories)]
+    if only_pending:
+        query += " AND hackernews.category = ?"
+        params.append(PENDING_CATEGORY)
+    query += " RETURNING hackernews.id"
+    # Keep the digest rollups in step with the stories they copy
+    rollup_query = """
+        UPDATE daily_top_stories
+        SET category = h.category
+        FROM hackernews h
+        WHERE daily_top_stories.id = h.id AND h.id IN (SELECT UNNEST(?::INTEGER[]))
+          AND daily_top_stories.category IS DISTINCT FROM h.category
+    """
+    try:
+        conn = get_connection()
+        try:
+            missing = conn.execute(
+                "SELECT UNNEST(?::INTEGER[]) EXCEPT SELECT id FROM hackernews", [list(ids)]
+            ).fetchall()
+            if missing and archived_months():
+                conn.execute(
+                    f"INSERT INTO hackernews BY NAME SELECT * FROM all_stories "
+                    f"WHERE id IN ({_id_list_sql(row[0] for row in missing)})"
+                )
+            updated = [row[0] for row in conn.execute(query, params).fetchall()]
+            conn.execute(rollup_query, [list(ids)])
+        finally:
+            conn.close()
+        return updated
+    except Exception as e:
+        logger.error(f"Error updating categories: {str(e)}")
+        return None
+
+def get_story_chunk(after_id, limit):
+    """Get the next chunk of (id, title, category) rows in ID order, for keyset pagination."""
+    query = """
+        SELECT id, title, category
+        FROM all_stories
+        WHERE id > ?
+        ORDER BY id
+        LIMIT ?
+    """
+    return execute_query(query, [after_id, limit], primary=True)
+
+def get_reclassify_checkpoint(job):
+    """Get the saved (last_id, processed, changed) progress of a reclassification job, or None."""
+    result = execute_query(
+        "SELECT last_id, processed, changed FROM reclassify_jobs WHERE job = ?", [job], primary=True
+    )
+    return result[0] if result else None
+
+def save_reclassify_checkpoint(job, last_id, processed, changed):
+    """Record how far a reclassification job has got."""
+    return execute_and_commit(
+        """
+        INSERT OR REPLACE INTO reclassify_jobs (job, last_id, processed, changed, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        """,
+        [job, last_id, processed, changed, int(time.time())]
+    )
+
+def clear_reclassify_checkpoint(job):
+    """Forget a reclassification job's progress."""
+    return execute_and_commit("DELETE FROM reclassify_jobs WHERE job = ?", [job])
+
+def insert_snapshots(snapshots):
+    """
+    Append a batch of (id, ts, score, descendants) snapshots.
+    
+    Rows whose score and comment count are unchanged since the story's
+    latest snapshot are skipped, so idle stories add nothing.
+    
+    Returns:
+        bool: True on success
+    """
+    if not snapshots:
+        return True
+    ids, timestamps, scores, descendants = (list(column) for column in zip(*snapshots))
+    query = """
+        INSERT INTO story_snapshots
+        SELECT n.id, n.ts, n.score, n.descendants
+        FROM (
+            SELECT UNNEST(?::INTEGER[]) AS id, UNNEST(?::INTEGER[]) AS ts,
+                   UNNEST(?::INTEGER[]) AS score, UNNEST(?::INTEGER[]) AS descendants
+        ) n
+        LEFT JOIN (
+            SELECT id, arg_max(score, ts) AS score, arg_max(descendants, ts) AS descendants
+            FROM story_snapshots
+            WHERE id IN (SELECT UNNEST(?::INTEGER[]))
+            GROUP BY id
+        ) latest ON latest.id = n.id
+        WHERE latest.id IS NULL
+            OR latest.score IS DISTINCT FROM n.score
+            OR latest.descendants IS DISTINCT FROM n.descendants
+    """
+    try:
+        return execute_and_commit(query, [ids, timestamps, scores, descendants, ids])
+    except Exception as e:
+        logger.error(f"Error inserting snapshots: {str(e)}")
+        return False
+
+def compact_snapshots(now=None):
+    """
+    Downsample old snapshots and drop those past retention.
+    
+    Keeps the latest snapshot per story per hour once snapshots are older than
+    SNAPSHOT_HOURLY_AFTER_HOURS, and per day once older than SNAPSHOT_DAILY_AFTER_DAYS.
+    
+    Returns:
+        bool: True on success
+    """
+    now = int(now if now is not None else time.time())
+    hourly_cutoff = now - SNAPSHOT_HOURLY_AFTER_HOURS * 3600
+    daily_cutoff = now - SNAPSHOT_DAILY_AFTER_DAYS * 86400
+    retention_cutoff = now - SNAPSHOT_RETENTION_DAYS * 86400
+    try:
+        execute_and_commit("DELETE FROM story_snapshots WHERE ts < ?", [retention_cutoff])
+        execute_and_commit(
+            """
+            DELETE FROM story_snapshots USING (
+                SELECT id, ts
+                FROM (
+                    SELECT id, ts, ROW_NUMBER() OVER (
+                        PARTITION BY id, CASE WHEN ts < ? THEN ts // 86400 ELSE ts // 3600 END
+                        ORDER BY ts DESC
+                    ) AS rn
+                    FROM story_snapshots
+                    WHERE ts < ?
+                )
+                WHERE rn > 1
+            ) old
+            WHERE story_snapshots.id = old.id AND story_snapshots.ts = old.ts
+            """,
+            [daily_cutoff, hourly_cutoff]
+        )
+        conn = get_connection()
+        conn.execute("CHECKPOINT")
         conn.close()
         return True
     except Exception as e:
-        logger.error(f"Error inserting/updating story {story.get('id')}: {str(e)}")
+        logger.error(f"Error compacting snapshots: {str(e)}")
         return False
 
-def get_stories(category=None, limit=30):
-    """Get stories, optionally filtered by category."""
+def get_trending_stories(hours=6, limit=15, fetch=None):
+    """
+    Get the stories gaining points fastest over the last `hours` hours.
+    
+    Velocity is the score gained per hour since the window started (or since
+    the story was first seen), computed for all stories in one grouped query.
+    The latest snapshot before the window is used as the baseline, since
+    unchanged scores are not re-recorded.
+    """
+    try:
+        query = """
+            WITH bounds AS (
+                SELECT epoch(now()) AS now_ts, epoch(now()) - ? * 3600 AS start_ts
+            ),
+            windowed AS (
+                SELECT id, ts, score, descendants
+                FROM story_snapshots, bounds
+                WHERE ts >= start_ts
+            ),
+            baseline AS (
+                SELECT id, MAX(ts) AS ts, arg_max(score, ts) AS score, arg_max(descendants, ts) AS descendants
+                FROM story_snapshots, bounds
+                WHERE ts < start_ts AND id IN (SELECT id FROM windowed)
+                GROUP BY id
+            ),
+            window_stats AS (
+                SELECT id,
+                       arg_max(score, ts) - arg_min(score, ts) AS score_gain,
+                       arg_max(descendants, ts) - arg_min(descendants, ts) AS comment_gain,
+                       GREATEST((ANY_VALUE(now_ts) - GREATEST(MIN(ts), ANY_VALUE(start_ts))) / 3600.0, 1.0)
+                           AS elapsed_hours
+                FROM (SELECT * FROM windowed UNION ALL SELECT * FROM baseline), bounds
+                GROUP BY id
+            )
+            SELECT h.id, h.title, h.url, h.by, h.score, h.time, h.category,
+                   w.score_gain / w.elapsed_hours AS velocity,
+                   COALESCE(w.comment_gain, 0) / w.elapsed_hours AS comment_velocity
+            FROM window_stats w
+            JOIN hackernews h ON h.id = w.id
+            WHERE w.score_gain > 0
+            ORDER BY velocity DESC
+            LIMIT ?
+        """
+        return execute_query(query, [hours, limit], fetch)
+    except Exception as e:
+        logger.error(f"Error getting trending stories: {str(e)}")
+        return []
+
+def get_stories(category=None, limit=30, fetch=None, collapse_duplicates=False):
+    """Get stories, optionally filtered by category and with near-duplicates left out."""
     try:
+        duplicates = DUPLICATE_FILTER if collapse_duplicates else ""
         if category and category.lower() != 'all':
-            query = """
+            query = f"""
                 SELECT id, title, url, by, time, score, category 
-                FROM hackernews 
-                WHERE LOWER(category) = LOWER(?) 
+                FROM {{stories}} 
+                WHERE LOWER(category) = LOWER(?) {duplicates}
                 ORDER BY time DESC 
                 LIMIT ?
             """
-            return execute_query(query, [category, limit])
+            return query_recent(query, [category, limit], limit, fetch)
         else:
-            query = """
+            query = f"""
                 SELECT id, title, url, by, time, score, category 
-                FROM hackernews 
+                FROM {{stories}} 
+                WHERE TRUE {duplicates}
                 ORDER BY time DESC 
                 LIMIT ?
             """
-            return execute_query(query, [limit])
+            return query_recent(query, [limit], limit, fetch)
     except Exception as e:
         logger.error(f"Error getting stories: {str(e)}")
         return []
 
-def search_stories(search_term, category=None, limit=50):
-    """Search for stories by keyword, optionally filtered by category."""
+def search_stories(search_term, category=None, limit=50, fetch=None, collapse_duplicates=False):
+    """Search for stories by keyword, optionally filtered by category and with near-duplicates left out."""
     try:
         search_param = f"%{search_term}%"
+        duplicates = DUPLICATE_FILTER if collapse_duplicates else ""
         
         if category and category.lower() != 'all':
-            query = """
+            query = f"""
                 SELECT id, title, url, by, time, score, category 
-                FROM hackernews 
-                WHERE (title ILIKE ? OR url ILIKE ? OR by ILIKE ?) AND LOWER(category) = LOWER(?)
+                FROM {{stories}} 
+                WHERE (title ILIKE ? OR url ILIKE ? OR by ILIKE ?) AND LOWER(category) = LOWER(?) {duplicates}
                 ORDER BY time DESC 
                 LIMIT ?
             """
-            return execute_query(query, [search_param, search_param, search_param, category, limit])
+            return query_recent(query, [search_param, search_param, search_param, category, limit], limit, fetch)
         else:
-            query = """
+            query = f"""
                 SELECT id, title, url, by, time, score, category 
-                FROM hackernews 
-                WHERE title ILIKE ? OR url ILIKE ? OR by ILIKE ?
+                FROM {{stories}} 
+                WHERE (title ILIKE ? OR url ILIKE ? OR by ILIKE ?) {duplicates}
                 ORDER BY time DESC 
                 LIMIT ?
             """
-            return execute_query(query, [search_param, search_param, search_param, limit])
+            return query_recent(query, [search_param, search_param, search_param, limit], limit, fetch)
     except Exception as e:
         logger.error(f"Error searching stories: {str(e)}")
         return []
 
+def search_with_facets(search_term, category=None, limit=50, fetch=None, collapse_duplicates=False):
+    """
+    Search for stories and count the matches by category, domain and age in the same pass.
+    
+    The stories are scanned once to collect the ID, time, category and domain
+    of every match into a temporary table. The facet counts and the IDs of
+    the page are read from that table, and only the page's stories are then
+    looked up in full, so a broad term never copies every matching title
+    and URL. Category counts ignore the category filter, so the UI can show how
+    many matches each other category would give. Domain and age counts
+    respect it.
+    
+    Returns:
+        tuple: (stories in the given fetch mode, facets dict with total,
+            category, domain and time lists of {"value", "count"})
+    """
+    filtered = bool(category) and category.lower() != 'all'
+    in_category = "LOWER(category) = LOWER($category)" if filtered else "TRUE"
+    params = {"term": f"%{search_term}%"}
+    filters = {"category": category} if filtered else {}
+    duplicates = DUPLICATE_FILTER if collapse_duplicates else ""
+    ages = ", ".join(
+        f"count(*) FILTER (WHERE {in_category} AND time >= $since_{name})" for name, _ in SEARCH_TIME_FACETS
+    )
+    now = int(time.time())
+    try:
+        conn = get_read_connection()
+        try:
+            conn.execute(
+                f"""
+                CREATE TEMP TABLE search_matches AS
+                SELECT id, time, category, {DOMAIN_SQL} AS domain
+                FROM all_stories
+                WHERE (title ILIKE $term OR url ILIKE $term OR by ILIKE $term) {duplicates}
+                """,
+                params
+            )
+            page = [row[0] for row in conn.execute(
+                f"""
+                SELECT id
+                FROM search_matches
+                WHERE {in_category}
+                ORDER BY time DESC
+                LIMIT $limit
+                """,
+                dict(filters, limit=limit)
+            ).fetchall()]
+            stories = FETCHERS[fetch](conn.execute(
+                f"""
+                SELECT id, title, url, by, time, score, category
+                FROM all_stories
+                WHERE id IN ({_id_list_sql(page)})
+                ORDER BY time DESC, id
+                """
+            ))
+            # GROUPING() is 1 for category rows, 2 for domain rows and 3 for the grand total
+            rows = conn.execute(
+                f"""
+                SELECT GROUPING(category, domain), category, domain,
+                       count(*), count(*) FILTER (WHERE {in_category}), {ages}
+                FROM search_matches
+                GROUP BY GROUPING SETS ((category), (domain), ())
+                """,
+                dict(filters, **{f"since_{name}": now - seconds for name, seconds in SEARCH_TIME_FACETS})
+            ).fetchall()
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.error(f"Error searching stories with facets: {str(e)}")
+        return [], {"total": 0, "category": [], "domain": [], "time": []}
+
+    by_count = lambda facet: (-facet["count"], facet["value"])
+    categories = sorted(
+        ({"value": row[1] or "Uncategorized", "count": row[3]} for row in rows if row[0] == 1), key=by_count
+    )
+    domains = sorted(
+        ({"value": row[2], "count": row[4]} for row in rows if row[0] == 2 and row[2] and row[4]), key=by_count
+    )
+    total = next((row for row in rows if row[0] == 3), None)
+    facets = {
+        "total": total[4] if total else 0,
+        "category": categories,
+        "domain": domains[:SEARCH_DOMAIN_FACETS],
+        "time": [
+            {"value": name, "count": total[5 + i] if total else 0} for i, (name, _) in enumerate(SEARCH_TIME_FACETS)
+        ],
+    }
+    return stories, facets
+
+def get_ranked_stories(ids, similarities, category=None, limit=50, fetch=None):
+    """
+    Get stories by ID in the given order, with their similarity scores.
+    
+    Args:
+        ids: Story IDs, best match first
+        similarities: Similarity of each story to the query
+        category: Optional category filter
+        limit: Maximum number of stories
+        fetch: Fetch mode (see execute_query)
+    """
+    try:
+        params = [list(ids), list(range(len(ids))), list(similarities)]
+        category_filter = ""
+        if category and category.lower() != 'all':
+            category_filter = "WHERE LOWER(h.category) = LOWER(?)"
+            params.append(category)
+        query = f"""
+            SELECT h.id, h.title, h.url, h.by, h.time, h.score, h.category, r.similarity
+            FROM (
+                SELECT UNNEST(?::INTEGER[]) AS id, UNNEST(?::INTEGER[]) AS rank,
+                       UNNEST(?::DOUBLE[]) AS similarity
+            ) r
+            JOIN all_stories h ON h.id = r.id
+            {category_filter}
+            ORDER BY r.rank
+            LIMIT ?
+        """
+        return execute_query(query, params + [limit], fetch)
+    except Exception as e:
+        logger.error(f"Error getting ranked stories: {str(e)}")
+        return []
+
+def get_feed_candidates(hours=72, per_category=300, gravity=1.8, fetch=None):
+    """
+    Get the best recent canonical stories of each category, for personalized ranking.
+    
+    Stories are ranked within their category by HN-style gravity, and each
+    row carries the link's domain.
+    """
+    try:
+        now = int(time.time())
+        query = f"""
+            SELECT id, title, url, by, time, score, category, {DOMAIN_SQL} AS domain
+            FROM hackernews
+            WHERE time >= ? AND canonical_id IS NULL
+            QUALIFY row_number() OVER (
+                PARTITION BY category
+                ORDER BY (COALESCE(score, 0) + 1) / power((? - time) / 3600.0 + 2, ?) DESC
+            ) <= ?
+        """
+        return execute_query(query, [now - int(hours * 3600), now, gravity, per_category], fetch)
+    except Exception as e:
+        logger.error(f"Error getting feed candidates: {str(e)}")
+        return []
+
+def get_profile(user_id):
+    """Get a user's (category_weights JSON, followed_authors, muted_domains), or None."""
+    rows = execute_query(
+        "SELECT category_weights, followed_authors, muted_domains FROM user_profiles WHERE user_id = ?",
+        [user_id]
+    )
+    return rows[0] if rows else None
+
+def save_profile(user_id, category_weights, followed_authors, muted_domains):
+    """Create or replace a user's profile."""
+    query = """
+        INSERT INTO user_profiles (user_id, category_weights, followed_authors, muted_domains, updated_at)
+        VALUES (?, ?, ?, ?, ?)
+        ON CONFLICT (user_id) DO UPDATE SET
+            category_weights = excluded.category_weights,
+            followed_authors = excluded.followed_authors,
+            muted_domains = excluded.muted_domains,
+            updated_at = excluded.updated_at
+    """
+    try:
+        return execute_and_commit(query, [user_id, category_weights, followed_authors, muted_domains,
+                                          int(time.time())])
+    except Exception as e:
+        logger.error(f"Error saving profile {user_id}: {str(e)}")
+        return False
+
+def update_daily_rollups(stories, keep=50):
+    """
+    Fold a batch of stories into the per-day, per-category top lists.
+    
+    Args:
+        stories: Dicts in the common story schema
+        keep: Stories kept per day and category
+    """
+    stories = [story for story in stories if story.get("time") is not None]
+    if not stories:
+        return True
+    columns = ["id", "time", "category", "title", "url", "by", "score", "descendants"]
+    types = ["INTEGER", "INTEGER", "TEXT", "TEXT", "TEXT", "TEXT", "INTEGER", "INTEGER"]
+    unnest = ", ".join(f"UNNEST(?::{t}[]) AS {c}" for c, t in zip(columns, types))
+    upsert = f"""
+        INSERT INTO daily_top_stories (day, id, category, title, url, by, score, descendants)
+        SELECT CAST(to_timestamp(time) AT TIME ZONE 'UTC' AS DATE), id, category, title, url, by, score, descendants
+        FROM (SELECT {unnest})
+        ON CONFLICT (day, id) DO UPDATE SET
+            title = excluded.title, url = excluded.url, by = excluded.by,
+            score = excluded.score, descendants = excluded.descendants,
+            category = CASE WHEN excluded.category = ? THEN daily_top_stories.category
+                            ELSE excluded.category END
+    """
+    # Only the days this batch touched need trimming
+    trim = """
+        DELETE FROM daily_top_stories
+        USING (
+            SELECT day, id FROM daily_top_stories
+            WHERE day IN (SELECT DISTINCT CAST(to_timestamp(UNNEST(?::INTEGER[])) AT TIME ZONE 'UTC' AS DATE))
+            QUALIFY row_number() OVER (PARTITION BY day, category ORDER BY score DESC NULLS LAST, id) > ?
+        ) AS extra
+        WHERE daily_top_stories.day = extra.day AND daily_top_stories.id = extra.id
+    """
+    params = [[story.get(column) for story in stories] for column in columns]
+    try:
+        execute_and_commit(upsert, params + [PENDING_CATEGORY])
+        return execute_and_commit(trim, [[story["time"] for story in stories], keep])
+    except Exception as e:
+        logger.error(f"Error updating daily rollups: {str(e)}")
+        return False
+
+def rebuild_daily_rollups(since, keep=50):
+    """Recompute the daily top lists from stored stories posted since a Unix time."""
+    query = """
+        INSERT OR REPLACE INTO daily_top_stories (day, id, category, title, url, by, score, descendants)
+        SELECT CAST(to_timestamp(time) AT TIME ZONE 'UTC' AS DATE) AS day, id, category, title, url, by, score, descendants
+        FROM all_stories
+        WHERE time >= ? AND canonical_id IS NULL
+        QUALIFY row_number() OVER (PARTITION BY day, category ORDER BY score DESC NULLS LAST, id) <= ?
+    """
+    try:
+        execute_and_commit(
+            "DELETE FROM daily_top_stories WHERE day >= CAST(to_timestamp(?) AT TIME ZONE 'UTC' AS DATE)", [since]
+        )
+        return execute_and_commit(query, [since, keep])
+    except Exception as e:
+        logger.error(f"Error rebuilding daily rollups: {str(e)}")
+        return False
+
+def get_digest_stories(start_day, end_day, per_category=5):
+    """Get the top stories of each category over [start_day, end_day) from the daily rollups."""
+    query = """
+        SELECT category, id, title, url, by, score, descendants
+        FROM daily_top_stories
+        WHERE day >= ? AND day < ? AND category IS NOT NULL AND category <> ?
+        QUALIFY row_number() OVER (PARTITION BY category ORDER BY score DESC NULLS LAST, id) <= ?
+        ORDER BY category, score DESC NULLS LAST, id
+    """
+    return execute_query(query, [start_day, end_day, PENDING_CATEGORY, per_category])
+
+def get_digest_subscribers():
+    """Get all (email, categories) digest subscriptions."""
+    return execute_query("SELECT email, categories FROM digest_subscribers ORDER BY email")
+
+def save_digest_subscriber(email, categories=None):
+    """Subscribe an address to the digest, optionally limited to some categories."""
+    query = """
+        INSERT INTO digest_subscribers (email, categories, created_at) VALUES (?, ?, ?)
+        ON CONFLICT (email) DO UPDATE SET categories = excluded.categories
+    """
+    return execute_and_commit(query, [email, categories, int(time.time())])
+
+def get_synced_comment_counts(story_ids):
+    """Comment counts of stories at their last comment sync, keyed by story ID."""
+    rows = execute_query(
+        "SELECT story, descendants FROM comment_threads WHERE story IN (SELECT UNNEST(?::INTEGER[]))",
+        [list(story_ids)],
+        primary=True
+    )
+    return dict(rows)
+
+def save_comments(comments, deleted_ids, synced_counts):
+    """
+    Write the result of a comment sync in one transaction.
+    
+    Args:
+        comments: Dicts with id, parent, story, by, time and text
+        deleted_ids: IDs of comments that are now deleted or dead
+        synced_counts: {story ID: comment count} of the threads synced completely
+        
+    Returns:
+        bool: True on success
+    """
+    columns = ["id", "parent", "story", "by", "time", "text"]
+    types = ["INTEGER", "INTEGER", "INTEGER", "TEXT", "INTEGER", "TEXT"]
+    unnest = ", ".join(f"UNNEST(?::{t}[]) AS {c}" for c, t in zip(columns, types))
+    comments = list({comment["id"]: comment for comment in comments}.values())
+    conn = get_connection()
+    try:
+        conn.execute("BEGIN TRANSACTION")
+        if comments:
+            conn.execute(
+                f"""
+                INSERT INTO comments ({", ".join(columns)})
+                SELECT * FROM (SELECT {unnest})
+                ON CONFLICT (id) DO UPDATE SET
+                    parent = excluded.parent, story = excluded.story, by = excluded.by,
+                    time = excluded.time, text = excluded.text
+                """,
+                [[comment.get(column) for comment in comments] for column in columns]
+            )
+        if deleted_ids:
+            conn.execute("DELETE FROM comments WHERE id IN (SELECT UNNEST(?::INTEGER[]))", [list(deleted_ids)])
+        if synced_counts:
+            conn.execute(
+                """
+                INSERT INTO comment_threads
+                SELECT UNNEST(?::INTEGER[]), UNNEST(?::INTEGER[]), ?
+                ON CONFLICT (story) DO UPDATE SET
+                    descendants = excluded.descendants, synced_at = excluded.synced_at
+                """,
+                [list(synced_counts), list(synced_counts.values()), int(time.time())]
+            )
+        conn.execute("COMMIT")
+        return True
+    except Exception as e:
+        conn.execute("ROLLBACK")
+        logger.error(f"Error saving {len(comments)} comments: {str(e)}")
+        return False
+    finally:
+        conn.close()
+
+def get_comments(story_id):
+    """A story's comments as (id, parent, by, time, text) rows, oldest first."""
+    return execute_query(
+        "SELECT id, parent, by, time, text FROM comments WHERE story = ? ORDER BY time, id",
+        [story_id]
+    )
+
+# Story fields written by /export, in order
+EXPORT_COLUMNS = ["id", "title", "url", "by", "time", "score", "descendants", "category", "source"]
+
+def iter_stories(category=None, search_term=None, since=None, until=None, collapse_duplicates=False,
+                 limit=None, batch_size=10000, arrow=False):
+    """
+    Stream the stories matching some filters, hot and archived, in batches.
+    
+    Rows come in storage order: sorting would have to read the whole result
+    before the first row. The query runs as a streaming DuckDB result, so
+    only one batch is held in memory at a time. The connection stays open
+    until the generator is exhausted or closed.
+    
+    Args:
+        category: Only this category
+        search_term: Only stories whose title, URL or author contains it
+        since, until: Only stories posted in [since, until) (Unix times)
+        collapse_duplicates: Leave out near-duplicates
+        limit: Maximum number of stories (None for all)
+        batch_size: Rows per batch
+        arrow: Yield pyarrow RecordBatches instead of lists of row tuples
+    """
+    conditions, params = [], []
+    if category and category.lower() != 'all':
+        conditions.append("LOWER(category) = LOWER(?)")
+        params.append(category)
+    if search_term:
+        conditions.append("(title ILIKE ? OR url ILIKE ? OR by ILIKE ?)")
+        params += [f"%{search_term}%"] * 3
+    if since is not None:
+        conditions.append("time >= ?")
+        params.append(since)
+    if until is not None:
+        conditions.append("time < ?")
+        params.append(until)
+    if collapse_duplicates:
+        conditions.append("canonical_id IS NULL")
+    query = f"SELECT {', '.join(EXPORT_COLUMNS)} FROM all_stories WHERE {' AND '.join(conditions) or 'TRUE'}"
+    if limit is not None:
+        query += " LIMIT ?"
+        params.append(limit)
+
+    conn = get_read_connection()
+    try:
+        cursor = conn.execute(query, params)
+        if arrow:
+            import pyarrow as pa
+            
+            reader = cursor.fetch_record_batch(batch_size)
+            empty = True
+            for batch in reader:
+                empty = False
+                yield batch
+            if empty:
+                # Keeps the column types of a result with no rows
+                yield pa.RecordBatch.from_pylist([], schema=reader.schema)
+            return
+        while True:
+            rows = cursor.fetchmany(batch_size)
+            if not rows:
+                break
+            yield rows
+    finally:
+        conn.close()
+
 def get_categories():
     """Get all available categories and their counts."""
     try:
         query = """
             SELECT category, COUNT(*) as count
-            FROM hackernews
+            FROM all_stories
             GROUP BY category
             ORDER BY count DESC
         """
@@ -185,10 +1253,10 @@ def get_categories():
 def get_stats():
     """Get basic stats about the database."""
     try:
-        total = execute_query("SELECT COUNT(*) FROM hackernews")[0][0]
+        total = execute_query("SELECT COUNT(*) FROM all_stories")[0][0]
         categories = execute_query("""
             SELECT category, COUNT(*) as count
-            FROM hackernews
+            FROM all_stories
             GROUP BY category
             ORDER BY count DESC
         """)
@@ -203,41 +1271,81 @@ def get_stats():
         logger.error(f"Error getting stats: {str(e)}")
         return {"total_stories": 0, "categories": []}
 
-def get_top_stories(timeframe="recent", limit=15):
+def _leaderboard(table, key, days, limit, sort):
+    """Top keys of a daily rollup over the last `days` days (today included), by a LEADERBOARD_SORTS column."""
+    if sort not in LEADERBOARD_SORTS:
+        raise ValueError(f"Unsupported sort: {sort}")
+    query = f"""
+        SELECT {key}, SUM(stories) AS stories, SUM(points) AS points, SUM(comments) AS comments
+        FROM {table}
+        WHERE day > CAST(to_timestamp(?) AT TIME ZONE 'UTC' AS DATE)
+        GROUP BY {key}
+        ORDER BY {sort} DESC, {key}
+        LIMIT ?
+    """
+    return execute_query(query, [int(time.time()) - days * 86400, limit])
+
+def get_domain_leaderboard(days=30, limit=20, sort="stories"):
+    """Get (domain, stories, points, comments) rows of the busiest domains, from the daily rollups."""
+    return _leaderboard("domain_daily", "domain", days, limit, sort)
+
+def get_author_leaderboard(days=30, limit=20, sort="stories"):
+    """Get (author, stories, points, comments) rows of the busiest authors, from the daily rollups."""
+    return _leaderboard("author_daily", "author", days, limit, sort)
+
+def get_hourly_histogram(hours=48):
+    """Get (hour start as Unix time, stories, points, comments) for each of the last `hours` UTC hours, oldest first."""
+    query = """
+        SELECT CAST(epoch(h.hour) AS BIGINT), COALESCE(s.stories, 0), COALESCE(s.points, 0), COALESCE(s.comments, 0)
+        FROM range(
+            date_trunc('hour', to_timestamp(?) AT TIME ZONE 'UTC'),
+            date_trunc('hour', to_timestamp(?) AT TIME ZONE 'UTC') + INTERVAL 1 HOUR,
+            INTERVAL 1 HOUR
+        ) AS h(hour)
+        LEFT JOIN hourly_stories s ON s.hour = h.hour
+        ORDER BY h.hour
+    """
+    now = int(time.time())
+    return execute_query(query, [now - (hours - 1) * 3600, now])
+
+def get_top_stories(timeframe="recent", limit=15, fetch=None, collapse_duplicates=False):
     """Get top stories by points."""
     try:
+        duplicates = DUPLICATE_FILTER if collapse_duplicates else ""
         if timeframe == "recent":
-            query = """
+            query = f"""
                 SELECT id, title, url, by, score, time, category
-                FROM hackernews
-                WHERE score IS NOT NULL AND score > 10
+                FROM {{stories}}
+                WHERE score IS NOT NULL AND score > 10 {duplicates}
                 ORDER BY time DESC, score DESC
                 LIMIT ?
             """
-        else:  # all-time
-            query = """
+            return query_recent(query, [limit], limit, fetch)
+        else:  # all-time, across every tier
+            query = f"""
                 SELECT id, title, url, by, score, time, category
-                FROM hackernews
-                WHERE score IS NOT NULL
+                FROM all_stories
+                WHERE score IS NOT NULL {duplicates}
                 ORDER BY score DESC
                 LIMIT ?
             """
-        return execute_query(query, [limit])
+            return execute_query(query, [limit], fetch)
     except Exception as e:
         logger.error(f"Error getting top stories: {str(e)}")
         return []
 
-def get_autocomplete_suggestions(prefix, limit=7):
+def get_autocomplete_suggestions(prefix, limit=7, collapse_duplicates=False):
     """Get title suggestions for autocomplete."""
     try:
         if not prefix.strip():
             return []
             
         search_param = f"{prefix}%"
-        query = """
+        duplicates = DUPLICATE_FILTER if collapse_duplicates else ""
+        query = f"""
             SELECT DISTINCT title
             FROM hackernews
-            WHERE title ILIKE ?
+            WHERE title ILIKE ? {duplicates}
             ORDER BY time DESC
             LIMIT ?
         """
@@ -251,8 +1359,8 @@ def ensure_test_data():
     try:
         conn = get_connection()
         
-        # Check if we have data
-        count = conn.execute("SELECT COUNT(*) FROM hackernews").fetchone()[0]
+        # Check if we have data, archived stories included
+        count = conn.execute("SELECT COUNT(*) FROM all_stories").fetchone()[0]
         
         # If no data, insert some test data
         if count == 0:
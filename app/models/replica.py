@@ -0,0 +1,83 @@
+"""
+Read replica publishing.
+
+DuckDB allows one read-write process per database file. To keep web
+workers from waiting on the ingester's lock, the ingester periodically
+copies its database into a new immutable file under REPLICA_DIR. It then
+swaps the CURRENT pointer to that file with an atomic rename. Processes
+running with DB_READ_MODE="replica" open the file CURRENT names read-only
+for every query (see database.get_read_connection). New queries see the new
+copy at once, and queries already running finish on the old one.
+"""
+import logging
+import os
+import time
+
+from app.config.settings import REPLICA_DIR, REPLICA_KEEP
+from app.models.database import get_connection
+
+logger = logging.getLogger(__name__)
+
+REPLICA_PREFIX = "hackernews-"
+REPLICA_SUFFIX = ".duckdb"
+
+
+def _sql_path(path):
+    """Quote a file path as an SQL string literal."""
+    return "'" + path.replace("'", "''") + "'"
+
+
+def publish_replica():
+    """
+    Copy the primary database into a new replica and make it current.
+
+    Returns:
+        str: Path of the published replica, or None on failure
+    """
+    os.makedirs(REPLICA_DIR, exist_ok=True)
+    name = f"{REPLICA_PREFIX}{int(time.time() * 1000):015d}{REPLICA_SUFFIX}"
+    path = os.path.join(REPLICA_DIR, name)
+    tmp = path + ".tmp"
+    started = time.monotonic()
+
+    try:
+        conn = get_connection()
+        try:
+            # COPY FROM DATABASE reads one consistent snapshot of the primary
+            database = conn.execute("SELECT current_database()").fetchone()[0]
+            conn.execute(f"ATTACH {_sql_path(tmp)} AS replica")
+            conn.execute(f'COPY FROM DATABASE "{database}" TO replica')
+            conn.execute("DETACH replica")
+        finally:
+            conn.close()
+        os.replace(tmp, path)
+
+        pointer = os.path.join(REPLICA_DIR, "CURRENT")
+        with open(pointer + ".tmp", "w") as f:
+            f.write(name)
+        os.replace(pointer + ".tmp", pointer)
+    except Exception as e:
+        logger.error(f"Error publishing replica: {str(e)}")
+        for leftover in (tmp, tmp + ".wal"):
+            if os.path.exists(leftover):
+                os.remove(leftover)
+        return None
+
+    prune_replicas()
+    logger.info(f"Published replica {name} in {time.monotonic() - started:.2f}s")
+    return path
+
+
+def prune_replicas(keep=REPLICA_KEEP):
+    """
+    Delete all but the newest `keep` replicas.
+
+    Readers that still have an old replica open keep reading it until they
+    close it; the file is only unlinked.
+    """
+    replicas = sorted(
+        name for name in os.listdir(REPLICA_DIR)
+        if name.startswith(REPLICA_PREFIX) and name.endswith(REPLICA_SUFFIX)
+    )
+    for name in replicas[:-keep] if keep else replicas:
+        os.remove(os.path.join(REPLICA_DIR, name))
@@ -0,0 +1,168 @@
+"""
+Static asset pipeline.
+
+The stylesheets and scripts under static/ are built into ASSET_DIR:
+- minified (CSS always; JS when the optional `rjsmin` package is installed)
+- named after a hash of their content, e.g. css/styles.3f9a1c0b2d.css
+- precompressed with gzip, plus brotli when the `brotli` package is installed
+
+manifest.json maps each source path to its built name. Because a name
+changes whenever the content does, /assets responses can be cached forever
+("immutable"), and templates link to the current build through asset_url().
+
+The build runs when the app starts and only writes files whose content is
+new, so it is cheap to repeat. `flask --app wsgi build-assets` runs it by hand.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+
+from flask import url_for
+from werkzeug.security import safe_join
+
+from app.config.settings import ASSETS_ENABLED, STATIC_DIR, ASSET_DIR
+
+logger = logging.getLogger(__name__)
+
+ASSET_EXTENSIONS = (".css", ".js")
+# Precompressed variants, most preferred first: (Content-Encoding, file suffix)
+ENCODINGS = [("br", ".br"), ("gzip", ".gz")]
+
+
+def minify_css(text):
+    """Strip comments and the whitespace CSS doesn't need."""
+    text = re.sub(r"/\*.*?\*/", "", text, flags=re.S)
+    text = re.sub(r"\s+", " ", text)
+    # Spaces before ":" are kept, since "a :hover" and "a:hover" differ
+    text = re.sub(r"\s*([{};,>])\s*", r"\1", text)
+    text = re.sub(r":\s+", ":", text)
+    return text.replace(";}", "}").strip()
+
+
+def minify_js(text):
+    """Minify a script with rjsmin if it is installed, else leave it as is."""
+    try:
+        import rjsmin
+    except ImportError:
+        return text
+    return rjsmin.jsmin(text)
+
+
+MINIFIERS = {".css": minify_css, ".js": minify_js}
+
+
+def _write(path, data):
+    """Write a file atomically, so concurrent builds never expose a partial one."""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def _compressed(data):
+    """Precompressed variants of an asset, keyed by file suffix."""
+    variants = {".gz": gzip.compress(data, 9, mtime=0)}
+    try:
+        import brotli
+    except ImportError:
+        return variants
+    variants[".br"] = brotli.compress(data, quality=11)
+    return variants
+
+
+def build_assets(source_dir=None, out_dir=None):
+    """
+    Build every stylesheet and script under source_dir into out_dir.
+
+    Returns:
+        dict: The manifest, {source path: built path}, relative to the directories
+    """
+    source_dir = source_dir or STATIC_DIR
+    out_dir = out_dir or ASSET_DIR
+    manifest = {}
+    for root, dirs, files in os.walk(source_dir):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != os.path.normpath(out_dir)]
+        for name in files:
+            stem, ext = os.path.splitext(name)
+            if ext not in ASSET_EXTENSIONS:
+                continue
+            source = os.path.relpath(os.path.join(root, name), source_dir).replace(os.sep, "/")
+            with open(os.path.join(root, name), encoding="utf-8") as f:
+                data = MINIFIERS[ext](f.read()).encode("utf-8")
+            digest = hashlib.sha256(data).hexdigest()[:10]
+            built = f"{os.path.dirname(source)}/{stem}.{digest}{ext}".lstrip("/")
+            path = os.path.join(out_dir, built)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                for suffix, variant in _compressed(data).items():
+                    _write(path + suffix, variant)
+                _write(path, data)
+            manifest[source] = built
+
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, "manifest.json")
+    encoded = json.dumps(manifest, indent=2, sort_keys=True).encode("utf-8")
+    # Rewriting an unchanged manifest would invalidate cached pages for nothing
+    if os.path.exists(manifest_path):
+        with open(manifest_path, "rb") as f:
+            if f.read() == encoded:
+                encoded = None
+    if encoded is not None:
+        _write(manifest_path, encoded)
+    logger.info(f"Built {len(manifest)} static assets")
+    return manifest
+
+
+# Loaded manifest, cached by the file's modification time
+_manifest = (None, {})
+
+
+def manifest_version():
+    """Identifies the current build (the manifest's mtime), or None when assets aren't built."""
+    if not ASSETS_ENABLED:
+        return None
+    try:
+        return os.stat(os.path.join(ASSET_DIR, "manifest.json")).st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def load_manifest():
+    """The current manifest; empty when assets are disabled or not built."""
+    global _manifest
+    version = manifest_version()
+    if version is None:
+        return {}
+    if _manifest[0] != version:
+        with open(os.path.join(ASSET_DIR, "manifest.json"), encoding="utf-8") as f:
+            _manifest = (version, json.load(f))
+    return _manifest[1]
+
+
+def asset_url(filename):
+    """URL of a static file: its fingerprinted build if there is one, else the raw file."""
+    built = load_manifest().get(filename)
+    if built:
+        return url_for("api.asset", filename=built)
+    return url_for("static", filename=filename)
+
+
+def find_asset(filename, accepts):
+    """
+    Pick the file to send for a built asset.
+
+    Args:
+        filename: Built path, relative to ASSET_DIR
+        accepts: Predicate telling whether the client accepts a content encoding
+
+    Returns:
+        tuple: (file name relative to ASSET_DIR, Content-Encoding or None)
+    """
+    for encoding, suffix in ENCODINGS:
+        path = safe_join(ASSET_DIR, filename + suffix)
+        if accepts(encoding) and path and os.path.isfile(path):
+            return filename + suffix, encoding
+    return filename, None
@@ -0,0 +1,203 @@
+"""
+Fan-out of story updates to Server-Sent Events clients.
+
+Each process has a single broadcaster. Messages are encoded once per
+publish and handed to every subscriber's bounded queue, so a sync costs
+one broadcast no matter how many tabs are listening.
+
+Syncs run in one process (the ingester, or the worker that served /update)
+while clients are spread over every web worker. With a relay directory,
+each process with clients binds a Unix datagram socket there, and publish
+sends the encoded message to every socket in it, its own included; a
+thread in each process hands what arrives to that process's clients.
+"""
+import asyncio
+import errno
+import glob
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+
+from app.config.settings import STREAM_CLIENT_BUFFER, STREAM_RELAY, STREAM_RELAY_DIR
+
+logger = logging.getLogger(__name__)
+
+# Sent to a client whose buffer overflowed; it should refetch instead of applying deltas
+RESYNC_MESSAGE = "event: resync\ndata: {}\n\n"
+
+
+def format_event(event, data):
+    """Encode an SSE message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+class AsyncSubscription:
+    """Bounded queue for a client served from an asyncio event loop."""
+
+    def __init__(self, loop, buffer_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+
+    def put_nowait(self, message):
+        """Hand a message over to the client's event loop (safe from any thread)."""
+        self.loop.call_soon_threadsafe(self._put, message)
+
+    def _put(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_MESSAGE)
+
+    async def get(self):
+        """Wait for the next message."""
+        return await self.queue.get()
+
+
+class SocketRelay:
+    """Passes messages between the processes sharing a directory of Unix datagram sockets."""
+
+    def __init__(self, directory, deliver):
+        self.directory = directory
+        self.deliver = deliver
+        self.path = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._sender = self._new_sender()
+
+    @staticmethod
+    def _new_sender():
+        # Never block a sync on a process that has stopped reading
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.setblocking(False)
+        return sender
+
+    def listen(self):
+        """Bind this process's socket and start receiving, once per process (forked workers included)."""
+        with self._lock:
+            if self._pid == os.getpid():
+                return
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, f"{os.getpid()}.sock")
+            # A socket file left by an earlier process with the same PID
+            if os.path.exists(path):
+                os.remove(path)
+            receiver = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            receiver.bind(path)
+            self._sender = self._new_sender()
+            self.path, self._pid = path, os.getpid()
+        thread = threading.Thread(target=self._receive, args=(receiver,), name="stream-relay")
+        thread.daemon = True
+        thread.start()
+        logger.info(f"Relaying stream updates through {path}")
+
+    def _receive(self, receiver):
+        while True:
+            data = receiver.recv(1 << 20)
+            self.deliver(data.decode("utf-8"))
+
+    def send(self, message):
+        """Send a message to every listening process; sockets of exited processes are removed."""
+        data = message.encode("utf-8")
+        for path in glob.glob(os.path.join(self.directory, "*.sock")):
+            try:
+                self._sender.sendto(data, path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                if path != self.path:
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+            except OSError as e:
+                if e.errno == errno.EMSGSIZE:
+                    # Too big for one datagram: that process's clients refetch instead
+                    self._sender.sendto(RESYNC_MESSAGE.encode("utf-8"), path)
+                elif e.errno == errno.EAGAIN:
+                    logger.warning(f"Stream relay {path} is not keeping up, dropped a message")
+                else:
+                    raise
+
+
+class Broadcaster:
+    """Fan-out of SSE messages to subscriber queues, and through a SocketRelay to other processes."""
+
+    def __init__(self, buffer_size=STREAM_CLIENT_BUFFER, relay_dir=None):
+        self.buffer_size = buffer_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.relay = SocketRelay(relay_dir, self._deliver) if relay_dir else None
+
+    def subscribe(self):
+        """Register a client and return the queue its messages arrive on."""
+        if self.relay:
+            self.relay.listen()
+        client = queue.Queue(maxsize=self.buffer_size)
+        with self._lock:
+            self._subscribers.add(client)
+        logger.debug(f"Stream client connected ({len(self._subscribers)} total)")
+        return client
+
+    def subscribe_async(self):
+        """Register a client served from the running event loop."""
+        if self.relay:
+            self.relay.listen()
+        client = AsyncSubscription(asyncio.get_running_loop(), self.buffer_size)
+        with self._lock:
+            self._subscribers.add(client)
+        logger.debug(f"Stream client connected ({len(self._subscribers)} total)")
+        return client
+
+    def unsubscribe(self, client):
+        """Forget a disconnected client."""
+        with self._lock:
+            self._subscribers.discard(client)
+        logger.debug(f"Stream client disconnected ({len(self._subscribers)} total)")
+
+    def publish(self, event, data):
+        """
+        Send an event to every client.
+
+        A client whose buffer is full has its backlog replaced by a single
+        resync message rather than blocking the publisher.
+        """
+        message = format_event(event, data)
+        if self.relay:
+            self.relay.send(message)
+        else:
+            self._deliver(message)
+
+    def _deliver(self, message):
+        """Hand an encoded message to this process's clients."""
+        with self._lock:
+            clients = list(self._subscribers)
+        for client in clients:
+            try:
+                client.put_nowait(message)
+            except queue.Full:
+                self._reset(client)
+            except RuntimeError:
+                # The client's event loop has already shut down
+                self.unsubscribe(client)
+
+    @staticmethod
+    def _reset(client):
+        """Drop a slow client's pending messages and ask it to resync."""
+        try:
+            while True:
+                client.get_nowait()
+        except queue.Empty:
+            pass
+        client.put_nowait(RESYNC_MESSAGE)
+
+    def client_count(self):
+        """Number of connected clients."""
+        with self._lock:
+            return len(self._subscribers)
+
+
+# Broadcaster shared by everything in this process
+broadcaster = Broadcaster(relay_dir=STREAM_RELAY_DIR if STREAM_RELAY else None)
@@ -3,55 +3,98 @@ News classification service for categorizing Hacker News stories.
 
 Uses a two-tiered approach:
 1. Pattern matching for common keywords and patterns
-2. Zero-shot classification for more ambiguous titles
+2. Zero-shot classification (or embedding similarity) for more ambiguous titles
 """
 import logging
+import os
+import threading
 import time
-import requests
 import torch
-from transformers import pipeline
+from transformers import pipeline, AutoTokenizer, AutoModel, AutoModelForSequenceClassification
 
-from app.config.settings import HN_TOP_STORIES_URL, HN_ITEM_URL, DEFAULT_FETCH_LIMIT
-from app.models.database import insert_or_update_story
+from app.config.settings import (
+    ZERO_SHOT_MODEL,
+    CLASSIFIER_BACKEND,
+    CLASSIFIER_THREADS,
+    CLASSIFIER_BATCH_SIZE,
+    ONNX_MODEL_DIR,
+    CLASSIFIER_MODE,
+    EMBEDDING_MODEL,
+    PENDING_BATCH_SIZE,
+    PENDING_POLL_INTERVAL,
+    PENDING_RETRY_DELAY
+)
+from app.models.database import get_pending_stories, update_categories
+from app.services.broadcaster import broadcaster
 
 logger = logging.getLogger(__name__)
 
-def fetch_latest_story_ids():
-    """Fetch the latest story IDs from Hacker News API."""
-    try:
-        response = requests.get(HN_TOP_STORIES_URL)
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(f"Failed to fetch story IDs. Status code: {response.status_code}")
-            return []
-    except Exception as e:
-        logger.error(f"Error fetching latest story IDs: {str(e)}")
-        return []
+# Labels offered to the zero-shot model
+ZERO_SHOT_LABELS = [
+    "Programming", 
+    "AI & ML",
+    "Startups", 
+    "Security",
+    "Hardware",
+    "Science & Research", 
+    "Business"
+]
 
-def fetch_story(story_id):
-    """Fetch story details from Hacker News API."""
-    try:
-        response = requests.get(HN_ITEM_URL.format(story_id))
-        if response.status_code == 200:
-            return response.json()
-        else:
-            logger.error(f"Failed to fetch story {story_id}. Status code: {response.status_code}")
-            return None
-    except Exception as e:
-        logger.error(f"Error fetching story {story_id}: {str(e)}")
-        return None
+# Descriptions encoded once for the embedding classifier
+LABEL_DESCRIPTIONS = {
+    "Programming": "Programming languages, software engineering, compilers and developer tools",
+    "AI & ML": "Artificial intelligence, machine learning models, neural networks and LLMs",
+    "Startups": "Startups, founders, fundraising, venture capital and building a company",
+    "Security": "Computer security, hacking, vulnerabilities, privacy and cryptography",
+    "Hardware": "Computer hardware, chips, electronics, devices and robotics",
+    "Science & Research": "Scientific research and discoveries in physics, biology, space and medicine",
+    "Business": "Business, economics, markets, finance and companies",
+}
 
-def classify_news(title):
+# Small labeled title set used to check backends against the fp32 baseline
+LABELED_TITLES = [
+    ("A new approach to memory-safe systems languages", "Programming"),
+    ("Understanding lifetimes and borrowing in practice", "Programming"),
+    ("Transformers explained with diagrams", "AI & ML"),
+    ("Training small vision models on a single GPU", "AI & ML"),
+    ("We raised a seed round to build better invoicing", "Startups"),
+    ("Lessons from bootstrapping a SaaS to profitability", "Startups"),
+    ("Attackers abused a flaw in a popular VPN appliance", "Security"),
+    ("How password managers store your secrets", "Security"),
+    ("Designing a RISC-V board from scratch", "Hardware"),
+    ("Inside the new generation of solid-state batteries", "Hardware"),
+    ("Physicists measure the W boson mass with new precision", "Science & Research"),
+    ("A protein folding breakthrough in structural biology", "Science & Research"),
+    ("Retail sales slowed sharply last quarter", "Business"),
+    ("The economics of airline loyalty programs", "Business"),
+]
+
+# Loaded pipelines, keyed by backend name
+_pipelines = {}
+# Backends that failed to load, with the reason; their callers get the PyTorch pipeline
+_unavailable = {}
+_pipeline_lock = threading.Lock()
+
+# Sentence-embedding model and the cached label embeddings
+_embedder = None
+_label_embeddings = None
+_embedder_lock = threading.Lock()
+
+# Background worker that resolves pending stories
+_pending_event = threading.Event()
+_worker_thread = None
+_worker_lock = threading.Lock()
+
+def classify_by_rules(title):
     """
-    Classify Hacker News articles into appropriate categories.
+    Classify a title using the keyword tier only.
     
-    Uses a combination of keyword detection and transformer-based 
-    zero-shot classification for accurate categorization.
+    Returns:
+        str: Matching category, or None if no rule applies
     """
     if not title:
-        return "Uncategorized"
-        
+        return None
+    
     # Lower case the title for easier pattern matching
     title_lower = title.lower()
     
@@ -94,56 +137,339 @@ def classify_news(title):
                                                'twitter', 'x.com', 'netflix', 'tesla', 'uber', 'github']):
         return 'Tech Companies'
     
-    try:
-        # For everything else, use zero-shot classification with tech-focused categories
-        device = 0 if torch.cuda.is_available() else -1
-        classifier = pipeline("zero-shot-classification", model="facebook/bart-large-mnli", device=device)
-        candidate_labels = [
-            "Programming", 
-            "AI & ML",
-            "Startups", 
-            "Security",
-            "Hardware",
-            "Science & Research", 
-            "Business"
-        ]
+    return None
+
+def _configure_threads():
+    """Apply the configured intra-op thread count to torch."""
+    if CLASSIFIER_THREADS > 0:
+        torch.set_num_threads(CLASSIFIER_THREADS)
+
+def _load_pytorch_backend():
+    """Full-precision PyTorch model, on GPU when available."""
+    device = 0 if torch.cuda.is_available() else -1
+    return pipeline("zero-shot-classification", model=ZERO_SHOT_MODEL, device=device)
+
+def _load_quantized_backend():
+    """PyTorch model with Linear layers dynamically quantized to int8 (CPU only)."""
+    tokenizer = AutoTokenizer.from_pretrained(ZERO_SHOT_MODEL)
+    model = AutoModelForSequenceClassification.from_pretrained(ZERO_SHOT_MODEL)
+    model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer, device=-1)
+
+def _load_onnx_backend():
+    """ONNX Runtime session, exported once and cached under ONNX_MODEL_DIR."""
+    import onnxruntime
+    from optimum.onnxruntime import ORTModelForSequenceClassification
+
+    options = onnxruntime.SessionOptions()
+    if CLASSIFIER_THREADS > 0:
+        options.intra_op_num_threads = CLASSIFIER_THREADS
+    
+    if os.path.isdir(ONNX_MODEL_DIR):
+        tokenizer = AutoTokenizer.from_pretrained(ONNX_MODEL_DIR)
+        model = ORTModelForSequenceClassification.from_pretrained(ONNX_MODEL_DIR, session_options=options)
+    else:
+        logger.info(f"Exporting {ZERO_SHOT_MODEL} to ONNX in {ONNX_MODEL_DIR}")
+        tokenizer = AutoTokenizer.from_pretrained(ZERO_SHOT_MODEL)
+        model = ORTModelForSequenceClassification.from_pretrained(
+            ZERO_SHOT_MODEL, export=True, session_options=options
+        )
+        model.save_pretrained(ONNX_MODEL_DIR)
+        tokenizer.save_pretrained(ONNX_MODEL_DIR)
+    return pipeline("zero-shot-classification", model=model, tokenizer=tokenizer)
+
+INFERENCE_BACKENDS = {
+    "pytorch": _load_pytorch_backend,
+    "quantized": _load_quantized_backend,
+    "onnx": _load_onnx_backend,
+}
+
+def get_zero_shot_classifier(backend=None, fallback=True):
+    """
+    Get the zero-shot pipeline for an inference backend, loading it on first use.
+    
+    Pipelines are cached per process so the model is only loaded once. A
+    backend that cannot be loaded is remembered as unavailable, and the
+    PyTorch pipeline is used in its place without being cached under its name.
+    
+    Args:
+        backend: One of INFERENCE_BACKENDS (defaults to CLASSIFIER_BACKEND)
+        fallback: Use PyTorch for an unavailable backend; if False, raise ImportError instead
+    """
+    backend = backend or CLASSIFIER_BACKEND
+    with _pipeline_lock:
+        if backend not in _pipelines and backend not in _unavailable:
+            if backend not in INFERENCE_BACKENDS:
+                raise ValueError(f"Unknown classifier backend: {backend}")
+            _configure_threads()
+            try:
+                _pipelines[backend] = INFERENCE_BACKENDS[backend]()
+                logger.info(f"Loaded zero-shot classifier with '{backend}' backend")
+            except ImportError as e:
+                if backend == "pytorch":
+                    raise
+                logger.error(f"Classifier backend '{backend}' unavailable ({str(e)}), using pytorch")
+                _unavailable[backend] = str(e)
+        if backend in _unavailable:
+            if not fallback:
+                raise ImportError(f"Classifier backend '{backend}' unavailable: {_unavailable[backend]}")
+            backend = "pytorch"
+            if backend not in _pipelines:
+                _configure_threads()
+                _pipelines[backend] = _load_pytorch_backend()
+        return _pipelines[backend]
+
+def classify_with_nli(titles, backend=None):
+    """
+    Classify a batch of titles with the zero-shot model.
+    
+    Args:
+        titles: List of story titles
+        backend: Inference backend name (defaults to CLASSIFIER_BACKEND)
+        
+    Returns:
+        list: One category per title
+        
+    Raises:
+        Exception: If the model can't be loaded or run; callers decide whether
+        to retry rather than store a placeholder category
+    """
+    if not titles:
+        return []
+    classifier = get_zero_shot_classifier(backend)
+    results = classifier(list(titles), ZERO_SHOT_LABELS, batch_size=CLASSIFIER_BATCH_SIZE)
+    if isinstance(results, dict):
+        results = [results]
+    return [result["labels"][0] if result else "Tech" for result in results]
+
+def get_embedder():
+    """Get the (tokenizer, model) pair for the sentence-embedding model, loading it on first use."""
+    global _embedder
+    with _embedder_lock:
+        if _embedder is None:
+            _configure_threads()
+            tokenizer = AutoTokenizer.from_pretrained(EMBEDDING_MODEL)
+            model = AutoModel.from_pretrained(EMBEDDING_MODEL)
+            model.eval()
+            _embedder = (tokenizer, model)
+            logger.info(f"Loaded sentence-embedding model {EMBEDDING_MODEL}")
+        return _embedder
+
+def encode_texts(texts):
+    """
+    Encode texts into L2-normalized sentence embeddings.
+    
+    Args:
+        texts: List of strings
+        
+    Returns:
+        numpy.ndarray: float32 array of shape (len(texts), dim)
+    """
+    tokenizer, model = get_embedder()
+    batches = []
+    for start in range(0, len(texts), CLASSIFIER_BATCH_SIZE):
+        batch = list(texts[start:start + CLASSIFIER_BATCH_SIZE])
+        inputs = tokenizer(batch, padding=True, truncation=True, max_length=64, return_tensors="pt")
+        with torch.no_grad():
+            hidden = model(**inputs).last_hidden_state
+        # Mean pooling over real (non-padding) tokens
+        mask = inputs["attention_mask"].unsqueeze(-1).to(hidden.dtype)
+        pooled = (hidden * mask).sum(dim=1) / mask.sum(dim=1).clamp(min=1e-9)
+        batches.append(torch.nn.functional.normalize(pooled, dim=1))
+    if not batches:
+        return torch.empty(0, 0).numpy()
+    return torch.cat(batches).numpy()
+
+def get_label_embeddings():
+    """Get the category-description embeddings, encoding them once per process."""
+    global _label_embeddings
+    if _label_embeddings is None:
+        _label_embeddings = encode_texts([LABEL_DESCRIPTIONS[label] for label in ZERO_SHOT_LABELS])
+    return _label_embeddings
+
+def classify_with_embeddings(titles):
+    """
+    Classify a batch of titles by cosine similarity to the category descriptions.
+    
+    One encoder pass per title instead of one NLI pass per (title, label) pair.
+    
+    Args:
+        titles: List of story titles
+        
+    Returns:
+        list: One category per title
+        
+    Raises:
+        Exception: If the model can't be loaded or run
+    """
+    if not titles:
+        return []
+    scores = encode_texts(titles) @ get_label_embeddings().T
+    return [ZERO_SHOT_LABELS[i] for i in scores.argmax(axis=1)]
+
+CLASSIFIER_MODES = {
+    "nli": classify_with_nli,
+    "embedding": classify_with_embeddings,
+}
+
+def classify_with_model(titles, mode=None):
+    """
+    Classify a batch of titles with the configured model tier.
+    
+    Args:
+        titles: List of story titles
+        mode: One of CLASSIFIER_MODES (defaults to CLASSIFIER_MODE)
+        
+    Returns:
+        list: One category per title
         
-        result = classifier(title, candidate_labels)
-        return result["labels"][0] if result else "Tech"
+    Raises:
+        Exception: If the model can't be loaded or run
+    """
+    mode = mode or CLASSIFIER_MODE
+    if mode not in CLASSIFIER_MODES:
+        raise ValueError(f"Unknown classifier mode: {mode}")
+    return CLASSIFIER_MODES[mode](titles)
+
+def classify_news(title):
+    """
+    Classify Hacker News articles into appropriate categories.
+    
+    Uses a combination of keyword detection and transformer-based 
+    zero-shot classification for accurate categorization.
+    """
+    if not title:
+        return "Uncategorized"
+    
+    category = classify_by_rules(title)
+    if category:
+        return category
+    
+    try:
+        # For everything else, use the model tier with tech-focused categories
+        return classify_with_model([title])[0]
     except Exception as e:
-        logger.error(f"Error during zero-shot classification: {str(e)}")
+        logger.error(f"Error during model classification: {str(e)}")
         return "Uncategorized"
 
-def sync_news(limit=DEFAULT_FETCH_LIMIT):
+def evaluate_backend(samples, backend, baseline="pytorch"):
+    """
+    Compare an inference backend against the fp32 baseline on labeled titles.
+    
+    Args:
+        samples: List of (title, expected_category) pairs
+        backend: Backend to evaluate
+        baseline: Reference backend (defaults to full-precision PyTorch)
+        
+    Returns:
+        dict: Accuracy of both backends, their agreement and per-title latency
+        
+    Raises:
+        ImportError: If either backend can't be loaded (rather than measuring PyTorch twice)
+    """
+    titles = [title for title, _ in samples]
+    expected = [label for _, label in samples]
+    report = {"samples": len(samples)}
+    
+    predictions = {}
+    for name in (baseline, backend):
+        get_zero_shot_classifier(name, fallback=False)  # Exclude model loading from the timing
+        start = time.perf_counter()
+        predictions[name] = classify_with_nli(titles, name)
+        elapsed = time.perf_counter() - start
+        correct = sum(p == e for p, e in zip(predictions[name], expected))
+        report[name] = {
+            "accuracy": correct / len(samples) if samples else 0.0,
+            "ms_per_title": 1000 * elapsed / len(samples) if samples else 0.0,
+        }
+    
+    agreed = sum(a == b for a, b in zip(predictions[baseline], predictions[backend]))
+    report["agreement"] = agreed / len(samples) if samples else 0.0
+    return report
+
+def measure_agreement(titles):
     """
-    Fetch and store latest Hacker News stories.
+    Compare the embedding classifier with the NLI path on the same titles.
     
     Args:
-        limit: Maximum number of stories to fetch
+        titles: List of story titles
         
     Returns:
-        int: Number of stories processed
+        dict: Agreement rate and per-title latency of each mode
+    """
+    report = {"samples": len(titles)}
+    predictions = {}
+    for mode in ("nli", "embedding"):
+        # Warm up so model loading is excluded from the timing
+        classify_with_model(titles[:1], mode)
+        start = time.perf_counter()
+        predictions[mode] = classify_with_model(titles, mode)
+        elapsed = time.perf_counter() - start
+        report[mode] = {"ms_per_title": 1000 * elapsed / len(titles) if titles else 0.0}
+    
+    agreed = sum(a == b for a, b in zip(predictions["nli"], predictions["embedding"]))
+    report["agreement"] = agreed / len(titles) if titles else 0.0
+    return report
+
+def resolve_pending(batch_size=PENDING_BATCH_SIZE):
     """
-    logger.info(f"Starting news sync, fetching up to {limit} stories...")
-    story_ids = fetch_latest_story_ids()
-    count = 0
-    processed = 0
+    Classify one batch of pending stories with the model tier.
     
-    for story_id in story_ids[:limit]:
+    Args:
+        batch_size: Maximum number of stories to classify
+        
+    Returns:
+        int: Number of stories resolved
+        
+    Raises:
+        RuntimeError: If the categories couldn't be written
+        Exception: If the model tier fails; the stories stay pending for a retry
+    """
+    rows = get_pending_stories(batch_size)
+    if not rows:
+        return 0
+    ids = [row[0] for row in rows]
+    categories = classify_with_model([row[1] for row in rows])
+    updated = update_categories(ids, categories, only_pending=True)
+    if updated is None:
+        raise RuntimeError(f"Writing categories of {len(ids)} pending stories failed")
+    # Stories categorized elsewhere meanwhile (say, by a reclassification) keep that category
+    written = set(updated)
+    broadcaster.publish("stories", [
+        {"id": story_id, "category": category} for story_id, category in zip(ids, categories) if story_id in written
+    ])
+    logger.debug(f"Resolved {len(rows)} pending stories")
+    return len(rows)
+
+def _run_reclassification_worker():
+    """Drain pending stories whenever a sync signals new work (or on a timer)."""
+    failures = 0
+    while True:
+        _pending_event.wait(timeout=PENDING_POLL_INTERVAL)
+        _pending_event.clear()
         try:
-            story = fetch_story(story_id)
-            if story and "title" in story:
-                category = classify_news(story["title"])
-                if insert_or_update_story(story, category):
-                    count += 1
-                processed += 1
-                
-            # Prevent API rate limiting but don't wait too long
-            if processed % 10 == 0:
-                time.sleep(0.5)
-                
+            while resolve_pending():
+                failures = 0
         except Exception as e:
-            logger.error(f"Error processing story {story_id}: {str(e)}")
-    
-    logger.info(f"Sync complete. Processed {processed} stories, successfully added/updated {count}.")
-    return count
\ No newline at end of file
+            # A failed model or write leaves the batch pending: back off (doubling up to the
+            # poll interval) instead of re-running the model on the same batch
+            failures += 1
+            delay = min(PENDING_RETRY_DELAY * 2 ** (failures - 1), PENDING_POLL_INTERVAL)
+            logger.error(f"Error in reclassification worker, retrying in {delay}s: {str(e)}")
+            time.sleep(delay)
+            _pending_event.set()
+
+def start_reclassification_worker():
+    """Start the background reclassification worker if it isn't running yet."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_run_reclassification_worker, name="reclassification-worker")
+            _worker_thread.daemon = True
+            _worker_thread.start()
+            logger.info("Started background reclassification worker")
+
+def notify_pending():
+    """Wake the reclassification worker, starting it if needed."""
+    start_reclassification_worker()
+    _pending_event.set()
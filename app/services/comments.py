@@ -0,0 +1,174 @@
+"""
+Comment-tree ingestion for Hacker News stories.
+
+A story item lists its top-level comment IDs in `kids`, and each comment
+lists its replies the same way. Threads are walked breadth first: each
+level of every stale thread in a batch is fetched in one concurrent round,
+so a thread costs one round trip per level of depth, not one per comment.
+
+A thread is stale when the story's `descendants` count differs from the
+count recorded at its last complete sync. Threads whose count hasn't moved
+are skipped without a single request. A thread with a failed fetch is
+written but not marked synced, so the next ingest retries it.
+
+Ingest doesn't wait for any of this: it queues each batch's story items
+(queue_threads) and a background worker syncs them, the same way pending
+stories are left to the classifier's worker.
+"""
+import logging
+import threading
+
+from app.config.settings import COMMENT_FETCH_CONCURRENCY, COMMENT_FETCH_RATE, ITEM_CACHE_REPLAY
+from app.models.database import get_synced_comment_counts, save_comments
+from app.services.sources import HackerNewsSource
+
+logger = logging.getLogger(__name__)
+
+_fetchers = {}
+_fetcher_lock = threading.Lock()
+
+# Story items waiting for the comment worker, by fetcher and story ID (a newer item replaces an older one)
+_queued = {}
+_queue_lock = threading.Lock()
+_queue_event = threading.Event()
+_worker_thread = None
+_worker_lock = threading.Lock()
+
+
+def get_fetcher(replay=ITEM_CACHE_REPLAY):
+    """
+    The HN client comments are fetched with, kept apart from the story sources' rate limits.
+
+    It never serves cached comments outside a replay: a cached comment could
+    miss new replies, and the thread would then be recorded as synced
+    without them. Fetched comments are still cached, for later replays.
+    """
+    with _fetcher_lock:
+        if replay not in _fetchers:
+            _fetchers[replay] = HackerNewsSource("hn-comments", rate=COMMENT_FETCH_RATE, replay=replay,
+                                                 reuse_cached=False)
+        return _fetchers[replay]
+
+
+def stale_threads(items):
+    """Story items whose comment count changed since their last sync."""
+    items = [item for item in items if item and item.get("kids")]
+    if not items:
+        return []
+    synced = get_synced_comment_counts([item["id"] for item in items])
+    return [item for item in items if synced.get(item["id"]) != item.get("descendants")]
+
+
+def fetch_threads(stories, fetcher=None, concurrency=COMMENT_FETCH_CONCURRENCY):
+    """
+    Fetch the comment trees of some stories, one level at a time.
+
+    Args:
+        stories: Raw HN story items (with `kids`)
+        fetcher: Source whose fetch_items(ids, concurrency) returns raw items
+        concurrency: Parallel requests per level
+
+    Returns:
+        tuple: (comment dicts, IDs of deleted or dead comments, IDs of stories with failed fetches)
+    """
+    fetcher = fetcher or get_fetcher()
+    frontier = [(kid, story["id"]) for story in stories for kid in story.get("kids", [])]
+    seen = set()
+    comments, deleted, failed = [], [], set()
+
+    while frontier:
+        items = fetcher.fetch_items([item_id for item_id, _ in frontier], concurrency)
+        next_level = []
+        for (item_id, story_id), item in zip(frontier, items):
+            if item is None:
+                failed.add(story_id)
+                continue
+            if item.get("deleted") or item.get("dead"):
+                deleted.append(item_id)
+            else:
+                comments.append({
+                    "id": item_id,
+                    "parent": item.get("parent"),
+                    "story": story_id,
+                    "by": item.get("by"),
+                    "time": item.get("time"),
+                    "text": item.get("text"),
+                })
+            # Replies to deleted comments are still shown, so keep walking
+            for kid in item.get("kids", []):
+                if kid not in seen:
+                    seen.add(kid)
+                    next_level.append((kid, story_id))
+        frontier = next_level
+
+    return comments, deleted, failed
+
+
+def sync_comments(items, fetcher=None):
+    """
+    Bring the stored comment trees of a batch of story items up to date.
+
+    Returns:
+        int: Number of comments written
+    """
+    stories = stale_threads(items)
+    if not stories:
+        return 0
+    comments, deleted, failed = fetch_threads(stories, fetcher)
+    synced = {story["id"]: story.get("descendants") for story in stories if story["id"] not in failed}
+    if not save_comments(comments, deleted, synced):
+        return 0
+    if failed:
+        logger.warning(f"Comment threads of {len(failed)} stories were incomplete and will be retried")
+    logger.info(f"Synced {len(comments)} comments from {len(stories)} threads")
+    return len(comments)
+
+
+def queue_threads(items, fetcher=None):
+    """Hand a batch of story items to the comment worker, starting it if needed."""
+    items = [item for item in items if item and item.get("kids")]
+    if not items:
+        return
+    fetcher = fetcher or get_fetcher()
+    with _queue_lock:
+        queued = _queued.setdefault(fetcher, {})
+        for item in items:
+            queued[item["id"]] = item
+    start_comment_worker()
+    _queue_event.set()
+
+
+def sync_queued_threads():
+    """
+    Sync every queued thread.
+
+    Returns:
+        int: Number of comments written
+    """
+    global _queued
+    with _queue_lock:
+        queued, _queued = _queued, {}
+    return sum(sync_comments(list(items.values()), fetcher) for fetcher, items in queued.items())
+
+
+def _run_comment_worker():
+    """Sync queued threads whenever an ingest queues more."""
+    while True:
+        _queue_event.wait()
+        _queue_event.clear()
+        try:
+            sync_queued_threads()
+        except Exception as e:
+            # Threads that didn't sync stay stale, so a later ingest queues them again
+            logger.error(f"Error in comment worker: {str(e)}")
+
+
+def start_comment_worker():
+    """Start the background comment worker if it isn't running yet."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_run_comment_worker, name="comment-worker")
+            _worker_thread.daemon = True
+            _worker_thread.start()
+            logger.info("Started background comment worker")
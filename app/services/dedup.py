@@ -0,0 +1,269 @@
+"""
+Near-duplicate story detection at ingest.
+
+A story is a duplicate of an earlier one if it links to the same canonical
+URL, or if its title is nearly the same (MinHash similarity) as a story
+posted within DEDUP_WINDOW_DAYS before it. Duplicates point at the
+earliest story of their cluster through `canonical_id`.
+
+The index is kept in numpy arrays so it stays compact at millions of
+stories: sorted 64-bit keys are searched with `searchsorted`, and inserts
+go to small dicts that are merged in periodically.
+"""
+import hashlib
+import logging
+import re
+import threading
+import time
+import zlib
+from urllib.parse import urlsplit, parse_qsl, urlencode
+
+import numpy as np
+
+from app.config.settings import DEDUP_THRESHOLD, DEDUP_WINDOW_DAYS
+from app.models.database import get_connection
+
+logger = logging.getLogger(__name__)
+
+# 8 LSH bands of 4 16-bit MinHash values; each band packs into one 64-bit key
+NUM_PERM = 32
+BANDS = 8
+MERGE_EVERY = 4096
+
+# Query parameters that never change what a URL points to
+TRACKING_PARAMS = re.compile(r"^(utm_.*|ref|ref_src|fbclid|gclid|mc_cid|mc_eid|share|s)$")
+
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_rng = np.random.default_rng(2024)
+_PERM_A = _rng.integers(1, 1 << 32, NUM_PERM, dtype=np.uint64)
+_PERM_B = _rng.integers(0, 1 << 32, NUM_PERM, dtype=np.uint64)
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL so trivially different links to the same page compare equal.
+
+    Drops the scheme, "www." prefix, default ports, fragments, tracking
+    parameters and trailing slashes, and sorts the remaining query.
+    """
+    if not url:
+        return None
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    host = (parts.hostname or "").lower()
+    if not host:
+        return None
+    if host.startswith("www."):
+        host = host[4:]
+    if port and port not in (80, 443):
+        host = f"{host}:{port}"
+    query = sorted((k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)
+                   if not TRACKING_PARAMS.match(k.lower()))
+    query = f"?{urlencode(query)}" if query else ""
+    return f"{host}{parts.path.rstrip('/')}{query}"
+
+
+def _key(text):
+    """Stable signed 64-bit hash of a string."""
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little", signed=True)
+
+
+def title_signature(title):
+    """
+    MinHash signature of a title's character 3-grams.
+
+    Returns:
+        numpy.ndarray: NUM_PERM uint16 values, or None for empty titles
+    """
+    text = " ".join(re.findall(r"\w+", (title or "").lower()))
+    if not text:
+        return None
+    shingles = {text[i:i + 3] for i in range(max(len(text) - 2, 1))}
+    hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (_PERM_A[:, None] * hashes[None, :] + _PERM_B[:, None]) % _MERSENNE_PRIME
+    return (permuted.min(axis=1) & np.uint64(0xFFFF)).astype(np.uint16)
+
+
+class KeyTable:
+    """Multimap from 64-bit keys to integers: sorted arrays plus a dict of recent inserts."""
+
+    def __init__(self):
+        self.keys = np.empty(0, dtype=np.int64)
+        self.values = np.empty(0, dtype=np.int64)
+        self.recent = {}
+
+    def add(self, key, value):
+        self.recent.setdefault(key, []).append(value)
+
+    def get(self, key):
+        """All values stored under key, oldest first."""
+        lo = np.searchsorted(self.keys, key, side="left")
+        hi = np.searchsorted(self.keys, key, side="right")
+        return self.values[lo:hi].tolist() + self.recent.get(key, [])
+
+    def merge(self):
+        """Fold recent inserts into the sorted arrays."""
+        if not self.recent:
+            return
+        keys = np.fromiter((k for k, vs in self.recent.items() for _ in vs), dtype=np.int64)
+        values = np.fromiter((v for vs in self.recent.values() for v in vs), dtype=np.int64)
+        self.rebuild(np.concatenate([self.keys, keys]), np.concatenate([self.values, values]))
+
+    def rebuild(self, keys, values):
+        """Replace the contents with the given (unsorted) keys and values."""
+        order = np.argsort(keys, kind="stable")
+        self.keys, self.values, self.recent = keys[order], values[order], {}
+
+    def __len__(self):
+        return len(self.keys) + sum(len(vs) for vs in self.recent.values())
+
+
+class DuplicateIndex:
+    """In-memory URL and title-similarity index over stored stories."""
+
+    def __init__(self, threshold=DEDUP_THRESHOLD, window_days=DEDUP_WINDOW_DAYS):
+        self.threshold = threshold
+        self.window = window_days * 86400
+        self.urls = KeyTable()
+        # Canonical ID of every indexed story, so re-synced stories aren't indexed again
+        self.stories = KeyTable()
+        # Title rows still inside the window: story ID, canonical ID, time, signature
+        self.ids = np.empty(0, dtype=np.int64)
+        self.canonical = np.empty(0, dtype=np.int64)
+        self.times = np.empty(0, dtype=np.int64)
+        self.signatures = np.empty((0, NUM_PERM), dtype=np.uint16)
+        self.recent_rows = []
+        self.bands = [KeyTable() for _ in range(BANDS)]
+        self._pending = 0
+
+    def _row(self, position):
+        """(id, canonical, time, signature) of a title row."""
+        if position < len(self.ids):
+            return self.ids[position], self.canonical[position], self.times[position], self.signatures[position]
+        return self.recent_rows[position - len(self.ids)]
+
+    def find(self, story_id, url_key, signature, story_time):
+        """
+        Canonical ID of an earlier story this one duplicates, or None.
+        """
+        if url_key is not None:
+            for canonical in self.urls.get(url_key)[:1]:
+                if canonical != story_id:
+                    return canonical
+
+        if signature is None or story_time is None:
+            return None
+        band_keys = signature.view(np.int64)
+        seen = set()
+        for band, key in zip(self.bands, band_keys):
+            for position in band.get(int(key)):
+                if position in seen:
+                    continue
+                seen.add(position)
+                other_id, canonical, other_time, other_signature = self._row(position)
+                if other_id == story_id or other_time > story_time or story_time - other_time > self.window:
+                    continue
+                if np.mean(other_signature == signature) >= self.threshold:
+                    return int(canonical)
+        return None
+
+    def canonical_of(self, story_id):
+        """Canonical ID an indexed story was stored under, or None if it isn't indexed."""
+        found = self.stories.get(story_id)
+        return found[0] if found else None
+
+    def add(self, story_id, canonical_id, url_key, signature, story_time):
+        """Index a story under its canonical ID (once; later calls for the same story are ignored)."""
+        if self.canonical_of(story_id) is not None:
+            return
+        self.stories.add(story_id, canonical_id)
+        if url_key is not None and not self.urls.get(url_key):
+            self.urls.add(url_key, canonical_id)
+        if signature is not None and story_time is not None and story_time >= time.time() - self.window:
+            position = len(self.ids) + len(self.recent_rows)
+            self.recent_rows.append((story_id, canonical_id, story_time, signature))
+            for band, key in zip(self.bands, signature.view(np.int64)):
+                band.add(int(key), position)
+        self._pending += 1
+        if self._pending >= MERGE_EVERY:
+            self.merge()
+
+    def merge(self):
+        """Fold recent inserts into the sorted arrays and drop title rows past the window."""
+        self.urls.merge()
+        self.stories.merge()
+        if self.recent_rows:
+            ids, canonical, times, signatures = zip(*self.recent_rows)
+            self.ids = np.concatenate([self.ids, np.array(ids, dtype=np.int64)])
+            self.canonical = np.concatenate([self.canonical, np.array(canonical, dtype=np.int64)])
+            self.times = np.concatenate([self.times, np.array(times, dtype=np.int64)])
+            self.signatures = np.concatenate([self.signatures, np.stack(signatures)])
+            self.recent_rows = []
+
+        keep = self.times >= time.time() - self.window
+        self.ids, self.canonical = self.ids[keep], self.canonical[keep]
+        self.times, self.signatures = self.times[keep], self.signatures[keep]
+        band_keys = self.signatures.view(np.int64).reshape(len(self.ids), BANDS)
+        positions = np.arange(len(self.ids), dtype=np.int64)
+        for b, band in enumerate(self.bands):
+            band.rebuild(band_keys[:, b].copy(), positions)
+        self._pending = 0
+
+    def assign(self, stories):
+        """
+        Set `canonical_id` on each story (None for canonical stories) and index them.
+
+        Stories are handled oldest first so the earliest copy becomes canonical.
+        Stories seen before (most of every sync) keep the canonical ID they were
+        first given.
+        """
+        for story in sorted(stories, key=lambda s: (s.get("time") or 0, s["id"])):
+            known = self.canonical_of(story["id"])
+            if known is not None:
+                story["canonical_id"] = known if known != story["id"] else None
+                continue
+            url = canonicalize_url(story.get("url"))
+            url_key = _key(url) if url else None
+            signature = title_signature(story.get("title"))
+            canonical = self.find(story["id"], url_key, signature, story.get("time"))
+            story["canonical_id"] = canonical
+            self.add(story["id"], canonical if canonical is not None else story["id"],
+                     url_key, signature, story.get("time"))
+
+    def load(self, chunk_size=50000):
+        """Build the index from the stories already stored, oldest first."""
+        conn = get_connection()
+        try:
+            cursor = conn.execute(
+                "SELECT id, url, title, time, canonical_id FROM all_stories ORDER BY time, id"
+            )
+            while True:
+                rows = cursor.fetchmany(chunk_size)
+                if not rows:
+                    break
+                for story_id, url, title, story_time, canonical_id in rows:
+                    url = canonicalize_url(url)
+                    recent = story_time is not None and story_time >= time.time() - self.window
+                    self.add(story_id, canonical_id if canonical_id is not None else story_id,
+                             _key(url) if url else None, title_signature(title) if recent else None, story_time)
+        finally:
+            conn.close()
+        self.merge()
+        logger.info(f"Loaded duplicate index: {len(self.urls)} URLs, {len(self.ids)} recent titles")
+
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def assign_canonical_ids(stories):
+    """Mark near-duplicate stories with the ID of their canonical story, loading the index on first use."""
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = DuplicateIndex()
+            _index.load()
+        _index.assign(stories)
@@ -0,0 +1,162 @@
+"""
+Weekly digest generation.
+
+Digests are built from the `daily_top_stories` rollups maintained at
+ingest, never from a scan of `hackernews`. The per-category top stories
+are queried once per run. Subscribers are grouped by the categories they
+follow, so each distinct digest is rendered once however many people
+receive it.
+
+Every run writes to a dated directory under DIGEST_OUTBOX:
+- one HTML and one JSON file per distinct digest
+- recipients.jsonl, mapping each address to its digest
+
+When DIGEST_SMTP_HOST is set, the digests are also mailed. Any object with
+a `send(recipients, subject, html)` method can stand in for the SMTP mailer.
+"""
+import hashlib
+import json
+import logging
+import os
+import smtplib
+from datetime import datetime, timedelta, timezone
+from email.message import EmailMessage
+
+from jinja2 import Environment, FileSystemLoader, select_autoescape
+
+from app.config.settings import (
+    BASE_DIR,
+    DIGEST_WINDOW_DAYS,
+    DIGEST_STORIES_PER_CATEGORY,
+    DIGEST_OUTBOX,
+    DIGEST_SMTP_HOST,
+    DIGEST_SMTP_PORT,
+    DIGEST_SMTP_USER,
+    DIGEST_SMTP_PASSWORD,
+    DIGEST_FROM
+)
+from app.models.database import get_digest_stories, get_digest_subscribers
+
+logger = logging.getLogger(__name__)
+
+STORY_KEYS = ["id", "title", "url", "by", "score", "descendants"]
+
+_templates = Environment(
+    loader=FileSystemLoader(os.path.join(BASE_DIR, "templates")),
+    autoescape=select_autoescape(["html"])
+)
+
+
+class SmtpMailer:
+    """Sends digests over one SMTP connection per batch of recipients."""
+
+    def __init__(self, host=DIGEST_SMTP_HOST, port=DIGEST_SMTP_PORT, user=DIGEST_SMTP_USER,
+                 password=DIGEST_SMTP_PASSWORD, sender=DIGEST_FROM):
+        self.host, self.port = host, port
+        self.user, self.password = user, password
+        self.sender = sender
+
+    def send(self, recipients, subject, html):
+        """Send one digest to many recipients; returns the number sent."""
+        with smtplib.SMTP(self.host, self.port) as smtp:
+            if self.user:
+                smtp.starttls()
+                smtp.login(self.user, self.password)
+            for recipient in recipients:
+                message = EmailMessage()
+                message["Subject"] = subject
+                message["From"] = self.sender
+                message["To"] = recipient
+                message.set_content("Your weekly Hacky News digest is best viewed as HTML.")
+                message.add_alternative(html, subtype="html")
+                smtp.send_message(message)
+        return len(recipients)
+
+
+def default_mailer():
+    """The SMTP mailer if one is configured, else None (outbox only)."""
+    return SmtpMailer() if DIGEST_SMTP_HOST else None
+
+
+def digest_window(end=None, days=DIGEST_WINDOW_DAYS):
+    """(start, end) dates of the digest window, ending at the start of `end` (default: today, UTC)."""
+    end = end or datetime.now(timezone.utc).date()
+    return end - timedelta(days=days), end
+
+
+def load_sections(start, end, per_category=DIGEST_STORIES_PER_CATEGORY):
+    """Top stories of every category over the window, keyed by category."""
+    sections = {}
+    for row in get_digest_stories(start, end, per_category):
+        sections.setdefault(row[0], []).append(dict(zip(STORY_KEYS, row[1:])))
+    return sections
+
+
+def variant_key(categories):
+    """Stable name for the digest a category selection receives."""
+    if categories is None:
+        return "all"
+    return hashlib.sha1("\n".join(sorted(categories)).encode("utf-8")).hexdigest()[:12]
+
+
+def generate_digests(end=None, days=DIGEST_WINDOW_DAYS, per_category=DIGEST_STORIES_PER_CATEGORY,
+                     outbox=DIGEST_OUTBOX, mailer=None):
+    """
+    Render and deliver the digest for every subscriber.
+
+    Args:
+        end: Last day of the window, exclusive (defaults to today, UTC)
+        days: Window length in days
+        per_category: Stories per category
+        outbox: Directory the run's files are written under
+        mailer: Object with send(recipients, subject, html), or None to only write the outbox
+
+    Returns:
+        dict: Run summary (window, subscriber and variant counts, directory, number mailed)
+    """
+    start, end = digest_window(end, days)
+    sections = load_sections(start, end, per_category)
+
+    variants = {}
+    for email, categories in get_digest_subscribers():
+        selection = None if categories is None else tuple(sorted(set(categories)))
+        variants.setdefault(selection, []).append(email)
+
+    directory = os.path.join(outbox, end.isoformat())
+    os.makedirs(directory, exist_ok=True)
+    subject = f"Hacky News weekly digest: {start:%b %d} - {end - timedelta(days=1):%b %d}"
+    sent = 0
+
+    with open(os.path.join(directory, "recipients.jsonl"), "w", encoding="utf-8") as manifest:
+        for selection, recipients in variants.items():
+            key = variant_key(selection)
+            chosen = sorted(sections) if selection is None else [c for c in selection if c in sections]
+            digest = {
+                "start": start.isoformat(),
+                "end": end.isoformat(),
+                "sections": [{"category": c, "stories": sections[c]} for c in chosen],
+            }
+            html = _templates.get_template("digest.html").render(**digest)
+            with open(os.path.join(directory, f"digest-{key}.html"), "w", encoding="utf-8") as f:
+                f.write(html)
+            with open(os.path.join(directory, f"digest-{key}.json"), "w", encoding="utf-8") as f:
+                json.dump(digest, f)
+            for email in recipients:
+                manifest.write(json.dumps({"email": email, "digest": f"digest-{key}"}) + "\n")
+
+            if mailer is not None:
+                try:
+                    sent += mailer.send(recipients, subject, html)
+                except Exception as e:
+                    logger.error(f"Error mailing digest {key} to {len(recipients)} recipients: {str(e)}")
+
+    summary = {
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "subscribers": sum(len(r) for r in variants.values()),
+        "variants": len(variants),
+        "directory": directory,
+        "sent": sent,
+    }
+    logger.info(f"Digest run complete: {summary}")
+    return summary
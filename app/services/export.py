@@ -0,0 +1,155 @@
+"""
+Streaming story export.
+
+/export encodes stories batch by batch as they come out of DuckDB (see
+database.iter_stories), so memory use doesn't grow with the result and the
+first bytes go out before the query has finished. Formats:
+
+- "ndjson": one JSON object per line
+- "csv": a header row, then one row per story
+- "parquet": a Parquet file with one row group per batch (requires pyarrow)
+"""
+import csv
+import io
+import logging
+
+import orjson
+
+from app.config.settings import EXPORT_BATCH_ROWS
+from app.models.database import EXPORT_COLUMNS, iter_stories
+from app.utils.formatters import parse_flag, pyarrow_installed
+
+logger = logging.getLogger(__name__)
+
+EXPORT_FORMATS = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def _ndjson(filters):
+    for rows in iter_stories(**filters):
+        yield b"".join(orjson.dumps(dict(zip(EXPORT_COLUMNS, row))) + b"\n" for row in rows)
+
+
+def _csv(filters):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    yield buffer.getvalue().encode("utf-8")
+    for rows in iter_stories(**filters):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+
+
+class _Drain:
+    """Write-only file that hands back what was written since the last drain."""
+
+    closed = False
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def _parquet(filters):
+    import pyarrow.parquet as pq
+
+    sink = _Drain()
+    writer = None
+    for batch in iter_stories(arrow=True, **filters):
+        if writer is None:
+            writer = pq.ParquetWriter(sink, batch.schema)
+        writer.write_batch(batch)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+ENCODERS = {"ndjson": _ndjson, "csv": _csv, "parquet": _parquet}
+
+
+def export_format_error(fmt):
+    """
+    Why an export format can't be served.
+
+    Returns:
+        tuple: (error message, HTTP status), or None if the format is available
+    """
+    if fmt not in EXPORT_FORMATS:
+        return f"Unsupported export format: {fmt}", 400
+    if fmt == "parquet" and not pyarrow_installed():
+        return "Parquet export requires the pyarrow package, which isn't installed", 501
+    return None
+
+
+def export_filters(args):
+    """
+    Read the export filters from query parameters.
+
+    Raises:
+        ValueError: If since, until or limit isn't an integer
+    """
+    def integer(name):
+        value = args.get(name)
+        return int(value) if value not in (None, "") else None
+
+    return {
+        "category": args.get("category"),
+        "search_term": args.get("q") or None,
+        "since": integer("since"),
+        "until": integer("until"),
+        "limit": integer("limit"),
+        "collapse_duplicates": parse_flag(args.get("collapse_duplicates", "false")),
+    }
+
+
+def export_headers(fmt):
+    """Content type and download headers of an export response."""
+    return {
+        "Content-Type": EXPORT_FORMATS[fmt],
+        "Content-Disposition": f'attachment; filename="stories.{fmt}"',
+        "X-Accel-Buffering": "no",
+    }
+
+
+def export_stories(fmt, **filters):
+    """
+    Stream stories in an export format.
+
+    Args:
+        fmt: One of EXPORT_FORMATS
+        **filters: category, search_term, since, until, collapse_duplicates and limit (see iter_stories)
+
+    Returns:
+        generator: Chunks of the encoded file, as bytes
+    """
+    filters.setdefault("batch_size", EXPORT_BATCH_ROWS)
+    try:
+        yield from ENCODERS[fmt](filters)
+    except Exception as e:
+        # Headers are long gone; all we can do is cut the stream short
+        logger.error(f"Error exporting stories as {fmt}: {str(e)}")
+        raise
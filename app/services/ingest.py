@@ -0,0 +1,184 @@
+"""
+Ingestion engine shared by every news source.
+
+For each source: list current item IDs, then in batches fetch the items
+concurrently, map them to the common story schema, classify them with the
+keyword tier (leaving the rest pending for the background worker), mark
+near-duplicates, and write each batch with one upsert. New titles are
+embedded for the semantic index, and HN stories can have their comment
+trees synced, both in the background.
+"""
+import logging
+import threading
+import time
+
+from app.config.settings import (
+    DEFAULT_FETCH_LIMIT,
+    PENDING_CATEGORY,
+    SOURCE_BATCH_SIZE,
+    DEDUP_ENABLED,
+    SEMANTIC_INDEX_ENABLED,
+    DIGEST_ROLLUP_SIZE,
+    COMMENTS_ENABLED
+)
+from app.models.database import upsert_stories, resolve_external_ids, insert_snapshots, update_daily_rollups
+from app.services.broadcaster import broadcaster
+from app.services.classifier import classify_by_rules, notify_pending
+from app.services.comments import queue_threads, get_fetcher as get_comment_fetcher
+from app.services.dedup import assign_canonical_ids
+from app.services.sources import HackerNewsSource, get_sources
+from app.services.vectors import queue_stories
+
+logger = logging.getLogger(__name__)
+
+# Fields pushed to /stream clients
+PUBLISHED_FIELDS = ["id", "title", "url", "by", "time", "score", "descendants", "category"]
+
+# Sources with an ingest currently running, so scheduled runs never overlap
+_running = set()
+_running_lock = threading.Lock()
+
+
+def ingest_batch(source, items):
+    """
+    Classify and store one batch of raw items from a source.
+
+    Returns:
+        int: Number of stories written
+    """
+    stories = [story for story in map(source.to_story, items) if story and story.get("title")]
+
+    # Sources without integer IDs get stable negative story IDs
+    external = [story for story in stories if story.get("id") is None]
+    if external:
+        ids = resolve_external_ids(source.name, [story["guid"] for story in external])
+        for story in external:
+            story["id"] = ids.get(story["guid"])
+        stories = [story for story in stories if story.get("id") is not None]
+
+    for story in stories:
+        story["category"] = classify_by_rules(story["title"]) or PENDING_CATEGORY
+
+    # Point reposts and near-identical titles at the earliest copy
+    if DEDUP_ENABLED:
+        assign_canonical_ids(stories)
+
+    written = upsert_stories(stories)
+    if not written:
+        return 0
+
+    # Record score/comment history in one batch
+    now = int(time.time())
+    insert_snapshots([(story["id"], now, story.get("score"), story.get("descendants")) for story in stories])
+
+    # Keep the per-day top lists the digest reads from current
+    update_daily_rollups([story for story in stories if story.get("canonical_id") is None], DIGEST_ROLLUP_SIZE)
+
+    if any(story["category"] == PENDING_CATEGORY for story in stories):
+        notify_pending()
+
+    # The index worker embeds new titles for related stories and semantic search
+    if SEMANTIC_INDEX_ENABLED:
+        queue_stories(stories)
+
+    # Push the new and updated stories to connected clients in one broadcast
+    broadcaster.publish("stories", [{field: story.get(field) for field in PUBLISHED_FIELDS} for story in stories])
+
+    # The comment worker fetches the threads that grew or shrank since their last sync
+    if COMMENTS_ENABLED and isinstance(source, HackerNewsSource):
+        stored = {story["id"] for story in stories}
+        queue_threads([item for item in items if item and item.get("id") in stored],
+                      get_comment_fetcher(source.replay))
+    return written
+
+
+def ingest_source(source, limit=None):
+    """
+    Fetch and store a source's current stories.
+
+    Args:
+        source: A NewsSource
+        limit: Maximum number of stories (defaults to the source's own limit)
+
+    Returns:
+        int: Number of stories added or updated
+    """
+    limit = limit or source.limit
+    logger.info(f"Starting ingest from {source.name}, fetching up to {limit} stories...")
+    item_ids = source.list_new_ids()[:limit]
+    count = 0
+
+    for start in range(0, len(item_ids), SOURCE_BATCH_SIZE):
+        batch = item_ids[start:start + SOURCE_BATCH_SIZE]
+        try:
+            count += ingest_batch(source, source.fetch_items(batch))
+        except Exception as e:
+            logger.error(f"Error ingesting batch from {source.name}: {str(e)}")
+
+    logger.info(f"Ingest from {source.name} complete. Added/updated {count} of {len(item_ids)} stories.")
+    return count
+
+
+def sync_news(limit=DEFAULT_FETCH_LIMIT, replay=None):
+    """
+    Fetch and store latest Hacker News stories.
+
+    Args:
+        limit: Maximum number of stories to fetch
+        replay: Read the feed and items from the item cache alone, without
+            network requests (defaults to ITEM_CACHE_REPLAY)
+
+    Returns:
+        int: Number of stories processed, or None if an ingest of "hn-new" was already running
+    """
+    source = get_sources().get("hn-new") or HackerNewsSource("hn-new", feed="new")
+    if replay is not None and replay != source.replay:
+        source = HackerNewsSource("hn-new", feed="new", replay=replay)
+    return ingest_exclusive(source, limit)
+
+
+def ingest_exclusive(source, limit=None):
+    """
+    Ingest a source unless an ingest of it is already running.
+
+    Returns:
+        int: Number of stories added or updated, or None if skipped
+    """
+    with _running_lock:
+        if source.name in _running:
+            logger.info(f"Skipping {source.name}, previous ingest still running")
+            return None
+        _running.add(source.name)
+    try:
+        return ingest_source(source, limit)
+    finally:
+        with _running_lock:
+            _running.discard(source.name)
+
+
+def _run_exclusive(source):
+    """Run a scheduled ingest of a source, logging rather than raising errors."""
+    try:
+        ingest_exclusive(source)
+    except Exception as e:
+        logger.error(f"Error ingesting {source.name}: {str(e)}")
+
+
+def start_ingest(source):
+    """Ingest a source in a background thread."""
+    thread = threading.Thread(target=_run_exclusive, args=(source,), name=f"ingest-{source.name}")
+    thread.daemon = True
+    thread.start()
+    return thread
+
+
+def schedule_sources(scheduler):
+    """
+    Register every configured source with a `schedule` scheduler.
+
+    Each source runs on its own interval and in its own thread, so a slow
+    feed never delays the others.
+    """
+    for source in get_sources().values():
+        scheduler.every(source.interval).minutes.do(start_ingest, source)
+        logger.info(f"Scheduled {source.name} every {source.interval} minutes")
@@ -0,0 +1,151 @@
+"""
+On-disk cache of raw Hacker News items.
+
+Every item fetched from the HN API is stored here, and HackerNewsSource
+serves the cached copy while it is fresh. How long that is depends on the
+item's age (ITEM_CACHE_TTLS): a story posted minutes ago changes by the
+second, one from last month almost never. Feed listings are kept too, so a
+replay (REPLAY=1) can run a whole ingest from the cache without the network.
+
+Layout under the cache directory:
+- objects/ab/cdef...: item JSON, gzip-compressed and named by its SHA-256,
+  so refetching an unchanged item stores nothing new
+- items/<id // 10000>/<id>: digest of the item's latest version; the file's
+  modification time is when it was fetched
+- feeds/<feed>.json: latest ID list of each feed
+
+Files are written under a temporary name and renamed into place, so
+concurrent fetchers and processes never read a partial one.
+"""
+import gzip
+import hashlib
+import logging
+import os
+import threading
+import time
+
+import orjson
+
+from app.config.settings import ITEM_CACHE_DIR, ITEM_CACHE_TTLS, ITEM_CACHE_RETENTION_DAYS
+
+logger = logging.getLogger(__name__)
+
+
+def freshness(item, now, ttls=ITEM_CACHE_TTLS):
+    """Seconds a cached copy of an item stays fresh, going by the item's age."""
+    age = now - (item.get("time") or now)
+    for max_age, ttl in ttls:
+        if max_age is None or age <= max_age:
+            return ttl
+    return ttls[-1][1]
+
+
+def _write(path, data):
+    """Write a file atomically, creating its directory if needed."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ItemCache:
+    """Content-addressed store of raw items, with fetch times for freshness."""
+
+    def __init__(self, directory=ITEM_CACHE_DIR):
+        self.directory = directory
+
+    def _ref_path(self, item_id):
+        return os.path.join(self.directory, "items", str(int(item_id) // 10000), str(int(item_id)))
+
+    def _object_path(self, digest):
+        return os.path.join(self.directory, "objects", digest[:2], digest[2:])
+
+    def _feed_path(self, feed):
+        return os.path.join(self.directory, "feeds", f"{feed}.json")
+
+    def get(self, item_id, now=None, stale_ok=False):
+        """The cached item; None if it isn't cached or, unless stale_ok, is no longer fresh."""
+        now = time.time() if now is None else now
+        try:
+            with open(self._ref_path(item_id), "rb") as f:
+                digest = f.read().decode("ascii")
+                fetched_at = os.fstat(f.fileno()).st_mtime
+            with open(self._object_path(digest), "rb") as f:
+                item = orjson.loads(gzip.decompress(f.read()))
+        except FileNotFoundError:
+            return None
+        if not stale_ok and now - fetched_at > freshness(item, now):
+            return None
+        return item
+
+    def put(self, item_id, item):
+        """Store a freshly fetched item."""
+        data = orjson.dumps(item, option=orjson.OPT_SORT_KEYS)
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        if not os.path.exists(path):
+            _write(path, gzip.compress(data, 6, mtime=0))
+        ref = self._ref_path(item_id)
+        try:
+            with open(ref, "rb") as f:
+                unchanged = f.read() == digest.encode("ascii")
+        except FileNotFoundError:
+            unchanged = False
+        if unchanged:
+            # Same content as last time: only the fetch time moves
+            os.utime(ref)
+        else:
+            _write(ref, digest.encode("ascii"))
+
+    def get_feed(self, feed):
+        """The last stored ID list of a feed, or None."""
+        try:
+            with open(self._feed_path(feed), "rb") as f:
+                return orjson.loads(f.read())
+        except FileNotFoundError:
+            return None
+
+    def put_feed(self, feed, item_ids):
+        _write(self._feed_path(feed), orjson.dumps(item_ids))
+
+    def prune(self, retention_days=ITEM_CACHE_RETENTION_DAYS, now=None):
+        """
+        Drop items not fetched within the retention window, then every object no item refers to.
+
+        Objects newer than an hour are kept even when unreferenced, since a
+        concurrent put writes the object before the reference.
+
+        Returns:
+            dict: Numbers of items and objects removed
+        """
+        now = time.time() if now is None else now
+        referenced = set()
+        items = objects = 0
+        for root, _, files in os.walk(os.path.join(self.directory, "items")):
+            for name in files:
+                path = os.path.join(root, name)
+                if now - os.stat(path).st_mtime > retention_days * 86400:
+                    os.remove(path)
+                    items += 1
+                    continue
+                with open(path, "rb") as f:
+                    referenced.add(f.read().decode("ascii"))
+        for root, _, files in os.walk(os.path.join(self.directory, "objects")):
+            for name in files:
+                path = os.path.join(root, name)
+                digest = os.path.basename(root) + name
+                if digest not in referenced and now - os.stat(path).st_mtime > 3600:
+                    os.remove(path)
+                    objects += 1
+        logger.info(f"Pruned {items} items and {objects} objects from the item cache")
+        return {"items": items, "objects": objects}
+
+
+def prune_item_cache():
+    """Apply the retention window to the default item cache (run nightly)."""
+    try:
+        return ItemCache().prune()
+    except Exception as e:
+        logger.error(f"Error pruning item cache: {str(e)}")
+        return None
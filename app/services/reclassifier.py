@@ -0,0 +1,182 @@
+"""
+Bulk reclassification of stories already stored in the database.
+
+Streams the corpus in ID-ordered chunks, runs each chunk through the keyword
+tier and the batched model tier, and writes changed categories back with one
+bulk update per chunk. Progress is checkpointed so interrupted runs resume
+where they stopped.
+"""
+import logging
+import threading
+from collections import Counter
+
+from app.config.settings import RECLASSIFY_CHUNK_SIZE, RECLASSIFY_DIFF_SAMPLES
+from app.models.database import (
+    MIN_STORY_ID,
+    execute_query,
+    get_story_chunk,
+    update_categories,
+    get_reclassify_checkpoint,
+    save_reclassify_checkpoint,
+    clear_reclassify_checkpoint
+)
+from app.services.classifier import classify_by_rules, classify_with_model
+
+logger = logging.getLogger(__name__)
+
+JOB_NAME = "corpus"
+
+# Progress of the job started from the API, if any
+_job_status = {"state": "idle"}
+_job_lock = threading.Lock()
+
+
+def classify_chunk(rows, use_model=True):
+    """
+    Classify a chunk of (id, title, category) rows.
+
+    Titles the keyword rules don't match go to the model tier as a single
+    batch, or keep their current category when the model is skipped.
+
+    Returns:
+        list: New category for each row
+
+    Raises:
+        Exception: If the model tier fails
+    """
+    categories = [classify_by_rules(title) if title else "Uncategorized" for _, title, _ in rows]
+    misses = [i for i, category in enumerate(categories) if category is None]
+
+    if misses and use_model:
+        predicted = classify_with_model([rows[i][1] for i in misses])
+        for i, category in zip(misses, predicted):
+            categories[i] = category
+    else:
+        for i in misses:
+            categories[i] = rows[i][2]
+    return categories
+
+
+def reclassify_corpus(chunk_size=RECLASSIFY_CHUNK_SIZE, dry_run=False, resume=True, use_model=True,
+                      progress=None):
+    """
+    Reclassify every stored story.
+
+    Args:
+        chunk_size: Rows read, classified and written per step
+        dry_run: Report what would change without writing anything
+        resume: Continue from the last checkpoint instead of starting over
+        use_model: Run the model tier for titles no keyword rule matches
+        progress: Optional callback receiving the status dict after each chunk
+
+    Returns:
+        dict: Final status, including a diff of category changes; state "failed"
+        if a chunk couldn't be classified or written
+    """
+    total = execute_query("SELECT COUNT(*) FROM all_stories", primary=True)[0][0]
+    last_id, processed, changed = MIN_STORY_ID, 0, 0
+
+    if dry_run or not resume:
+        checkpoint = None
+    else:
+        checkpoint = get_reclassify_checkpoint(JOB_NAME)
+    if checkpoint:
+        last_id, processed, changed = checkpoint
+        logger.info(f"Resuming reclassification after story {last_id} ({processed}/{total} done)")
+    elif not dry_run:
+        clear_reclassify_checkpoint(JOB_NAME)
+
+    diff = Counter()
+    samples = []
+    status = {"state": "running", "dry_run": dry_run, "total": total,
+              "processed": processed, "changed": changed}
+
+    while True:
+        rows = get_story_chunk(last_id, chunk_size)
+        if not rows:
+            break
+
+        try:
+            categories = classify_chunk(rows, use_model)
+        except Exception as e:
+            # Nothing of this chunk is written, and the checkpoint stays before it
+            logger.error(f"Reclassification stopped after story {last_id}: the model tier failed: {str(e)}")
+            status.update(state="failed", message=f"Classifying stories after story {last_id} failed ({str(e)})")
+            return status
+        changes = [(row, new) for row, new in zip(rows, categories) if new != row[2]]
+        for (story_id, title, old), new in changes:
+            diff[(old, new)] += 1
+            if len(samples) < RECLASSIFY_DIFF_SAMPLES:
+                samples.append({"id": story_id, "title": title, "from": old, "to": new})
+
+        if not dry_run:
+            written = update_categories([row[0] for row, _ in changes], [new for _, new in changes])
+            if written is None:
+                # Keep the last checkpoint, so a resumed run retries this chunk
+                logger.error(f"Reclassification stopped after story {last_id}: writing categories failed")
+                status.update(state="failed", message=f"Writing categories after story {last_id} failed")
+                return status
+        last_id = rows[-1][0]
+        processed += len(rows)
+        changed += len(changes)
+        if not dry_run:
+            save_reclassify_checkpoint(JOB_NAME, last_id, processed, changed)
+
+        status.update(processed=processed, changed=changed)
+        logger.info(f"Reclassified {processed}/{total} stories, {changed} changed")
+        if progress:
+            progress(status)
+
+    if not dry_run:
+        clear_reclassify_checkpoint(JOB_NAME)
+    status.update(
+        state="done",
+        diff=[{"from": old, "to": new, "count": count} for (old, new), count in diff.most_common()],
+        samples=samples
+    )
+    return status
+
+
+def _run_job(**kwargs):
+    """Run a reclassification job in the background, publishing its progress."""
+    try:
+        result = reclassify_corpus(progress=lambda status: _set_status(dict(status)), **kwargs)
+        _set_status(result)
+    except Exception as e:
+        logger.error(f"Error reclassifying stories: {str(e)}")
+        _set_status({"state": "error", "message": str(e)})
+
+
+def _set_status(status):
+    """Replace the published job status."""
+    global _job_status
+    with _job_lock:
+        _job_status = status
+
+
+def get_job_status():
+    """Get the status of the most recent background reclassification job."""
+    with _job_lock:
+        return dict(_job_status)
+
+
+def start_reclassification_job(**kwargs):
+    """
+    Start a background reclassification job.
+
+    Args:
+        **kwargs: Options passed to reclassify_corpus
+
+    Returns:
+        bool: False if a job is already running
+    """
+    global _job_status
+    with _job_lock:
+        if _job_status.get("state") == "running":
+            return False
+        _job_status = {"state": "running", "dry_run": kwargs.get("dry_run", False), "processed": 0}
+
+    thread = threading.Thread(target=_run_job, kwargs=kwargs, name="reclassification-job")
+    thread.daemon = True
+    thread.start()
+    return True
@@ -0,0 +1,297 @@
+"""
+News source adapters.
+
+Every source implements the same small interface: list the IDs of its
+current items, fetch items for a batch of IDs, and map an item onto the
+common story schema. Fetching is shared: items are requested concurrently
+through a per-source session and rate limiter.
+"""
+import logging
+import threading
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from app.config.settings import (
+    HN_FEED_URLS,
+    HN_ITEM_URL,
+    NEWS_SOURCES,
+    DEFAULT_FETCH_LIMIT,
+    SOURCE_FETCH_CONCURRENCY,
+    SOURCE_REQUEST_TIMEOUT,
+    ITEM_CACHE_ENABLED,
+    ITEM_CACHE_REPLAY
+)
+from app.services.item_cache import ItemCache
+
+logger = logging.getLogger(__name__)
+
+ATOM_NS = "{http://www.w3.org/2005/Atom}"
+DC_NS = "{http://purl.org/dc/elements/1.1/}"
+
+
+class RateLimiter:
+    """Spaces requests out to at most `rate` per second, across threads."""
+
+    def __init__(self, rate):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def wait(self):
+        """Block until the next request is allowed."""
+        with self._lock:
+            now = time.monotonic()
+            start = max(self._next, now)
+            self._next = start + self.interval
+        if start > now:
+            time.sleep(start - now)
+
+
+class NewsSource:
+    """
+    Base class for news source adapters.
+
+    Subclasses implement list_new_ids, fetch_item (or fetch_items) and to_story.
+    """
+
+    def __init__(self, name, interval=15, limit=DEFAULT_FETCH_LIMIT, rate=10):
+        self.name = name
+        self.interval = interval
+        self.limit = limit
+        self.session = requests.Session()
+        self.rate_limiter = RateLimiter(rate)
+
+    def get(self, url):
+        """Rate-limited GET request."""
+        self.rate_limiter.wait()
+        return self.session.get(url, timeout=SOURCE_REQUEST_TIMEOUT)
+
+    def list_new_ids(self):
+        """IDs of the source's current items, newest or highest-ranked first."""
+        raise NotImplementedError
+
+    def fetch_item(self, item_id):
+        """Fetch one raw item, or None if it can't be fetched."""
+        raise NotImplementedError
+
+    def fetch_items(self, item_ids, concurrency=SOURCE_FETCH_CONCURRENCY):
+        """Fetch a batch of raw items concurrently, in the order of item_ids."""
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(self.fetch_item, item_ids))
+
+    def to_story(self, item):
+        """
+        Map a raw item onto the common story schema.
+
+        Returns:
+            dict: id (or guid for sources without integer IDs), title, url, by,
+            time, score, descendants, type and source; None to skip the item
+        """
+        raise NotImplementedError
+
+
+class HackerNewsSource(NewsSource):
+    """
+    Stories from one of the Hacker News feeds (new, top, best, ask, show).
+
+    Items go through an ItemCache (see app.services.item_cache): fresh cached
+    copies are served without a request when `reuse_cached` is set, and
+    every fetched item is stored. With `replay`, feeds and items come from
+    the cache alone.
+    """
+
+    def __init__(self, name, feed="new", cache=None, replay=ITEM_CACHE_REPLAY, reuse_cached=True, **kwargs):
+        super().__init__(name, **kwargs)
+        if feed not in HN_FEED_URLS:
+            raise ValueError(f"Unknown Hacker News feed: {feed}")
+        self.feed = feed
+        self.replay = replay
+        self.reuse_cached = reuse_cached
+        if cache is None and (ITEM_CACHE_ENABLED or replay):
+            cache = ItemCache()
+        self.cache = cache
+
+    def list_new_ids(self):
+        if self.replay:
+            item_ids = self.cache.get_feed(self.feed)
+            if item_ids is None:
+                logger.error(f"No cached {self.feed} story IDs to replay")
+            return item_ids or []
+        try:
+            response = self.get(HN_FEED_URLS[self.feed])
+            if response.status_code == 200:
+                item_ids = response.json()
+                if self.cache is not None:
+                    self._store(self.cache.put_feed, self.feed, item_ids)
+                return item_ids
+            else:
+                logger.error(f"Failed to fetch {self.feed} story IDs. Status code: {response.status_code}")
+                return []
+        except Exception as e:
+            logger.error(f"Error fetching {self.feed} story IDs: {str(e)}")
+            return []
+
+    def fetch_item(self, item_id):
+        if self.cache is not None and (self.replay or self.reuse_cached):
+            item = self.cache.get(item_id, stale_ok=self.replay)
+            if item is not None or self.replay:
+                return item
+        item = self.request_item(item_id)
+        if item is not None and self.cache is not None:
+            self._store(self.cache.put, item_id, item)
+        return item
+
+    def request_item(self, item_id):
+        """Fetch one raw item from the HN API, bypassing the cache."""
+        try:
+            response = self.get(HN_ITEM_URL.format(item_id))
+            if response.status_code == 200:
+                return response.json()
+            else:
+                logger.error(f"Failed to fetch item {item_id}. Status code: {response.status_code}")
+                return None
+        except Exception as e:
+            logger.error(f"Error fetching item {item_id}: {str(e)}")
+            return None
+
+    def _store(self, put, key, value):
+        # A full or read-only disk costs the cache, never the ingest
+        try:
+            put(key, value)
+        except OSError as e:
+            logger.error(f"Error writing {key} to the item cache: {str(e)}")
+
+    def to_story(self, item):
+        if not item or item.get("deleted") or item.get("dead") or not item.get("title"):
+            return None
+        return {
+            "id": item["id"],
+            "title": item.get("title"),
+            "url": item.get("url"),
+            "by": item.get("by"),
+            "time": item.get("time"),
+            "score": item.get("score"),
+            "descendants": item.get("descendants"),
+            "type": item.get("type"),
+            "source": "hn"
+        }
+
+
+class RssSource(NewsSource):
+    """Entries from an RSS 2.0 or Atom feed; the whole feed is read in one request."""
+
+    def __init__(self, name, url, **kwargs):
+        super().__init__(name, **kwargs)
+        self.url = url
+        self._entries = {}
+
+    def list_new_ids(self):
+        try:
+            response = self.get(self.url)
+            if response.status_code != 200:
+                logger.error(f"Failed to fetch feed {self.url}. Status code: {response.status_code}")
+                return []
+            entries = parse_feed(response.content)
+        except Exception as e:
+            logger.error(f"Error fetching feed {self.url}: {str(e)}")
+            return []
+        self._entries = {entry["guid"]: entry for entry in entries}
+        return list(self._entries)
+
+    def fetch_items(self, item_ids, concurrency=SOURCE_FETCH_CONCURRENCY):
+        # Entries arrive with the feed itself, no per-item requests needed
+        return [self._entries.get(item_id) for item_id in item_ids]
+
+    def to_story(self, item):
+        if not item or not item.get("title"):
+            return None
+        return dict(item, score=None, descendants=None, type="story", source=self.name)
+
+
+def _text(element, tag):
+    """Stripped text of a child element, or None."""
+    child = element.find(tag)
+    return child.text.strip() if child is not None and child.text else None
+
+
+def _parse_time(value, rfc822):
+    """Unix time from an RSS (RFC 822) or Atom (ISO 8601) date, or None."""
+    if not value:
+        return None
+    try:
+        parsed = parsedate_to_datetime(value) if rfc822 else datetime.fromisoformat(value)
+        return int(parsed.timestamp())
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_feed(content):
+    """
+    Parse an RSS 2.0 or Atom document.
+
+    Returns:
+        list: Dicts with guid, title, url, by and time
+    """
+    root = ET.fromstring(content)
+    entries = []
+
+    for item in root.iter("item"):
+        url = _text(item, "link")
+        entries.append({
+            "guid": _text(item, "guid") or url,
+            "title": _text(item, "title"),
+            "url": url,
+            "by": _text(item, f"{DC_NS}creator") or _text(item, "author"),
+            "time": _parse_time(_text(item, "pubDate"), rfc822=True),
+        })
+
+    for entry in root.iter(f"{ATOM_NS}entry"):
+        link = entry.find(f"{ATOM_NS}link[@rel='alternate']")
+        if link is None:
+            link = entry.find(f"{ATOM_NS}link")
+        url = link.get("href") if link is not None else None
+        author = entry.find(f"{ATOM_NS}author")
+        entries.append({
+            "guid": _text(entry, f"{ATOM_NS}id") or url,
+            "title": _text(entry, f"{ATOM_NS}title"),
+            "url": url,
+            "by": _text(author, f"{ATOM_NS}name") if author is not None else None,
+            "time": _parse_time(
+                _text(entry, f"{ATOM_NS}published") or _text(entry, f"{ATOM_NS}updated"), rfc822=False
+            ),
+        })
+
+    return [entry for entry in entries if entry["guid"]]
+
+
+SOURCE_TYPES = {
+    "hn": HackerNewsSource,
+    "rss": RssSource,
+}
+
+
+def create_source(config):
+    """Build a source adapter from a NEWS_SOURCES entry."""
+    options = dict(config)
+    source_type = options.pop("type")
+    if source_type not in SOURCE_TYPES:
+        raise ValueError(f"Unknown news source type: {source_type}")
+    return SOURCE_TYPES[source_type](**options)
+
+
+_sources = None
+_sources_lock = threading.Lock()
+
+
+def get_sources():
+    """The configured sources, created once per process so each keeps its own rate limit."""
+    global _sources
+    with _sources_lock:
+        if _sources is None:
+            _sources = {config["name"]: create_source(config) for config in NEWS_SOURCES}
+        return _sources
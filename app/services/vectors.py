@@ -0,0 +1,376 @@
+"""
+Semantic story index for related stories and semantic search.
+
+Title embeddings from the classifier's sentence-embedding model are stored
+int8-quantized in append-only, memory-mapped files under VECTOR_DIR:
+
+- ids.i8: story ID of each row (int64)
+- vectors.i1: one int8 embedding row per story
+- lists.i4: inverted-file cluster of each row (int32), once trained
+- centroids.npy and meta.json: cluster centroids, dimension and training size
+
+Ingest queues new stories for a background worker (queue_stories), which
+embeds them one encoder pass per batch and appends the rows; writers in
+different processes take turns through an exclusive lock on a lock file.
+Readers in any process map the files and pick up new rows on their next query. Small corpora are searched
+exactly. Past VECTOR_IVF_MIN_ROWS, k-means centroids are trained and each
+query only scans the VECTOR_IVF_PROBES nearest clusters (plus rows added
+since training), which keeps queries in the low milliseconds at millions of
+stories. Clusters are retrained whenever the corpus has quadrupled.
+"""
+import fcntl
+import json
+import logging
+import os
+import threading
+
+import numpy as np
+
+from app.config.settings import VECTOR_DIR, VECTOR_IVF_MIN_ROWS, VECTOR_IVF_PROBES
+from app.models.database import execute_query, get_ranked_stories
+from app.services.classifier import encode_texts
+
+logger = logging.getLogger(__name__)
+
+IDS_FILE = "ids.i8"
+VECTORS_FILE = "vectors.i1"
+LISTS_FILE = "lists.i4"
+CENTROIDS_FILE = "centroids.npy"
+META_FILE = "meta.json"
+LOCK_FILE = "write.lock"
+
+# Values of the /search `mode` parameter
+SEARCH_MODES = ("keyword", "semantic")
+
+# Embeddings are unit-length, so every component fits [-1, 1]
+QUANT_SCALE = 127.0
+RETRAIN_FACTOR = 4
+TRAIN_SAMPLE = 20000
+KMEANS_ITERATIONS = 10
+SCAN_CHUNK = 65536
+
+
+def quantize(embeddings):
+    """L2-normalized float embeddings to int8."""
+    return np.clip(np.rint(np.asarray(embeddings, dtype=np.float32) * QUANT_SCALE), -127, 127).astype(np.int8)
+
+
+def _scores(vectors, query):
+    """Cosine similarities of int8 rows to a float query."""
+    return vectors.astype(np.float32) @ query / QUANT_SCALE
+
+
+class IndexSnapshot:
+    """Read-only view of the index files at one point in time."""
+
+    def __init__(self, directory, rows, meta):
+        self.rows = rows
+        self.dim = meta["dim"]
+        self.ids = np.fromfile(os.path.join(directory, IDS_FILE), dtype=np.int64, count=rows)
+        self.id_order = np.argsort(self.ids, kind="stable")
+        self.sorted_ids = self.ids[self.id_order]
+        self.vectors = np.memmap(os.path.join(directory, VECTORS_FILE), dtype=np.int8, mode="r",
+                                 shape=(rows, self.dim))
+
+        self.centroids = None
+        self.listed = 0
+        centroids_path = os.path.join(directory, CENTROIDS_FILE)
+        if os.path.exists(centroids_path):
+            self.centroids = np.load(centroids_path)
+            lists = np.fromfile(os.path.join(directory, LISTS_FILE), dtype=np.int32)[:rows]
+            self.listed = len(lists)
+            # Rows grouped by cluster, with each cluster's start offset
+            self.list_rows = np.argsort(lists, kind="stable")
+            self.list_offsets = np.searchsorted(lists[self.list_rows], np.arange(len(self.centroids) + 1))
+
+    def row_of(self, story_id):
+        """Row index of a story, or None if it isn't indexed."""
+        i = np.searchsorted(self.sorted_ids, story_id)
+        if i < self.rows and self.sorted_ids[i] == story_id:
+            return int(self.id_order[i])
+        return None
+
+    def contains(self, story_ids):
+        """Boolean mask of which story IDs are indexed."""
+        story_ids = np.asarray(story_ids, dtype=np.int64)
+        i = np.minimum(np.searchsorted(self.sorted_ids, story_ids), max(self.rows - 1, 0))
+        return (self.sorted_ids[i] == story_ids) if self.rows else np.zeros(len(story_ids), dtype=bool)
+
+    def vector(self, row):
+        """Dequantized embedding of a row."""
+        return self.vectors[row].astype(np.float32) / QUANT_SCALE
+
+    def search(self, query, k, exclude=None, probes=VECTOR_IVF_PROBES):
+        """
+        Top-k rows by cosine similarity.
+
+        Returns:
+            list: (story ID, similarity) pairs, best first
+        """
+        query = np.asarray(query, dtype=np.float32)
+        if self.centroids is None:
+            rows = None
+            scores = np.concatenate([_scores(self.vectors[start:start + SCAN_CHUNK], query)
+                                     for start in range(0, self.rows, SCAN_CHUNK)])
+        else:
+            centroid_scores = self.centroids @ query
+            nearest = np.argpartition(-centroid_scores, min(probes, len(centroid_scores)) - 1)[:probes]
+            rows = np.sort(np.concatenate(
+                [self.list_rows[self.list_offsets[c]:self.list_offsets[c + 1]] for c in nearest]
+                + [np.arange(self.listed, self.rows)]
+            ))
+            scores = _scores(self.vectors[rows], query)
+
+        wanted = min(k + 1, len(scores))
+        if not wanted:
+            return []
+        top = np.argpartition(-scores, wanted - 1)[:wanted]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        results = []
+        for i in top:
+            story_id = int(self.ids[i if rows is None else rows[i]])
+            if story_id != exclude:
+                results.append((story_id, float(scores[i])))
+        return results[:k]
+
+
+class VectorIndex:
+    """Append-only embedding store with exact and inverted-file search."""
+
+    def __init__(self, directory=VECTOR_DIR, ivf_min_rows=VECTOR_IVF_MIN_ROWS):
+        self.directory = directory
+        self.ivf_min_rows = ivf_min_rows
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._snapshot_key = None
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _read_meta(self):
+        try:
+            with open(self._path(META_FILE)) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def _write_meta(self, meta):
+        tmp = self._path(META_FILE + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._path(META_FILE))
+
+    def snapshot(self):
+        """Current view of the index, reloaded only when the files have changed; None when empty."""
+        meta = self._read_meta()
+        try:
+            rows = os.path.getsize(self._path(IDS_FILE)) // 8
+        except FileNotFoundError:
+            return None
+        if not meta or not rows:
+            return None
+        key = (rows, meta.get("trained_rows"))
+        if key != self._snapshot_key:
+            self._snapshot = IndexSnapshot(self.directory, rows, meta)
+            self._snapshot_key = key
+        return self._snapshot
+
+    def add(self, story_ids, embeddings):
+        """
+        Append embeddings for stories not indexed yet.
+
+        Returns:
+            int: Number of rows added
+        """
+        with self._lock:
+            os.makedirs(self.directory, exist_ok=True)
+            # Other processes append to the same files, so hold the lock file through the append and any retraining
+            with open(self._path(LOCK_FILE), "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                return self._append(story_ids, embeddings)
+
+    def _append(self, story_ids, embeddings):
+        """Append new rows (and retrain if due); the caller holds the write locks."""
+        snapshot = self.snapshot()
+        meta = self._read_meta() or {"dim": int(embeddings.shape[1]), "trained_rows": None}
+        rows = snapshot.rows if snapshot else 0
+
+        story_ids = np.asarray(story_ids, dtype=np.int64)
+        _, first = np.unique(story_ids, return_index=True)
+        keep = np.zeros(len(story_ids), dtype=bool)
+        keep[first] = True
+        if snapshot:
+            keep &= ~snapshot.contains(story_ids)
+        if not keep.any():
+            return 0
+        vectors = quantize(embeddings[keep])
+        if not snapshot:
+            self._write_meta(meta)
+
+        # Drop any rows a crashed writer left past the last committed ID
+        for name, width in ((VECTORS_FILE, meta["dim"]), (LISTS_FILE, 4)):
+            path = self._path(name)
+            if os.path.exists(path) and os.path.getsize(path) > rows * width:
+                os.truncate(path, rows * width)
+
+        # IDs go last: a row only becomes visible once its ID is written
+        with open(self._path(VECTORS_FILE), "ab") as f:
+            f.write(vectors.tobytes())
+        if snapshot and snapshot.centroids is not None:
+            lists = np.argmax(vectors.astype(np.float32) @ snapshot.centroids.T, axis=1).astype(np.int32)
+            with open(self._path(LISTS_FILE), "ab") as f:
+                f.write(lists.tobytes())
+        with open(self._path(IDS_FILE), "ab") as f:
+            f.write(story_ids[keep].tobytes())
+
+        total = rows + len(vectors)
+        trained = meta.get("trained_rows")
+        if (trained is None and total >= self.ivf_min_rows) or (trained and total >= RETRAIN_FACTOR * trained):
+            self._train(total, meta)
+        return len(vectors)
+
+    def _train(self, rows, meta):
+        """Cluster the index with spherical k-means and reassign every row."""
+        vectors = np.memmap(self._path(VECTORS_FILE), dtype=np.int8, mode="r", shape=(rows, meta["dim"]))
+        rng = np.random.default_rng(0)
+        sample_rows = np.sort(rng.choice(rows, min(rows, TRAIN_SAMPLE), replace=False))
+        sample = vectors[sample_rows].astype(np.float32) / QUANT_SCALE
+        clusters = max(1, min(int(4 * np.sqrt(rows)), len(sample) // 8, 4096))
+        logger.info(f"Training vector index: {clusters} clusters over {rows} stories")
+
+        centroids = sample[rng.choice(len(sample), clusters, replace=False)]
+        for _ in range(KMEANS_ITERATIONS):
+            assignment = np.argmax(sample @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignment, sample)
+            filled = np.bincount(assignment, minlength=clusters) > 0
+            centroids[filled] = sums[filled]
+            centroids /= np.maximum(np.linalg.norm(centroids, axis=1, keepdims=True), 1e-9)
+
+        lists = np.concatenate([
+            np.argmax(vectors[start:start + SCAN_CHUNK].astype(np.float32) @ centroids.T, axis=1)
+            for start in range(0, rows, SCAN_CHUNK)
+        ]).astype(np.int32)
+
+        # Lists first, then centroids and meta, each swapped in atomically
+        lists.tofile(self._path(LISTS_FILE + ".tmp"))
+        os.replace(self._path(LISTS_FILE + ".tmp"), self._path(LISTS_FILE))
+        with open(self._path(CENTROIDS_FILE + ".tmp"), "wb") as f:
+            np.save(f, centroids.astype(np.float32))
+        os.replace(self._path(CENTROIDS_FILE + ".tmp"), self._path(CENTROIDS_FILE))
+        self._write_meta(dict(meta, trained_rows=rows))
+
+
+_index = VectorIndex()
+
+# Stories waiting for the index worker, by ID (a newer title replaces an older one)
+_queued = {}
+_queue_lock = threading.Lock()
+_queue_event = threading.Event()
+_worker_thread = None
+_worker_lock = threading.Lock()
+
+
+def index_stories(stories):
+    """
+    Embed and index the titles of stories that aren't indexed yet, in one batch.
+
+    Returns:
+        int: Number of stories added
+    """
+    stories = [story for story in stories if story.get("title") and story.get("id") is not None]
+    snapshot = _index.snapshot()
+    if snapshot:
+        indexed = snapshot.contains([story["id"] for story in stories])
+        stories = [story for story, known in zip(stories, indexed) if not known]
+    if not stories:
+        return 0
+    embeddings = encode_texts([story["title"] for story in stories])
+    return _index.add([story["id"] for story in stories], embeddings)
+
+
+def queue_stories(stories):
+    """Hand stories to the index worker, starting it if needed."""
+    stories = [story for story in stories if story.get("title") and story.get("id") is not None]
+    if not stories:
+        return
+    with _queue_lock:
+        for story in stories:
+            _queued[story["id"]] = {"id": story["id"], "title": story["title"]}
+    start_index_worker()
+    _queue_event.set()
+
+
+def index_queued_stories():
+    """
+    Embed and index every queued story.
+
+    Returns:
+        int: Number of stories added
+    """
+    global _queued
+    with _queue_lock:
+        queued, _queued = _queued, {}
+    return index_stories(list(queued.values()))
+
+
+def _run_index_worker():
+    """Index queued stories whenever an ingest queues more."""
+    while True:
+        _queue_event.wait()
+        _queue_event.clear()
+        try:
+            index_queued_stories()
+        except Exception as e:
+            # Stories left out are picked up by `embed-stories`
+            logger.error(f"Error in index worker: {str(e)}")
+
+
+def start_index_worker():
+    """Start the background index worker if it isn't running yet."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is None or not _worker_thread.is_alive():
+            _worker_thread = threading.Thread(target=_run_index_worker, name="index-worker")
+            _worker_thread.daemon = True
+            _worker_thread.start()
+            logger.info("Started background index worker")
+
+
+def semantic_search(text, limit=10):
+    """
+    Stories whose titles are closest in meaning to a free-text query.
+
+    Returns:
+        list: (story ID, similarity) pairs, best first
+    """
+    snapshot = _index.snapshot()
+    if snapshot is None or not text.strip():
+        return []
+    return snapshot.search(encode_texts([text])[0], limit)
+
+
+def related_stories(story_id, limit=10):
+    """
+    Stories closest in meaning to a stored story.
+
+    Returns:
+        list: (story ID, similarity) pairs, best first; None if the story doesn't exist
+    """
+    snapshot = _index.snapshot()
+    row = snapshot.row_of(story_id) if snapshot else None
+    if row is not None:
+        query = snapshot.vector(row)
+    else:
+        rows = execute_query("SELECT title FROM all_stories WHERE id = ?", [story_id])
+        if not rows:
+            return None
+        if snapshot is None or not rows[0][0]:
+            return []
+        query = encode_texts([rows[0][0]])[0]
+    return snapshot.search(query, limit, exclude=story_id)
+
+
+def load_matches(matches, category=None, limit=10, fetch=None):
+    """Stored stories for (story ID, similarity) matches, in match order (see get_ranked_stories)."""
+    return get_ranked_stories([m[0] for m in matches], [m[1] for m in matches], category, limit, fetch)
@@ -0,0 +1,228 @@
+"""
+Serialization of query results into the responses returned by the API.
+
+Story listings are fetched column-wise (DuckDB `fetchnumpy`) and encoded
+straight to JSON bytes with orjson, so numeric columns never become
+per-field Python objects. Three formats are offered:
+
+- "rows" (default): a JSON array of story objects
+- "columns": a JSON object mapping each field to an array of values
+- "arrow": an Arrow IPC stream (requires pyarrow)
+
+Shared by the Flask routes and the async read API so both serve
+identical responses.
+"""
+import functools
+
+import numpy as np
+import orjson
+
+from app.config.settings import MAX_RESULT_LIMIT
+
+STORY_FIELDS = ["id", "title", "url", "by", "time", "score", "category"]
+TOP_STORY_FIELDS = ["id", "title", "url", "by", "score", "time", "category"]
+TRENDING_FIELDS = TOP_STORY_FIELDS + ["velocity", "comment_velocity"]
+RELATED_FIELDS = STORY_FIELDS + ["similarity"]
+FEED_FIELDS = STORY_FIELDS + ["rank_score"]
+
+FORMATS = ("rows", "columns", "arrow")
+JSON_MIMETYPE = "application/json"
+ARROW_MIMETYPE = "application/vnd.apache.arrow.stream"
+
+
+@functools.lru_cache(maxsize=None)
+def pyarrow_installed():
+    """Whether the optional pyarrow package, needed for Arrow and Parquet output, can be imported."""
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class FormatError(ValueError):
+    """A `format` parameter that can't be served, with the HTTP status to answer with."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ParameterError(ValueError):
+    """A numeric query parameter that isn't a number; answered with 400."""
+
+
+def parse_format(value):
+    """
+    Read a `format` query parameter (defaults to "rows").
+
+    Raises:
+        FormatError: If the format is unknown (400), or is "arrow" and pyarrow isn't installed (501)
+    """
+    fmt = value or "rows"
+    if fmt not in FORMATS:
+        raise FormatError(f"Unsupported format: {fmt}")
+    if fmt == "arrow" and not pyarrow_installed():
+        raise FormatError("The arrow format requires the pyarrow package, which isn't installed", 501)
+    return fmt
+
+
+def fetch_mode(fmt):
+    """DuckDB fetch mode (see execute_query) for a response format."""
+    return "arrow" if fmt == "arrow" else "numpy"
+
+
+def parse_flag(value):
+    """Read a boolean query parameter ("true", "1", "yes" or "on")."""
+    return str(value).lower() in ("true", "1", "yes", "on")
+
+
+def parse_limit(value, default, maximum=MAX_RESULT_LIMIT):
+    """Read a `limit` query parameter, clamped to 1..maximum (ParameterError if it isn't an integer)."""
+    if value is None:
+        return default
+    try:
+        limit = int(value)
+    except ValueError:
+        raise ParameterError(f"Expected an integer, got '{value}'") from None
+    return max(1, min(limit, maximum))
+
+
+def encode_json(data):
+    """Encode to JSON bytes, serializing numpy arrays natively."""
+    return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+
+
+def _json_column(values):
+    """Make a column encodable: numeric arrays pass through, the rest become lists."""
+    if isinstance(values, np.ndarray) and not np.ma.isMaskedArray(values) and values.dtype.kind in "biuf":
+        return values
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def _list_column(values):
+    """Column as a plain list (masked entries become None)."""
+    return values.tolist() if hasattr(values, "tolist") else list(values)
+
+
+def _serialize(columns, fields, fmt):
+    """
+    Serialize fetched columns.
+
+    Args:
+        columns: Dict of column arrays, a pyarrow Table, or an empty list when the query failed
+        fields: Output fields, in order
+        fmt: One of FORMATS
+
+    Returns:
+        tuple: (body bytes, mimetype)
+    """
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        table = columns if isinstance(columns, pa.Table) else pa.table({field: [] for field in fields})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_MIMETYPE
+
+    if not isinstance(columns, dict):
+        columns = {field: [] for field in fields}
+
+    if fmt == "columns":
+        return encode_json({field: _json_column(columns[field]) for field in fields}), JSON_MIMETYPE
+
+    lists = [_list_column(columns[field]) for field in fields]
+    return encode_json([dict(zip(fields, values)) for values in zip(*lists)]), JSON_MIMETYPE
+
+
+def _with_default_category(columns):
+    """Replace missing categories with "Uncategorized"."""
+    if not isinstance(columns, dict):
+        return columns
+    return dict(columns, category=[c if c else "Uncategorized" for c in _list_column(columns["category"])])
+
+
+def serialize_stories(columns, fmt="rows"):
+    """Serialize news and search results."""
+    return _serialize(columns, STORY_FIELDS, fmt)
+
+
+def serialize_faceted_stories(result, fmt="rows"):
+    """
+    Serialize a (stories, facets) search result.
+
+    JSON formats return {"stories": ..., "facets": ...}. Arrow streams are
+    the stories alone, with the facets as JSON under the schema metadata
+    key "facets".
+    """
+    columns, facets = result
+    if fmt == "arrow":
+        import pyarrow as pa
+
+        if not isinstance(columns, pa.Table):
+            columns = pa.table({field: [] for field in STORY_FIELDS})
+        return _serialize(columns.replace_schema_metadata({"facets": encode_json(facets)}), STORY_FIELDS, fmt)
+    body, mimetype = _serialize(columns, STORY_FIELDS, fmt)
+    return b'{"stories":' + body + b',"facets":' + encode_json(facets) + b"}", mimetype
+
+
+def serialize_top_stories(columns, fmt="rows"):
+    """Serialize top-story results."""
+    return _serialize(_with_default_category(columns), TOP_STORY_FIELDS, fmt)
+
+
+def serialize_trending_stories(columns, fmt="rows"):
+    """Serialize trending results, with velocities rounded to two decimals."""
+    columns = _with_default_category(columns)
+    if isinstance(columns, dict):
+        columns = dict(
+            columns,
+            velocity=np.round(columns["velocity"], 2),
+            comment_velocity=np.round(columns["comment_velocity"], 2)
+        )
+    return _serialize(columns, TRENDING_FIELDS, fmt)
+
+
+def serialize_related_stories(columns, fmt="rows"):
+    """Serialize semantic search and related-story results, with similarities rounded to three decimals."""
+    if isinstance(columns, dict):
+        columns = dict(columns, similarity=np.round(columns["similarity"], 3))
+    return _serialize(columns, RELATED_FIELDS, fmt)
+
+
+def serialize_feed(columns, fmt="rows"):
+    """Serialize a ranked feed (column arrays computed in memory rather than fetched)."""
+    if isinstance(columns, dict):
+        columns = dict(columns, rank_score=np.round(columns["rank_score"], 4))
+        if fmt == "arrow":
+            import pyarrow as pa
+
+            columns = pa.table({field: _list_column(columns[field]) for field in FEED_FIELDS})
+    return _serialize(columns, FEED_FIELDS, fmt)
+
+
+def format_categories(rows):
+    """Format (category, count) rows."""
+    return [
+        {
+            "name": row[0] if row[0] else "Uncategorized",
+            "count": row[1]
+        }
+        for row in rows
+    ]
+
+
+def format_suggestions(rows):
+    """Format autocomplete title rows."""
+    return [{"value": row[0]} for row in rows]
+
+
+def format_leaderboard(rows, key):
+    """Format (key, stories, points, comments) rollup rows, e.g. key="domain"."""
+    return [{key: row[0], "stories": row[1], "points": row[2], "comments": row[3]} for row in rows]
+
+
+def format_histogram(rows):
+    """Format (hour, stories, points, comments) histogram rows."""
+    return [{"hour": row[0], "stories": row[1], "points": row[2], "comments": row[3]} for row in rows]
@@ -0,0 +1,6 @@
+"""
+ASGI entry point for async serving with Uvicorn
+"""
+from app import create_asgi_app
+
+app = create_asgi_app()
@@ -6,28 +6,43 @@ import time
 import threading
 import schedule
 from app import create_app
-from app.config.settings import DEBUG, PORT, HOST
-from app.services.classifier import sync_news
+from app.config.settings import DEBUG, PORT, HOST, REPLICA_PUBLISH_INTERVAL, ITEM_CACHE_ENABLED
+from app.services.classifier import start_reclassification_worker
+from app.services.ingest import get_sources, start_ingest, schedule_sources
+from app.services.digest import generate_digests, default_mailer
+from app.models.database import compact_snapshots
+from app.models.archive import maintain_storage
+from app.models.replica import publish_replica
+from app.services.item_cache import prune_item_cache
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 def refresh_news():
-    """Refresh and update 100 newest Hacker News stories"""
-    logger.info("Refreshing and updating 100 newest Hacker News stories")
+    """Ingest every configured news source once, each in its own thread"""
+    logger.info("Refreshing all news sources")
+    for source in get_sources().values():
+        start_ingest(source)
+
+def send_weekly_digest():
+    """Write (and mail, if SMTP is configured) the weekly digest"""
     try:
-        stories_updated = sync_news(limit=100)
-        logger.info(f"Successfully updated {stories_updated} Hacker News stories")
-        return stories_updated
+        generate_digests(mailer=default_mailer())
     except Exception as e:
-        logger.error(f"Error updating Hacker News stories: {str(e)}")
-        return 0
+        logger.error(f"Error generating weekly digest: {str(e)}")
 
 def run_scheduler():
-    """Run the scheduler to refresh news every 15 minutes"""
-    schedule.every(15).minutes.do(refresh_news)
-    logger.info("News update scheduler started, will refresh every 15 minutes")
+    """Run the scheduler that refreshes each news source on its own interval"""
+    schedule_sources(schedule)
+    schedule.every().day.at("03:00").do(compact_snapshots)
+    schedule.every().day.at("03:30").do(maintain_storage)
+    if ITEM_CACHE_ENABLED:
+        schedule.every().day.at("04:00").do(prune_item_cache)
+    schedule.every().monday.at("07:00").do(send_weekly_digest)
+    if REPLICA_PUBLISH_INTERVAL:
+        schedule.every(REPLICA_PUBLISH_INTERVAL).seconds.do(publish_replica)
+    logger.info("News update scheduler started")
     
     while True:
         schedule.run_pending()
@@ -38,10 +53,8 @@ if __name__ == "__main__":
     app = create_app()
     logger.info("Hacky News server created")
     
-    # Start the news refresh in a background thread
-    news_thread = threading.Thread(target=refresh_news, name="initial-news-refresh")
-    news_thread.daemon = True
-    news_thread.start()
+    # Start the initial news refresh in background threads
+    refresh_news()
     logger.info("Started initial news refresh in background")
     
     # Start the scheduler in a background thread
@@ -50,6 +63,9 @@ if __name__ == "__main__":
     scheduler_thread.start()
     logger.info("Started news refresh scheduler in background")
     
+    # Classify stories left pending by earlier syncs
+    start_reclassification_worker()
+    
     # Run the Flask application (this will block until the server is stopped)
     logger.info(f"Starting Hacky News server on {HOST}:{PORT}")
     app.run(debug=DEBUG, port=PORT, host=HOST)
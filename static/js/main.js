@@ -23,6 +23,8 @@ let currentSearchQuery = '';
 let isSearchMode = false;
 let autocompleteTimeout = null;
 let selectedAutocompleteIndex = -1;
+let currentNews = [];
+let newsStream = null;
 
 // Apply theme on page load
 if (darkMode) {
@@ -170,6 +172,12 @@ async function loadNews(category = 'all') {
         return;
     }
     
+    currentNews = news;
+    renderNews(news);
+}
+
+// Render a list of news items
+function renderNews(news) {
     // Clear loader
     newsContent.innerHTML = '';
     
@@ -208,6 +216,44 @@ async function loadNews(category = 'all') {
     });
 }
 
+// Merge story deltas pushed by the server into the visible list
+function applyStoryDeltas(stories) {
+    if (isSearchMode) return;
+    
+    const inCategory = story => currentCategory === 'all' ||
+        (story.category || '').toLowerCase() === currentCategory.toLowerCase();
+    const byId = new Map(currentNews.map(story => [story.id, story]));
+    
+    stories.forEach(delta => {
+        const existing = byId.get(delta.id);
+        // Category-only updates can't introduce a story we haven't seen
+        if (existing || delta.title) {
+            byId.set(delta.id, { ...existing, ...delta });
+        }
+    });
+    
+    const limit = Math.max(currentNews.length, 30);
+    currentNews = [...byId.values()]
+        .filter(inCategory)
+        .sort((a, b) => b.time - a.time)
+        .slice(0, limit);
+    renderNews(currentNews);
+}
+
+// Subscribe to server-pushed story updates instead of refetching lists
+function connectNewsStream() {
+    if (!window.EventSource || newsStream) return;
+    
+    newsStream = new EventSource('/stream');
+    newsStream.addEventListener('stories', event => {
+        applyStoryDeltas(JSON.parse(event.data));
+    });
+    // Our buffer overflowed on the server; fall back to a full reload
+    newsStream.addEventListener('resync', () => {
+        if (!isSearchMode) loadNews(currentCategory);
+    });
+}
+
 // Search for stories
 async function searchNews(query, category = 'all') {
     // Reset state
@@ -898,6 +944,7 @@ async function init() {
     await loadCategories();
     loadNews(currentCategory);
     setupEventListeners(); // Call setupEventListeners after initial loads
+    connectNewsStream();
 }
 
 init();
\ No newline at end of file
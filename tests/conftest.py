@@ -0,0 +1,14 @@
+"""
+Shared test fixtures
+"""
+import pytest
+from app.models import database
+
+
+@pytest.fixture(scope="session", autouse=True)
+def test_database(tmp_path_factory):
+    """Run every test against a throwaway database, never the repo's hackernews.duckdb."""
+    with pytest.MonkeyPatch.context() as mp:
+        mp.setattr(database, "DB_FILE", str(tmp_path_factory.mktemp("db") / "hackernews.duckdb"))
+        database.setup_db()
+        yield
@@ -0,0 +1,91 @@
+"""
+Tests for admission control
+"""
+import pytest
+from app import create_app
+from app.api.admission import AdmissionController, AdmissionMiddleware, ClientBuckets, Gate
+from app.utils.formatters import parse_limit
+
+
+def test_bucket_refills_over_time():
+    buckets = ClientBuckets(rate=2, burst=4)
+    assert buckets.take("a", 4, now=0) == 0
+    assert buckets.take("a", 1, now=0) == pytest.approx(0.5)
+    assert buckets.take("b", 1, now=0) == 0
+    assert buckets.take("a", 1, now=1) == 0
+
+
+def test_buckets_forget_oldest_clients():
+    buckets = ClientBuckets(rate=1, burst=1, max_clients=2)
+    for client in "abc":
+        buckets.take(client, now=0)
+    assert buckets.take("a", now=0) == 0
+    assert buckets.take("c", now=0) > 0
+
+
+def test_gate_sheds_past_queue():
+    gate = Gate(1, queue=1, queue_timeout=0.05)
+    assert gate.acquire()
+    assert not gate.acquire()  # waited out its queue budget
+    gate.release()
+    assert gate.acquire()
+
+
+def test_policy_patterns():
+    controller = AdmissionController({"/search": {"cost": 2}, "/stories/*/related": {"concurrency": 1}})
+    assert controller.policy("/search") == ("/search", {"cost": 2})
+    assert controller.policy("/stories/12/related")[0] == "/stories/*/related"
+    assert controller.gate("/news") is None
+    assert controller.gate("/stories/12/related") is controller.gate("/stories/13/related")
+
+
+def test_parse_limit_clamps():
+    assert parse_limit(None, 30) == 30
+    assert parse_limit("100000", 30) == 200
+    assert parse_limit("-5", 30) == 1
+    assert parse_limit("900", 50, 500) == 500
+
+
+@pytest.fixture
+def limited_client():
+    """An app whose clients may make three requests, with /search limited to one at a time."""
+    app = create_app({'TESTING': True})
+    controller = AdmissionController({"/search": {"concurrency": 1, "queue": 0}}, ClientBuckets(rate=0.001, burst=3))
+    app.extensions["admission"] = controller
+    return app.test_client(), controller
+
+
+def test_rate_limited_client_gets_429(limited_client):
+    client, _ = limited_client
+    assert [client.get('/categories').status_code for _ in range(4)] == [200, 200, 200, 429]
+    response = client.get('/categories')
+    assert int(response.headers["Retry-After"]) > 0
+
+
+def test_busy_endpoint_sheds_with_503(limited_client):
+    client, controller = limited_client
+    gate = controller.gate("/search")
+    assert gate.acquire()
+    try:
+        assert client.get('/search?q=test').status_code == 503
+    finally:
+        gate.release()
+    response = client.get('/search?q=test')
+    assert response.status_code == 200
+    # The slot is released once the server has sent the response
+    response.close()
+    assert gate.acquire()
+    gate.release()
+
+
+def test_async_middleware_rate_limits():
+    pytest.importorskip("starlette")
+    from starlette.applications import Starlette
+    from starlette.middleware import Middleware
+    from starlette.testclient import TestClient
+    from app.api.async_routes import routes
+
+    controller = AdmissionController({}, ClientBuckets(rate=0.001, burst=2))
+    app = Starlette(routes=routes, middleware=[Middleware(AdmissionMiddleware, controller=controller)])
+    with TestClient(app) as client:
+        assert [client.get('/categories').status_code for _ in range(3)] == [200, 200, 429]
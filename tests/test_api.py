@@ -5,6 +5,7 @@ import pytest
 import os
 import json
 from app import create_app
+from app.models.database import execute_and_commit
 
 @pytest.fixture
 def app():
@@ -72,4 +73,90 @@ def test_top_alltime_endpoint(client):
     response = client.get('/stats/top-alltime')
     assert response.status_code == 200
     data = json.loads(response.data)
-    assert isinstance(data, list)
\ No newline at end of file
+    assert isinstance(data, list)
+
+
+def test_reclassify_status_endpoint(client):
+    """Test the /reclassify/status endpoint reports a job state."""
+    response = client.get('/reclassify/status')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert 'state' in data
+
+def test_trending_endpoint(client):
+    """Test the /stats/trending endpoint."""
+    response = client.get('/stats/trending?hours=12')
+    assert response.status_code == 200
+    data = json.loads(response.data)
+    assert isinstance(data, list)
+
+def test_stream_endpoint(client):
+    """Test the /stream endpoint opens an event stream and delivers published stories."""
+    from app.services.broadcaster import broadcaster
+    response = client.get('/stream', buffered=False)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    chunks = iter(response.response)
+    assert next(chunks).startswith(b'retry:')
+    broadcaster.publish('stories', [{"id": 1, "title": "Streamed"}])
+    assert b'Streamed' in next(chunks)
+    response.close()
+
+def test_news_columns_format(client):
+    """Test ?format=columns returns one array per field, matching the row format."""
+    rows = json.loads(client.get('/news?limit=5').data)
+    response = client.get('/news?limit=5&format=columns')
+    assert response.status_code == 200
+    columns = json.loads(response.data)
+    assert set(columns) == {"id", "title", "url", "by", "time", "score", "category"}
+    assert columns["id"] == [row["id"] for row in rows]
+    assert columns["title"] == [row["title"] for row in rows]
+
+def test_unsupported_format(client):
+    """Test an unknown response format is rejected."""
+    response = client.get('/news?format=xml')
+    assert response.status_code == 400
+
+def test_non_integer_limit(client):
+    """Test a limit that isn't a number is rejected rather than failing the request."""
+    response = client.get('/update?limit=abc')
+    assert response.status_code == 400
+    assert "abc" in json.loads(response.data)["message"]
+
+def test_arrow_format_without_pyarrow(client, monkeypatch):
+    """Test format=arrow is refused up front when pyarrow isn't installed."""
+    from app.utils import formatters
+    monkeypatch.setattr(formatters, "pyarrow_installed", lambda: False)
+    response = client.get('/stats/top-recent?format=arrow')
+    assert response.status_code == 501
+    assert "pyarrow" in json.loads(response.data)["error"]
+
+def test_related_unknown_story(client):
+    """Test related stories for a missing story is a 404."""
+    response = client.get('/stories/-2147483000/related')
+    assert response.status_code == 404
+
+def test_unsupported_search_mode(client):
+    """Test an unknown search mode is rejected."""
+    response = client.get('/search?q=rust&mode=fuzzy')
+    assert response.status_code == 400
+
+def test_search_facets(client):
+    """Test /search?facets=true wraps the results with facet counts."""
+    data = json.loads(client.get('/search?q=test&facets=true').data)
+    assert isinstance(data["stories"], list)
+    assert set(data["facets"]) == {"total", "category", "domain", "time"}
+    assert client.get('/search?q=test&facets=true&mode=semantic').status_code == 400
+
+def test_profile_and_feed_endpoints(client):
+    """Test a saved profile is returned and shapes /feed."""
+    response = client.put('/profiles/test-user', json={"category_weights": {"Security": 0}})
+    assert response.status_code == 200
+    assert json.loads(client.get('/profiles/test-user').data)["category_weights"] == {"Security": 0.0}
+    assert client.put('/profiles/test-user', json={"muted_domains": "x"}).status_code == 400
+
+    response = client.get('/feed?user=test-user&limit=5')
+    assert response.status_code == 200
+    stories = json.loads(response.data)
+    assert all(story["category"] != "Security" and "rank_score" in story for story in stories)
+    execute_and_commit("DELETE FROM user_profiles WHERE user_id = 'test-user'")
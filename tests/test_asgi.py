@@ -0,0 +1,88 @@
+"""
+Tests for the async (ASGI) serving mode
+"""
+import pytest
+
+pytest.importorskip("starlette")
+pytest.importorskip("a2wsgi")
+
+from starlette.testclient import TestClient
+from app import create_app, create_asgi_app
+
+
+@pytest.fixture
+def async_client():
+    """A test client for the ASGI app."""
+    with TestClient(create_asgi_app({'TESTING': True})) as client:
+        yield client
+
+
+@pytest.fixture
+def flask_client():
+    """A test client for the Flask app, for comparing responses."""
+    return create_app({'TESTING': True}).test_client()
+
+
+@pytest.mark.parametrize("path", [
+    "/news",
+    "/news?category=Programming&limit=5",
+    "/categories",
+    "/stats",
+    "/search?q=test",
+    "/search?q=test&facets=true",
+    "/autocomplete?q=Test",
+    "/stats/top-recent",
+    "/stats/top-alltime",
+    "/stats/domains",
+    "/stats/authors?sort=points",
+])
+def test_read_endpoints_match_flask(async_client, flask_client, path):
+    """Test async read endpoints return the same JSON as the Flask routes."""
+    response = async_client.get(path)
+    assert response.status_code == 200
+    assert response.json() == flask_client.get(path).get_json()
+
+
+@pytest.mark.parametrize("path", ["/news?format=xml", "/search?q=test&format=xml", "/stats/trending?format=xml"])
+def test_unsupported_format_matches_flask(async_client, flask_client, path):
+    """Test both serving modes reject an unknown format the same way."""
+    response = async_client.get(path)
+    assert response.status_code == 400
+    assert response.json() == flask_client.get(path).get_json()
+
+
+@pytest.mark.parametrize("path", ["/news?limit=abc", "/search?q=test&limit=abc", "/stats/top-recent?limit=abc",
+                                  "/stats/top-alltime?limit=abc", "/stats/trending?limit=abc", "/feed?limit=abc",
+                                  "/stories/1/related?limit=abc", "/autocomplete?q=te&limit=abc"])
+def test_non_integer_limit_matches_flask(async_client, flask_client, path):
+    """Test both serving modes answer a limit that isn't a number with 400."""
+    response = async_client.get(path)
+    assert response.status_code == 400
+    assert response.json() == flask_client.get(path).get_json()
+
+
+def test_search_requires_query(async_client):
+    """Test the async /search endpoint requires a query parameter."""
+    assert async_client.get('/search').status_code == 400
+
+
+def test_other_routes_fall_through_to_flask(async_client):
+    """Test routes without an async handler are served by the Flask app."""
+    assert async_client.get('/').status_code == 200
+    assert 'state' in async_client.get('/reclassify/status').json()
+
+
+def test_export_holds_a_database_slot_while_streaming(async_client, monkeypatch):
+    """Test an export counts against the database thread limit until its stream ends."""
+    from app.api import async_routes
+    borrowed = []
+
+    def export_stories(fmt, **filters):
+        for chunk in (b"a\n", b"b\n"):
+            borrowed.append(async_routes.db_limiter().borrowed_tokens)
+            yield chunk
+
+    monkeypatch.setattr(async_routes, "export_stories", export_stories)
+    assert async_client.get('/export').content == b"a\nb\n"
+    assert borrowed == [1, 1]
+    assert async_routes.db_limiter().borrowed_tokens == 0
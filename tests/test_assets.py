@@ -0,0 +1,66 @@
+"""
+Tests for the static asset pipeline
+"""
+import gzip
+import json
+import os
+import pytest
+from app import create_app
+from app.api import routes
+from app.services import assets
+
+
+@pytest.fixture
+def built(tmp_path, monkeypatch):
+    """Assets built from a throwaway source tree into a throwaway output directory."""
+    source = tmp_path / "static"
+    (source / "css").mkdir(parents=True)
+    (source / "css" / "site.css").write_text("/* header */\nbody {\n  color : red;\n}\n")
+    out = tmp_path / "dist"
+    for module in (assets, routes):
+        monkeypatch.setattr(module, "ASSET_DIR", str(out))
+    monkeypatch.setattr(assets, "ASSETS_ENABLED", True)
+    return assets.build_assets(str(source), str(out)), source, out
+
+
+def test_minify_css():
+    assert assets.minify_css("/* x */ a , b {\n  color: red;\n  margin : 0;\n}") == "a,b{color:red;margin :0}"
+
+
+def test_build_fingerprints_and_compresses(built):
+    manifest, source, out = built
+    name = manifest["css/site.css"]
+    assert name.startswith("css/site.") and name.endswith(".css")
+    assert (out / name).read_bytes() == b"body{color :red}"
+    assert gzip.decompress((out / f"{name}.gz").read_bytes()) == b"body{color :red}"
+    assert json.loads((out / "manifest.json").read_text()) == manifest
+
+
+def test_rebuild_leaves_unchanged_manifest(built):
+    manifest, source, out = built
+    mtime = os.stat(out / "manifest.json").st_mtime_ns
+    assert assets.build_assets(str(source), str(out)) == manifest
+    assert os.stat(out / "manifest.json").st_mtime_ns == mtime
+
+
+def test_assets_served_precompressed_and_immutable(built):
+    manifest, _, _ = built
+    client = create_app({'TESTING': True}).test_client()
+    response = client.get(f"/assets/{manifest['css/site.css']}", headers={"Accept-Encoding": "gzip"})
+    assert response.status_code == 200
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert response.mimetype == "text/css"
+    assert "immutable" in response.headers["Cache-Control"]
+    plain = client.get(f"/assets/{manifest['css/site.css']}")
+    assert "Content-Encoding" not in plain.headers and plain.data == b"body{color :red}"
+    response.close()
+    plain.close()
+
+
+def test_index_revalidates_with_etag():
+    client = create_app({'TESTING': True}).test_client()
+    response = client.get('/')
+    assert response.status_code == 200
+    assert response.headers["Cache-Control"] == "no-cache"
+    etag = response.headers["ETag"]
+    assert client.get('/', headers={"If-None-Match": etag}).status_code == 304
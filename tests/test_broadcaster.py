@@ -0,0 +1,65 @@
+"""
+Tests for the Server-Sent Events broadcaster
+"""
+from app.services.broadcaster import Broadcaster, RESYNC_MESSAGE, format_event
+
+
+def test_publish_reaches_every_client():
+    """Test one publish is delivered to each subscriber."""
+    broadcaster = Broadcaster(buffer_size=4)
+    first, second = broadcaster.subscribe(), broadcaster.subscribe()
+    broadcaster.publish("stories", [{"id": 1}])
+    expected = format_event("stories", [{"id": 1}])
+    assert first.get_nowait() == expected
+    assert second.get_nowait() == expected
+
+
+def test_slow_client_is_told_to_resync():
+    """Test a full client buffer is replaced by a resync message."""
+    broadcaster = Broadcaster(buffer_size=2)
+    client = broadcaster.subscribe()
+    for i in range(3):
+        broadcaster.publish("stories", [{"id": i}])
+    assert client.get_nowait() == RESYNC_MESSAGE
+    assert client.empty()
+
+
+def test_unsubscribe():
+    """Test disconnected clients stop receiving messages."""
+    broadcaster = Broadcaster()
+    client = broadcaster.subscribe()
+    broadcaster.unsubscribe(client)
+    broadcaster.publish("stories", [])
+    assert broadcaster.client_count() == 0
+    assert client.empty()
+
+
+def test_async_client_receives_messages():
+    """Test clients on an event loop receive messages published from other threads."""
+    import asyncio
+    import threading
+
+    async def receive():
+        broadcaster = Broadcaster(buffer_size=4)
+        client = broadcaster.subscribe_async()
+        threading.Thread(target=broadcaster.publish, args=("stories", [{"id": 7}])).start()
+        return await asyncio.wait_for(client.get(), timeout=5)
+
+    assert asyncio.run(receive()) == format_event("stories", [{"id": 7}])
+
+
+def test_relay_reaches_clients_of_other_processes(tmp_path):
+    """Test a publish from another process reaches this process's clients, and dead sockets are cleared."""
+    import multiprocessing
+
+    broadcaster = Broadcaster(buffer_size=4, relay_dir=str(tmp_path))
+    client = broadcaster.subscribe()
+    (tmp_path / "999999999.sock").touch()
+
+    publisher = multiprocessing.get_context("fork").Process(
+        target=Broadcaster(relay_dir=str(tmp_path)).publish, args=("stories", [{"id": 9}])
+    )
+    publisher.start()
+    publisher.join()
+    assert client.get(timeout=5) == format_event("stories", [{"id": 9}])
+    assert not (tmp_path / "999999999.sock").exists()
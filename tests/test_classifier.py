@@ -0,0 +1,234 @@
+"""
+Tests for the news classification service
+"""
+import numpy as np
+import pytest
+from app.services import classifier
+from app.config.settings import PENDING_CATEGORY
+from app.models.database import setup_db, execute_query, execute_and_commit, upsert_stories
+
+
+class FakePipeline:
+    """Stand-in for a zero-shot pipeline that always picks one label."""
+
+    def __init__(self, label):
+        self.label = label
+
+    def __call__(self, titles, labels, **kwargs):
+        return [{"labels": [self.label] + [l for l in labels if l != self.label]} for _ in titles]
+
+
+@pytest.fixture
+def fake_backends(monkeypatch):
+    """Replace the loaded pipelines with fakes so no model is downloaded."""
+    monkeypatch.setattr(classifier, "_pipelines", {
+        "pytorch": FakePipeline("Programming"),
+        "quantized": FakePipeline("Security"),
+    })
+
+
+@pytest.fixture
+def fake_embedder(monkeypatch):
+    """Encode texts as one-hot vectors over the labels they mention."""
+    labels = classifier.ZERO_SHOT_LABELS
+
+    def encode(texts):
+        return np.array([
+            [1.0 if label.lower() in text.lower() or classifier.LABEL_DESCRIPTIONS[label] == text else 0.0
+             for label in labels]
+            for text in texts
+        ])
+
+    monkeypatch.setattr(classifier, "encode_texts", encode)
+    monkeypatch.setattr(classifier, "_label_embeddings", None)
+
+
+def test_classify_by_rules():
+    """Test the keyword tier matches common HN patterns and leaves others alone."""
+    assert classifier.classify_by_rules("Show HN: My weekend project") == "Show HN"
+    assert classifier.classify_by_rules("A new vulnerability in OpenSSH") == "Security"
+    assert classifier.classify_by_rules("Notes on the history of bread") is None
+
+
+def test_classify_news_uses_model_for_ambiguous_titles(fake_backends):
+    """Test titles without a keyword match go to the zero-shot model."""
+    assert classifier.classify_news("Notes on the history of bread") == "Programming"
+    assert classifier.classify_with_nli(["a", "b"], "quantized") == ["Security", "Security"]
+
+
+def test_evaluate_backend(fake_backends):
+    """Test the backend accuracy report against the fp32 baseline."""
+    samples = [("first", "Programming"), ("second", "Security")]
+    report = classifier.evaluate_backend(samples, "quantized")
+    assert report["samples"] == 2
+    assert report["pytorch"]["accuracy"] == 0.5
+    assert report["quantized"]["accuracy"] == 0.5
+    assert report["agreement"] == 0.0
+
+
+def test_unavailable_backend_falls_back_without_masquerading(fake_backends, monkeypatch):
+    """Test a backend that fails to load serves PyTorch, is not cached as itself, and fails evaluation."""
+    def missing():
+        raise ImportError("No module named 'optimum'")
+
+    monkeypatch.setattr(classifier, "INFERENCE_BACKENDS", dict(classifier.INFERENCE_BACKENDS, onnx=missing))
+    monkeypatch.setattr(classifier, "_unavailable", {})
+    assert classifier.get_zero_shot_classifier("onnx") is classifier._pipelines["pytorch"]
+    assert "onnx" not in classifier._pipelines
+    with pytest.raises(ImportError):
+        classifier.evaluate_backend([("first", "Programming")], "onnx")
+
+
+def test_classify_with_embeddings(fake_embedder):
+    """Test the embedding mode picks the most similar category description."""
+    assert classifier.classify_with_embeddings(["Hardware hacking weekend", "Business as usual"]) == [
+        "Hardware", "Business"
+    ]
+    assert classifier.classify_with_model(["Science & Research digest"], "embedding") == ["Science & Research"]
+
+
+def test_measure_agreement(fake_backends, fake_embedder):
+    """Test the agreement report between the NLI and embedding paths."""
+    report = classifier.measure_agreement(["Programming notes", "Hardware notes"])
+    assert report["samples"] == 2
+    assert report["agreement"] == 0.5
+    assert "ms_per_title" in report["embedding"]
+
+
+@pytest.fixture
+def pending_story():
+    """Store a story that is waiting for the model tier."""
+    setup_db()
+    story = {"id": 990001, "title": "Notes on the history of bread", "time": 0, "score": 1, "type": "story"}
+    upsert_stories([dict(story, category=PENDING_CATEGORY)])
+    yield story
+    execute_and_commit("DELETE FROM hackernews WHERE id = ?", [story["id"]])
+
+
+def test_resolve_pending(fake_backends, pending_story):
+    """Test pending stories are classified in a batch and keep their category on re-sync."""
+    assert classifier.resolve_pending(batch_size=1000) >= 1
+    category = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])[0][0]
+    assert category == "Programming"
+
+    # A later sync without a rule match must not reset it to pending
+    upsert_stories([dict(pending_story, category=PENDING_CATEGORY)])
+    category = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])[0][0]
+    assert category == "Programming"
+
+
+def test_resolve_pending_raises_when_write_fails(fake_backends, pending_story, monkeypatch):
+    """Test a failed write neither reports the batch as resolved nor broadcasts it."""
+    published = []
+    monkeypatch.setattr(classifier, "update_categories", lambda *args, **kwargs: None)
+    monkeypatch.setattr(classifier.broadcaster, "publish", lambda channel, data: published.append(data))
+    with pytest.raises(RuntimeError):
+        classifier.resolve_pending(batch_size=1000)
+    assert published == []
+
+
+def test_resolve_pending_leaves_stories_pending_when_model_fails(pending_story, monkeypatch):
+    """Test a failing model tier raises instead of storing placeholder categories."""
+    def broken(titles, labels, **kwargs):
+        raise RuntimeError("model download failed")
+
+    monkeypatch.setattr(classifier, "_pipelines", {"pytorch": broken})
+    monkeypatch.setattr(classifier, "CLASSIFIER_MODE", "nli")
+    monkeypatch.setattr(classifier, "CLASSIFIER_BACKEND", "pytorch")
+    with pytest.raises(RuntimeError):
+        classifier.resolve_pending(batch_size=1000)
+    category = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])[0][0]
+    assert category == PENDING_CATEGORY
+    # A single title still falls back, since nothing is retried for it
+    assert classifier.classify_news("Notes on the history of bread") == "Uncategorized"
+
+
+def test_pending_worker_reads_primary_in_replica_mode(fake_backends, pending_story, monkeypatch, tmp_path):
+    """Test resolved stories aren't picked up again while the replica still lists them as pending."""
+    from app.models import database, replica
+    monkeypatch.setattr(database, "REPLICA_DIR", str(tmp_path))
+    monkeypatch.setattr(replica, "REPLICA_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "DB_READ_MODE", "replica")
+    monkeypatch.setattr(database, "_replica", (None, None))
+    assert replica.publish_replica()
+
+    assert classifier.resolve_pending(batch_size=1000) >= 1
+    stale = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])
+    assert stale == [(PENDING_CATEGORY,)]
+    assert pending_story["id"] not in [row[0] for row in database.get_pending_stories(1000)]
+
+
+def test_reclassify_corpus_dry_run(fake_backends, pending_story):
+    """Test a dry run reports the pending story's change without writing it."""
+    from app.services.reclassifier import reclassify_corpus
+    result = reclassify_corpus(chunk_size=2, dry_run=True)
+    assert result["state"] == "done"
+    assert result["processed"] == result["total"]
+    assert {"from": "Pending", "to": "Programming", "count": 1} in result["diff"]
+    category = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])[0][0]
+    assert category == PENDING_CATEGORY
+
+
+def test_reclassify_corpus_writes_changes(fake_backends, pending_story):
+    """Test a real run writes changed categories and clears its checkpoint."""
+    from app.services.reclassifier import reclassify_corpus, JOB_NAME
+    from app.models.database import get_reclassify_checkpoint
+    reclassify_corpus(chunk_size=2, resume=False, use_model=True)
+    category = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])[0][0]
+    assert category == "Programming"
+    assert get_reclassify_checkpoint(JOB_NAME) is None
+
+
+def test_reclassify_corpus_stops_when_write_fails(fake_backends, pending_story, monkeypatch):
+    """Test a failed chunk write stops the run without checkpointing past the chunk."""
+    from app.services import reclassifier
+    from app.models.database import get_reclassify_checkpoint, clear_reclassify_checkpoint
+    calls = []
+
+    def fail_second_write(ids, categories):
+        calls.append(ids)
+        return None if len(calls) == 2 else list(ids)
+
+    monkeypatch.setattr(reclassifier, "update_categories", fail_second_write)
+    upsert_stories([dict(pending_story, id=990002, category=PENDING_CATEGORY)])
+    try:
+        result = reclassifier.reclassify_corpus(chunk_size=1, resume=False, use_model=False)
+        assert result["state"] == "failed"
+        assert len(calls) == 2
+        # Only the first chunk is recorded, so a resumed run retries the second
+        assert get_reclassify_checkpoint(reclassifier.JOB_NAME)[1] == 1
+    finally:
+        clear_reclassify_checkpoint(reclassifier.JOB_NAME)
+        execute_and_commit("DELETE FROM hackernews WHERE id = 990002")
+
+
+def test_reclassify_corpus_stops_when_model_fails(fake_backends, pending_story, monkeypatch):
+    """Test a failing model tier stops the run before anything of the chunk is written."""
+    from app.services import reclassifier
+    from app.models.database import get_reclassify_checkpoint
+
+    def broken(titles):
+        raise RuntimeError("out of memory")
+
+    monkeypatch.setattr(reclassifier, "classify_with_model", broken)
+    written = []
+    monkeypatch.setattr(reclassifier, "update_categories", lambda ids, categories: written.append(ids) or ids)
+    result = reclassifier.reclassify_corpus(chunk_size=1000, resume=False, use_model=True)
+    assert result["state"] == "failed"
+    assert "out of memory" in result["message"]
+    assert written == []
+    assert get_reclassify_checkpoint(reclassifier.JOB_NAME) is None
+    category = execute_query("SELECT category FROM hackernews WHERE id = ?", [pending_story["id"]])[0][0]
+    assert category == PENDING_CATEGORY
+
+
+def test_reclassify_corpus_covers_rss_stories(pending_story):
+    """Test the run starts below the negative IDs given to stories from other sources."""
+    from app.services.reclassifier import reclassify_corpus
+    upsert_stories([{"id": -990001, "title": "Show HN: A feed reader", "time": 0, "score": 1,
+                     "category": PENDING_CATEGORY, "source": "rss-test"}])
+    try:
+        reclassify_corpus(chunk_size=1000, resume=False, use_model=False)
+        assert execute_query("SELECT category FROM hackernews WHERE id = -990001") == [("Show HN",)]
+    finally:
+        execute_and_commit("DELETE FROM hackernews WHERE id = -990001")
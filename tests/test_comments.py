@@ -0,0 +1,96 @@
+"""
+Tests for comment-tree ingestion
+"""
+import threading
+import pytest
+from app.models.database import setup_db, execute_and_commit, get_comments
+from app.services.comments import sync_comments
+
+STORY = 990901
+
+
+class FakeFetcher:
+    """Serves comment items from a dict and records each level it was asked for."""
+
+    def __init__(self, items):
+        self.items = items
+        self.levels = []
+
+    def fetch_items(self, item_ids, concurrency):
+        self.levels.append(sorted(item_ids))
+        return [self.items.get(item_id) for item_id in item_ids]
+
+
+def comment(item_id, parent, kids=(), **fields):
+    return dict({"id": item_id, "parent": parent, "by": "dana", "time": item_id, "text": f"c{item_id}",
+                 "kids": list(kids)}, **fields)
+
+
+def story(descendants, kids):
+    return {"id": STORY, "title": "zqxcomments thread", "descendants": descendants, "kids": kids}
+
+
+@pytest.fixture
+def thread():
+    setup_db()
+    items = {
+        990911: comment(990911, STORY, kids=[990921, 990922]),
+        990912: comment(990912, STORY),
+        990921: comment(990921, 990911, kids=[990931]),
+        990922: comment(990922, 990911, deleted=True, kids=[990932]),
+        990931: comment(990931, 990921),
+        990932: comment(990932, 990922),
+    }
+    yield items
+    execute_and_commit("DELETE FROM comments WHERE story = ?", [STORY])
+    execute_and_commit("DELETE FROM comment_threads WHERE story = ?", [STORY])
+
+
+def test_fetches_one_level_per_round(thread):
+    fetcher = FakeFetcher(thread)
+    assert sync_comments([story(5, [990911, 990912])], fetcher) == 5
+    assert fetcher.levels == [[990911, 990912], [990921, 990922], [990931, 990932]]
+    rows = get_comments(STORY)
+    assert [row[0] for row in rows] == [990911, 990912, 990921, 990931, 990932]
+    assert rows[3][1] == 990921
+
+
+def test_unchanged_thread_is_not_refetched(thread):
+    sync_comments([story(5, [990911, 990912])], FakeFetcher(thread))
+    fetcher = FakeFetcher(thread)
+    assert sync_comments([story(5, [990911, 990912])], fetcher) == 0
+    assert fetcher.levels == []
+
+    thread[990912]["kids"] = [990933]
+    thread[990933] = comment(990933, 990912)
+    assert sync_comments([story(6, [990911, 990912])], fetcher) == 6
+    assert 990933 in [row[0] for row in get_comments(STORY)]
+
+
+def test_failed_fetch_leaves_thread_stale(thread):
+    del thread[990931]
+    sync_comments([story(5, [990911, 990912])], FakeFetcher(thread))
+
+    thread[990931] = comment(990931, 990921)
+    fetcher = FakeFetcher(thread)
+    sync_comments([story(5, [990911, 990912])], fetcher)
+    assert fetcher.levels
+    assert 990931 in [row[0] for row in get_comments(STORY)]
+
+
+def test_queued_threads_sync_in_the_background(thread, monkeypatch):
+    from app.services import comments
+    synced = []
+    monkeypatch.setattr(comments, "_queued", {})
+    # Keep a worker started by an earlier test from draining the queue first
+    monkeypatch.setattr(comments, "_queue_event", threading.Event())
+    monkeypatch.setattr(comments, "start_comment_worker", lambda: None)
+    monkeypatch.setattr(comments, "sync_comments", lambda items, fetcher: synced.append(items) or 0)
+    fetcher = FakeFetcher(thread)
+    # Ingest only queues, and a newer version of a story replaces the queued one
+    comments.queue_threads([story(5, [990911]), {"id": 990902, "kids": []}], fetcher)
+    comments.queue_threads([story(6, [990911, 990912])], fetcher)
+    assert synced == [] and fetcher.levels == []
+    comments.sync_queued_threads()
+    assert synced == [[story(6, [990911, 990912])]]
+    assert comments.sync_queued_threads() == 0
@@ -0,0 +1,97 @@
+"""
+Tests for the DuckDB data layer
+"""
+import time
+import pytest
+from app.models.database import (
+    setup_db,
+    execute_query,
+    execute_and_commit,
+    upsert_stories,
+    insert_snapshots,
+    compact_snapshots,
+    get_trending_stories,
+    search_with_facets
+)
+
+STORY_ID = 990101
+
+
+@pytest.fixture
+def snapshot_story():
+    """Store a story and remove it and its snapshots afterwards."""
+    setup_db()
+    story = {"id": STORY_ID, "title": "Snapshot test story", "time": int(time.time()), "score": 10,
+             "descendants": 0, "type": "story"}
+    upsert_stories([dict(story, category="Programming")])
+    yield story
+    execute_and_commit("DELETE FROM story_snapshots WHERE id = ?", [STORY_ID])
+    execute_and_commit("DELETE FROM hackernews WHERE id = ?", [STORY_ID])
+
+
+def snapshot_rows():
+    return execute_query("SELECT ts, score FROM story_snapshots WHERE id = ? ORDER BY ts", [STORY_ID])
+
+
+def test_insert_snapshots_skips_unchanged(snapshot_story):
+    """Test snapshots are only appended when score or comments change."""
+    now = int(time.time())
+    insert_snapshots([(STORY_ID, now - 7200, 10, 0)])
+    insert_snapshots([(STORY_ID, now - 3600, 10, 0)])
+    insert_snapshots([(STORY_ID, now, 70, 4)])
+    assert [row[1] for row in snapshot_rows()] == [10, 70]
+
+
+def test_trending_velocity(snapshot_story):
+    """Test velocity uses the last snapshot before the window as its baseline."""
+    now = int(time.time())
+    insert_snapshots([(STORY_ID, now - 4 * 3600, 10, 0), (STORY_ID, now - 60, 70, 4)])
+    trending = {row[0]: row for row in get_trending_stories(hours=2, limit=1000)}
+    assert STORY_ID in trending
+    assert trending[STORY_ID][7] == pytest.approx(30, rel=0.05)
+
+
+def test_compact_snapshots_downsamples(snapshot_story):
+    """Test old snapshots are reduced to one per day and expired ones dropped."""
+    now = int(time.time())
+    day = (now // 86400 - 30) * 86400
+    insert_snapshots([(STORY_ID, day + 60 * i, 10 + i, 0) for i in range(5)])
+    insert_snapshots([(STORY_ID, now - 400 * 86400, 1, 0)])
+    compact_snapshots(now)
+    assert snapshot_rows() == [(day + 240, 14)]
+
+
+@pytest.fixture
+def facet_stories():
+    """Store a few stories matching one search term across categories, domains and ages."""
+    setup_db()
+    now = int(time.time())
+    stories = [
+        (990111, "zqxfacet parser", "https://www.github.com/a", now - 3600, "Programming"),
+        (990112, "zqxfacet compiler", "https://github.com/b", now - 3 * 86400, "Programming"),
+        (990113, "zqxfacet exploit", "https://example.com/c", now - 60 * 86400, "Security"),
+    ]
+    for story_id, title, url, story_time, category in stories:
+        upsert_stories([{"id": story_id, "title": title, "url": url, "time": story_time, "score": 1,
+                         "category": category}])
+    yield
+    execute_and_commit("DELETE FROM hackernews WHERE id BETWEEN 990111 AND 990113")
+
+
+def test_search_facets(facet_stories):
+    stories, facets = search_with_facets("zqxfacet", "Programming", 1)
+    assert [row[0] for row in stories] == [990111]
+    assert facets["total"] == 2
+    assert facets["category"] == [{"value": "Programming", "count": 2}, {"value": "Security", "count": 1}]
+    assert facets["domain"] == [{"value": "github.com", "count": 2}]
+    assert facets["time"][:3] == [{"value": "day", "count": 1}, {"value": "week", "count": 2},
+                                  {"value": "month", "count": 2}]
+
+
+def test_search_facets_page_rows(facet_stories):
+    stories, _ = search_with_facets("zqxfacet", limit=10)
+    assert [row[:2] for row in stories] == [(990111, "zqxfacet parser"), (990112, "zqxfacet compiler"),
+                                            (990113, "zqxfacet exploit")]
+    assert stories[0][2] == "https://www.github.com/a"
+    stories, facets = search_with_facets("zqxfacet", "Business", 10)
+    assert list(stories) == [] and facets["total"] == 0
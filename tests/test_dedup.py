@@ -0,0 +1,72 @@
+"""
+Tests for near-duplicate detection
+"""
+import time
+import numpy as np
+from app.services.dedup import DuplicateIndex, canonicalize_url, title_signature
+
+
+def story(story_id, title, url=None, age=0):
+    return {"id": story_id, "title": title, "url": url, "time": int(time.time()) - age}
+
+
+def test_canonicalize_url():
+    """Test trivially different links to the same page canonicalize equally."""
+    canonical = canonicalize_url("https://example.com/post?id=3&a=1")
+    assert canonicalize_url("http://www.example.com/post/?a=1&id=3&utm_source=hn#comments") == canonical
+    assert canonicalize_url("https://example.com/other") != canonical
+    assert canonicalize_url(None) is None
+
+
+def test_title_signature_similarity():
+    """Test MinHash agreement tracks title similarity."""
+    a = title_signature("Show HN: I built a tiny database in Rust")
+    b = title_signature("Show HN: I built a tiny database in Rust!")
+    c = title_signature("The history of the printing press")
+    assert np.mean(a == b) == 1.0
+    assert np.mean(a == c) < 0.3
+    assert title_signature("") is None
+
+
+def test_duplicate_index_assigns_earliest_copy():
+    """Test reposted URLs and near-identical titles point at the first story."""
+    index = DuplicateIndex(threshold=0.8, window_days=7)
+    stories = [
+        story(1, "Writing a tiny database", "https://example.com/tiny-db", age=300),
+        story(2, "Writing a tiny database (2025)", "https://example.com/other", age=200),
+        story(3, "Something else entirely", "http://www.example.com/tiny-db/?utm_source=x", age=100),
+        story(4, "The history of the printing press", "https://example.org/press"),
+    ]
+    index.assign(stories)
+    canonical = {s["id"]: s["canonical_id"] for s in stories}
+    assert canonical == {1: None, 2: 1, 3: 1, 4: None}
+
+    # Refetching a story keeps it canonical, also after merging into the sorted arrays
+    index.merge()
+    again = [story(1, "Writing a tiny database", "https://example.com/tiny-db", age=300),
+             story(5, "Writing a tiny database", None)]
+    index.assign(again)
+    assert [s["canonical_id"] for s in again] == [None, 1]
+
+
+def test_duplicate_index_ignores_titles_outside_window():
+    """Test recurring titles weeks apart are not duplicates."""
+    index = DuplicateIndex(threshold=0.8, window_days=7)
+    stories = [story(1, "Ask HN: Who is hiring?", age=30 * 86400), story(2, "Ask HN: Who is hiring?")]
+    index.assign(stories)
+    assert [s["canonical_id"] for s in stories] == [None, None]
+
+
+def test_resynced_stories_are_indexed_once():
+    """Test a story refetched on every sync adds no new index entries and keeps its canonical ID."""
+    index = DuplicateIndex(threshold=0.8, window_days=7)
+    stories = [story(1, "Writing a tiny database", "https://example.com/tiny-db", age=300),
+               story(2, "Writing a tiny database (2025)", age=200)]
+    index.assign(stories)
+    sizes = (len(index.stories), len(index.urls), len(index.recent_rows))
+    for _ in range(3):
+        again = [dict(s) for s in stories]
+        index.assign(again)
+        assert [s["canonical_id"] for s in again] == [None, 1]
+    index.merge()
+    assert (len(index.stories), len(index.urls), len(index.ids)) == sizes
@@ -0,0 +1,62 @@
+"""
+Tests for the weekly digest generator
+"""
+import json
+import os
+from datetime import date, datetime, timezone
+import pytest
+from app.models.database import setup_db, execute_and_commit, update_daily_rollups, save_digest_subscriber
+from app.services.digest import generate_digests
+
+
+class StubMailer:
+    """Records what would have been mailed."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send(self, recipients, subject, html):
+        self.sent.append((list(recipients), html))
+        return len(recipients)
+
+
+@pytest.fixture
+def digest_data():
+    """Roll up stories from one week in 2001 and subscribe a few addresses."""
+    setup_db()
+    day = int(datetime(2001, 1, 3, tzinfo=timezone.utc).timestamp())
+    stories = [
+        {"id": 990600 + i, "time": day + i, "category": category, "title": f"{category} story {i}",
+         "url": None, "by": "eve", "score": score, "descendants": 1}
+        for i, (category, score) in enumerate([("Programming", 50), ("Programming", 80), ("Programming", 5),
+                                               ("Security", 30), ("Pending", 99)])
+    ]
+    update_daily_rollups(stories, keep=2)
+    save_digest_subscriber("all@example.test")
+    save_digest_subscriber("all2@example.test")
+    save_digest_subscriber("sec@example.test", ["Security"])
+    yield
+    execute_and_commit("DELETE FROM daily_top_stories WHERE id BETWEEN 990600 AND 990610")
+    execute_and_commit("DELETE FROM digest_subscribers WHERE email LIKE '%@example.test'")
+
+
+def test_digest_renders_each_variant_once(digest_data, tmp_path):
+    """Test subscribers sharing a selection share one rendered digest."""
+    mailer = StubMailer()
+    summary = generate_digests(end=date(2001, 1, 8), days=7, per_category=5, outbox=str(tmp_path), mailer=mailer)
+    assert summary["subscribers"] == 3 and summary["variants"] == 2 and summary["sent"] == 3
+    assert sorted(len(recipients) for recipients, _ in mailer.sent) == [1, 2]
+
+    directory = tmp_path / "2001-01-08"
+    with open(directory / "digest-all.json") as f:
+        digest = json.load(f)
+    programming = [s for s in digest["sections"] if s["category"] == "Programming"][0]
+    # The daily rollup kept the top 2 Programming stories; pending stories never appear
+    assert [s["id"] for s in programming["stories"]] == [990601, 990600]
+    assert [s["category"] for s in digest["sections"]] == ["Programming", "Security"]
+    assert "Programming story 1" in (directory / "digest-all.html").read_text()
+
+    with open(directory / "recipients.jsonl") as f:
+        manifest = [json.loads(line) for line in f]
+    assert len(manifest) == 3
+    assert len(os.listdir(directory)) == 5
@@ -0,0 +1,71 @@
+"""
+Tests for streaming story export
+"""
+import csv
+import io
+import json
+import pytest
+from app import create_app
+from app.api.admission import AdmissionController
+from app.models.database import setup_db, execute_and_commit, upsert_stories, iter_stories
+
+
+@pytest.fixture
+def client():
+    setup_db()
+    for story_id, title in ((990501, "zqxexport first"), (990502, "zqxexport second, with comma")):
+        upsert_stories([{"id": story_id, "title": title, "url": None, "by": "erin",
+                         "time": 1700000000 + story_id, "score": 3, "category": "Programming"}])
+    yield create_app({'TESTING': True}).test_client()
+    execute_and_commit("DELETE FROM hackernews WHERE id IN (990501, 990502)")
+
+
+def test_iter_stories_yields_batches(client):
+    batches = list(iter_stories(search_term="zqxexport", batch_size=1))
+    assert [len(rows) for rows in batches] == [1, 1]
+
+
+def test_export_ndjson(client):
+    response = client.get('/export?q=zqxexport&since=1700990502')
+    assert response.mimetype == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.data.splitlines()]
+    assert [line["id"] for line in lines] == [990502]
+    assert lines[0]["category"] == "Programming"
+
+
+def test_export_csv(client):
+    response = client.get('/export?format=csv&q=zqxexport&category=programming')
+    rows = list(csv.reader(io.StringIO(response.data.decode("utf-8"))))
+    assert rows[0][:2] == ["id", "title"]
+    assert sorted(row[1] for row in rows[1:]) == ["zqxexport first", "zqxexport second, with comma"]
+
+
+def test_export_parquet(client):
+    pq = pytest.importorskip("pyarrow.parquet")
+    table = pq.read_table(io.BytesIO(client.get('/export?format=parquet&q=zqxexport').data))
+    assert sorted(table.column("id").to_pylist()) == [990501, 990502]
+    empty = pq.read_table(io.BytesIO(client.get('/export?format=parquet&q=zqxnothing').data))
+    assert empty.num_rows == 0 and "title" in empty.column_names
+
+
+def test_export_rejects_bad_parameters(client):
+    assert client.get('/export?format=xml').status_code == 400
+    assert client.get('/export?since=yesterday').status_code == 400
+
+
+def test_parquet_export_without_pyarrow(client, monkeypatch):
+    from app.services import export
+    monkeypatch.setattr(export, "pyarrow_installed", lambda: False)
+    response = client.get('/export?format=parquet')
+    assert response.status_code == 501
+    assert "pyarrow" in response.get_json()["error"]
+
+
+def test_export_holds_admission_slot_while_streaming(client):
+    controller = AdmissionController({"/export": {"concurrency": 1, "queue": 0}})
+    client.application.extensions["admission"] = controller
+    response = client.get('/export?q=zqxexport', buffered=False)
+    assert client.get('/export').status_code == 503
+    response.get_data()
+    response.close()
+    assert client.get('/export').status_code == 200
@@ -0,0 +1,60 @@
+"""
+Tests for personalized feed ranking
+"""
+import time
+import pytest
+from app.models.database import setup_db, execute_and_commit, upsert_stories
+from app.services import feed
+
+
+@pytest.fixture
+def feed_stories(monkeypatch):
+    """Store a few fresh stories and rebuild the candidate pool from them."""
+    setup_db()
+    now = int(time.time())
+    stories = [
+        ({"id": 990401, "title": "Rust 2.0 released", "url": "https://blog.rust-lang.org/2", "by": "steve",
+          "time": now - 3600, "score": 100}, "Programming"),
+        ({"id": 990402, "title": "New GPU for training", "url": "https://www.gpus.example/new", "by": "ann",
+          "time": now - 3600, "score": 90}, "AI & ML"),
+        ({"id": 990403, "title": "My small project", "url": "https://example.org/p", "by": "dave",
+          "time": now - 3600, "score": 10}, "Programming"),
+    ]
+    for story, category in stories:
+        upsert_stories([dict(story, category=category)])
+    monkeypatch.setattr(feed, "_pool", None)
+    yield now
+    execute_and_commit("DELETE FROM hackernews WHERE id BETWEEN 990401 AND 990403")
+    feed._pool = None
+
+
+def ranked_ids(profile, now):
+    ids = [int(i) for i in feed.rank_feed(profile, limit=1000, now=now)["id"]]
+    return [i for i in ids if 990401 <= i <= 990403]
+
+
+def test_default_feed_ranks_by_gravity(feed_stories):
+    """Test without a profile, stories of the same age rank by points."""
+    assert ranked_ids(None, feed_stories) == [990401, 990402, 990403]
+
+
+def test_profile_weights_follows_and_mutes(feed_stories):
+    """Test category weights, followed authors and muted domains reshape the feed."""
+    profile = feed.normalize_profile({
+        "category_weights": {"AI & ML": 2, "Programming": 1},
+        "followed_authors": ["dave"],
+        "muted_domains": ["www.blog.rust-lang.org"],
+    })
+    assert profile["muted_domains"] == ["blog.rust-lang.org"]
+    assert ranked_ids(profile, feed_stories) == [990402, 990403]
+
+    hidden = feed.normalize_profile({"category_weights": {"AI & ML": 0}})
+    assert 990402 not in ranked_ids(hidden, feed_stories)
+
+
+def test_normalize_profile_rejects_bad_fields():
+    """Test malformed profile payloads are rejected."""
+    with pytest.raises(ValueError):
+        feed.normalize_profile({"category_weights": {"AI & ML": -1}})
+    with pytest.raises(ValueError):
+        feed.normalize_profile({"followed_authors": "dave"})
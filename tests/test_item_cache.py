@@ -0,0 +1,118 @@
+"""
+Tests for the raw item cache and replayed fetches
+"""
+import os
+import time
+import pytest
+from app.services.item_cache import ItemCache, freshness
+from app.services.sources import HackerNewsSource
+
+NOW = 1700000000
+ITEMS = {
+    990951: {"id": 990951, "title": "Cached story", "by": "dan", "time": NOW - 600, "score": 3, "type": "story"},
+    990952: {"id": 990952, "title": "Old story", "by": "dan", "time": NOW - 90 * 86400, "score": 80,
+             "type": "story"},
+}
+
+
+class FakeResponse:
+    def __init__(self, data):
+        self.status_code = 200
+        self._data = data
+
+    def json(self):
+        return self._data
+
+
+class CountingGet:
+    """Stands in for HackerNewsSource.get, answering from ITEMS and counting requests."""
+
+    def __init__(self):
+        self.urls = []
+
+    def __call__(self, url):
+        self.urls.append(url)
+        if url.endswith("newstories.json"):
+            return FakeResponse(list(ITEMS))
+        return FakeResponse(ITEMS.get(int(url.rsplit("/", 1)[1].split(".")[0])))
+
+
+def test_freshness_grows_with_age():
+    ttls = [(3600, 60), (86400, 600), (None, 86400)]
+    assert freshness({"time": NOW - 60}, NOW, ttls) == 60
+    assert freshness({"time": NOW - 7200}, NOW, ttls) == 600
+    assert freshness({"time": NOW - 30 * 86400}, NOW, ttls) == 86400
+    assert freshness({}, NOW, ttls) == 60
+
+
+def test_put_and_get(tmp_path):
+    cache = ItemCache(str(tmp_path))
+    item = dict(ITEMS[990951], time=int(time.time()) - 600)
+    cache.put(990951, item)
+    assert cache.get(990951) == item
+    assert cache.get(990953) is None
+    # Ten minutes old, so fresh for a minute; an hour on, the copy is stale
+    later = time.time() + 3600
+    assert cache.get(990951, now=later) is None
+    assert cache.get(990951, now=later, stale_ok=True) == item
+
+
+def test_unchanged_items_share_objects(tmp_path):
+    cache = ItemCache(str(tmp_path))
+    cache.put(990951, ITEMS[990951])
+    cache.put(990951, dict(ITEMS[990951]))
+    cache.put(990951, dict(ITEMS[990951], score=4))
+    cache.put(990951, dict(ITEMS[990951], score=4))
+    objects = [name for _, _, files in os.walk(tmp_path / "objects") for name in files]
+    assert len(objects) == 2
+    assert cache.get(990951)["score"] == 4
+
+
+def test_prune_drops_expired_items_and_orphaned_objects(tmp_path):
+    cache = ItemCache(str(tmp_path))
+    cache.put(990951, ITEMS[990951])
+    cache.put(990951, dict(ITEMS[990951], score=4))
+    cache.put(990952, ITEMS[990952])
+    later = time.time() + 7200
+    os.utime(cache._ref_path(990952), (later - 40 * 86400, later - 40 * 86400))
+    assert cache.prune(retention_days=30, now=later) == {"items": 1, "objects": 2}
+    assert cache.get(990951, stale_ok=True)["score"] == 4
+    assert cache.get(990952, stale_ok=True) is None
+
+
+def test_source_serves_fresh_items_from_cache(tmp_path, monkeypatch):
+    source = HackerNewsSource("test-hn", cache=ItemCache(str(tmp_path)), rate=0)
+    get = CountingGet()
+    monkeypatch.setattr(source, "get", get)
+    assert source.fetch_items([990951, 990952]) == [ITEMS[990951], ITEMS[990952]]
+    assert source.fetch_items([990951, 990952]) == [ITEMS[990951], ITEMS[990952]]
+    assert len(get.urls) == 2
+
+
+def test_source_without_reuse_still_records(tmp_path, monkeypatch):
+    cache = ItemCache(str(tmp_path))
+    source = HackerNewsSource("test-hn", cache=cache, reuse_cached=False, rate=0)
+    get = CountingGet()
+    monkeypatch.setattr(source, "get", get)
+    source.fetch_item(990951)
+    source.fetch_item(990951)
+    assert len(get.urls) == 2
+    assert cache.get(990951) == ITEMS[990951]
+
+
+def test_replay_makes_no_requests(tmp_path, monkeypatch):
+    cache = ItemCache(str(tmp_path))
+    live = HackerNewsSource("test-hn", cache=cache, rate=0)
+    monkeypatch.setattr(live, "get", CountingGet())
+    live.fetch_items(live.list_new_ids())
+
+    replay = HackerNewsSource("test-hn", cache=cache, replay=True, rate=0)
+
+    def offline(url):
+        pytest.fail(f"Replay requested {url}")
+
+    monkeypatch.setattr(replay, "get", offline)
+    # Served however stale, and missing items stay missing
+    monkeypatch.setattr(time, "time", lambda: NOW + 365 * 86400)
+    assert replay.list_new_ids() == list(ITEMS)
+    assert replay.fetch_items([990951, 990952, 990953]) == [ITEMS[990951], ITEMS[990952], None]
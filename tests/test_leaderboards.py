@@ -0,0 +1,99 @@
+"""
+Tests for the domain, author and hourly rollups
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from app import create_app
+from app.models.database import (
+    setup_db,
+    execute_and_commit,
+    execute_query,
+    upsert_stories,
+    rebuild_story_rollups,
+    get_domain_leaderboard,
+    get_author_leaderboard,
+    get_hourly_histogram
+)
+
+NOW = int(time.time())
+
+
+def story(story_id, url, by, score, descendants=0, posted=NOW):
+    return {"id": story_id, "title": f"zqxrollup {story_id}", "url": url, "by": by, "time": posted,
+            "score": score, "descendants": descendants, "type": "story", "category": "Programming",
+            "source": "hn"}
+
+
+def domain_row(domain):
+    rows = [row for row in get_domain_leaderboard(days=1, limit=200) if row[0] == domain]
+    return rows[0][1:] if rows else None
+
+
+@pytest.fixture
+def stories():
+    setup_db()
+    upsert_stories([
+        story(990901, "https://www.zqxrollup.example/a", "zqxauthor", 10, 4),
+        story(990902, "https://zqxrollup.example/b", "zqxauthor", 5),
+        story(990903, "https://zqxother.example/", "zqxsomeone", 1),
+    ])
+    yield
+    execute_and_commit("DELETE FROM hackernews WHERE id BETWEEN 990901 AND 990903")
+    rebuild_story_rollups()
+
+
+def test_rollups_follow_inserts_and_updates(stories):
+    assert domain_row("zqxrollup.example") == (2, 15, 4)
+    # A new score replaces the old one rather than adding to it
+    upsert_stories([story(990901, "https://www.zqxrollup.example/a", "zqxauthor", 30, 4)])
+    assert domain_row("zqxrollup.example") == (2, 35, 4)
+    # A changed link moves the story to its new domain, and emptied rows go away
+    upsert_stories([story(990903, "https://zqxrollup.example/c", "zqxsomeone", 1)])
+    assert domain_row("zqxrollup.example") == (3, 36, 4)
+    assert domain_row("zqxother.example") is None
+
+
+def test_concurrent_batches_all_land(stories):
+    # Batches from different ingest threads share the current hour's and the domain's rollup rows
+    batches = [[story(990904 + 4 * i + j, "https://zqxrollup.example/", "zqxauthor", 1) for j in range(4)]
+               for i in range(4)]
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        assert list(pool.map(upsert_stories, batches)) == [4, 4, 4, 4]
+    try:
+        assert domain_row("zqxrollup.example") == (18, 31, 4)
+    finally:
+        execute_and_commit("DELETE FROM hackernews WHERE id BETWEEN 990904 AND 990919")
+
+
+def test_rebuild_matches_incremental(stories):
+    before = execute_query("SELECT * FROM domain_daily ORDER BY ALL")
+    assert rebuild_story_rollups()
+    assert execute_query("SELECT * FROM domain_daily ORDER BY ALL") == before
+
+
+def test_author_leaderboard_sorts(stories):
+    rows = get_author_leaderboard(days=1, limit=200, sort="points")
+    authors = [row[0] for row in rows]
+    assert authors.index("zqxauthor") < authors.index("zqxsomeone")
+    with pytest.raises(ValueError):
+        get_author_leaderboard(sort="title")
+
+
+def test_hourly_histogram_includes_empty_hours(stories):
+    rows = get_hourly_histogram(hours=3)
+    assert len(rows) == 3
+    assert rows[-1][0] == NOW // 3600 * 3600
+    assert rows[-1][1] >= 3
+
+
+def test_leaderboard_endpoints(stories):
+    client = create_app({'TESTING': True}).test_client()
+    data = client.get('/stats/domains?days=1&limit=200').get_json()
+    assert data["sort"] == "stories"
+    assert {"domain": "zqxrollup.example", "stories": 2, "points": 15, "comments": 4} in data["domains"]
+    authors = client.get('/stats/authors?days=1&limit=200&sort=comments').get_json()["authors"]
+    assert authors[0]["comments"] >= 4
+    assert len(client.get('/stats/hourly?hours=5').get_json()) == 5
+    assert client.get('/stats/domains?sort=title').status_code == 400
+    assert client.get('/stats/hourly?hours=soon').status_code == 400
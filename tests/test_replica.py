@@ -0,0 +1,68 @@
+"""
+Tests for read replica publishing
+"""
+import os
+import pytest
+from app.models import database, replica
+from app.models.database import execute_query, execute_and_commit, upsert_stories, current_replica
+from app.models.replica import publish_replica
+
+
+def store(title):
+    upsert_stories([{"id": 990801, "title": title, "url": None, "by": "zed", "time": 1700000000,
+                     "score": 5, "category": "ReplicaTest"}])
+
+
+def read_title():
+    return execute_query("SELECT title FROM hackernews WHERE id = 990801")[0][0]
+
+
+@pytest.fixture
+def replica_dir(monkeypatch, tmp_path):
+    """Publish replicas to a temporary directory and read through them."""
+    monkeypatch.setattr(database, "REPLICA_DIR", str(tmp_path))
+    monkeypatch.setattr(replica, "REPLICA_DIR", str(tmp_path))
+    monkeypatch.setattr(database, "DB_READ_MODE", "replica")
+    monkeypatch.setattr(database, "_replica", (None, None))
+    yield tmp_path
+    execute_and_commit("DELETE FROM hackernews WHERE id = 990801")
+
+
+def test_reads_fall_back_to_primary_without_replica(replica_dir):
+    store("zqxreplica first")
+    assert current_replica() is None
+    assert read_title() == "zqxreplica first"
+
+
+def test_reads_see_published_replica_until_next_publish(replica_dir):
+    store("zqxreplica first")
+    path = publish_replica()
+    assert path and os.path.exists(path)
+    assert current_replica() == path
+
+    store("zqxreplica second")
+    assert read_title() == "zqxreplica first"
+
+    assert publish_replica() != path
+    assert read_title() == "zqxreplica second"
+
+
+def test_publish_keeps_newest_replicas(replica_dir):
+    store("zqxreplica first")
+    paths = [publish_replica() for _ in range(replica.REPLICA_KEEP + 2)]
+    kept = sorted(name for name in os.listdir(replica_dir) if name.endswith(".duckdb"))
+    assert kept == sorted(os.path.basename(p) for p in paths[-replica.REPLICA_KEEP:])
+    assert not [name for name in os.listdir(replica_dir) if name.endswith(".tmp")]
+
+
+def test_replica_workers_leave_setup_to_the_writer(monkeypatch):
+    import app
+    calls = []
+    monkeypatch.setattr(app, "setup_db", lambda: calls.append("setup_db"))
+    monkeypatch.setattr(app, "ensure_test_data", lambda: calls.append("ensure_test_data"))
+    monkeypatch.setattr(app, "DB_READ_MODE", "replica")
+    app.create_app({'TESTING': True})
+    assert calls == []
+    monkeypatch.setattr(app, "DB_READ_MODE", "direct")
+    app.create_app({'TESTING': True})
+    assert calls == ["setup_db", "ensure_test_data"]
@@ -0,0 +1,130 @@
+"""
+Tests for news source adapters and the ingestion engine
+"""
+import threading
+import numpy as np
+import pytest
+from app.models.database import setup_db, execute_query, execute_and_commit
+from app.services import vectors
+from app.services.ingest import ingest_source
+from app.services.sources import HackerNewsSource, RssSource, parse_feed
+
+RSS = b"""<?xml version="1.0"?>
+<rss version="2.0" xmlns:dc="http://purl.org/dc/elements/1.1/">
+  <channel>
+    <item>
+      <title>Writing a tiny database</title>
+      <link>https://example.com/tiny-db</link>
+      <guid>https://example.com/tiny-db</guid>
+      <dc:creator>alice</dc:creator>
+      <pubDate>Mon, 06 Jan 2025 10:00:00 +0000</pubDate>
+    </item>
+  </channel>
+</rss>"""
+
+ATOM = b"""<?xml version="1.0" encoding="utf-8"?>
+<feed xmlns="http://www.w3.org/2005/Atom">
+  <entry>
+    <title>Notes on garden design</title>
+    <link rel="alternate" href="https://example.org/garden"/>
+    <id>tag:example.org,2025:garden</id>
+    <author><name>bob</name></author>
+    <updated>2025-01-06T10:00:00Z</updated>
+  </entry>
+</feed>"""
+
+
+def test_parse_rss():
+    """Test RSS 2.0 items are mapped to entries."""
+    [entry] = parse_feed(RSS)
+    assert entry == {
+        "guid": "https://example.com/tiny-db",
+        "title": "Writing a tiny database",
+        "url": "https://example.com/tiny-db",
+        "by": "alice",
+        "time": 1736157600,
+    }
+
+
+def test_parse_atom():
+    """Test Atom entries are mapped to entries."""
+    [entry] = parse_feed(ATOM)
+    assert entry["guid"] == "tag:example.org,2025:garden"
+    assert entry["url"] == "https://example.org/garden"
+    assert entry["by"] == "bob"
+    assert entry["time"] == 1736157600
+
+
+class FakeResponse:
+    def __init__(self, content):
+        self.status_code = 200
+        self.content = content
+
+
+class FakeHackerNews(HackerNewsSource):
+    """HN source serving fixed items instead of calling the API."""
+
+    ITEMS = {
+        990201: {"id": 990201, "title": "Show HN: A tiny database", "by": "carol", "time": 1, "score": 5,
+                 "type": "story"},
+        990202: {"id": 990202, "deleted": True},
+    }
+
+    def list_new_ids(self):
+        return list(self.ITEMS)
+
+    def fetch_item(self, item_id):
+        return self.ITEMS.get(item_id)
+
+
+@pytest.fixture
+def clean_sources(monkeypatch, tmp_path):
+    """Remove stories written by these tests, and keep their embeddings in a throwaway index."""
+    setup_db()
+    monkeypatch.setattr(vectors, "_index", vectors.VectorIndex(str(tmp_path)))
+    monkeypatch.setattr(vectors, "encode_texts", lambda texts: np.ones((len(texts), 4)) / 2)
+    # Embeddings are indexed by the test itself rather than by a background worker
+    monkeypatch.setattr(vectors, "_queued", {})
+    monkeypatch.setattr(vectors, "_queue_event", threading.Event())
+    monkeypatch.setattr(vectors, "start_index_worker", lambda: None)
+    yield
+    execute_and_commit("DELETE FROM hackernews WHERE id = 990201 OR source = 'test-rss'")
+    execute_and_commit("DELETE FROM source_items WHERE source = 'test-rss'")
+
+
+def test_ingest_hacker_news(clean_sources):
+    """Test HN items are classified and stored, skipping deleted ones."""
+    assert ingest_source(FakeHackerNews("test-hn", rate=0)) == 1
+    rows = execute_query("SELECT title, category, source FROM hackernews WHERE id = 990201")
+    assert rows == [("Show HN: A tiny database", "Show HN", "hn")]
+    assert vectors.index_queued_stories() == 1
+    assert vectors._index.snapshot().row_of(990201) == 0
+
+
+def test_ingest_rss_assigns_stable_ids(clean_sources, monkeypatch):
+    """Test feed entries get negative story IDs that stay the same across runs."""
+    source = RssSource("test-rss", "https://example.com/feed", rate=0)
+    monkeypatch.setattr(source, "get", lambda url: FakeResponse(RSS))
+
+    assert ingest_source(source) == 1
+    first = execute_query("SELECT id FROM hackernews WHERE source = 'test-rss'")
+    assert ingest_source(source) == 1
+    second = execute_query("SELECT id FROM hackernews WHERE source = 'test-rss'")
+    assert len(first) == 1 and first == second
+    assert first[0][0] < 0
+
+
+def test_sync_skips_while_hn_new_is_running(clean_sources, monkeypatch):
+    """Test an on-demand sync doesn't overlap the scheduled "hn-new" ingest."""
+    from app import create_app
+    from app.services import ingest
+    monkeypatch.setattr(ingest, "get_sources", lambda: {"hn-new": FakeHackerNews("hn-new", rate=0)})
+    monkeypatch.setattr(ingest, "_running", {"hn-new"})
+    assert ingest.sync_news(10) is None
+    assert execute_query("SELECT COUNT(*) FROM hackernews WHERE id = 990201") == [(0,)]
+    client = create_app({'TESTING': True}).test_client()
+    assert client.get('/update?limit=10').status_code == 409
+
+    monkeypatch.setattr(ingest, "_running", set())
+    assert ingest.sync_news(10) == 1
+    assert ingest._running == set()
@@ -0,0 +1,109 @@
+"""
+Tests for the semantic story index
+"""
+import multiprocessing
+import os
+import threading
+import numpy as np
+import pytest
+from app.models.database import setup_db, execute_and_commit, upsert_stories
+from app.services import vectors
+
+
+def random_embeddings(count, dim=16, seed=0):
+    embeddings = np.random.default_rng(seed).normal(size=(count, dim)).astype(np.float32)
+    return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+
+def test_exact_search_and_incremental_add(tmp_path):
+    """Test small indexes are searched exactly and stories are only added once."""
+    index = vectors.VectorIndex(str(tmp_path))
+    embeddings = random_embeddings(50)
+    assert index.add(list(range(1, 51)), embeddings) == 50
+    assert index.add([1, 2, 51], random_embeddings(3, seed=1)) == 1
+
+    snapshot = index.snapshot()
+    assert snapshot.rows == 51 and snapshot.centroids is None
+    [(story_id, similarity)] = snapshot.search(embeddings[9], 1)
+    assert story_id == 10 and similarity > 0.99
+    assert snapshot.search(embeddings[9], 3, exclude=10)[0][0] != 10
+
+
+def _add_batches(directory, first_id):
+    index = vectors.VectorIndex(directory)
+    for start in range(first_id, first_id + 200, 20):
+        index.add(list(range(start, start + 20)), random_embeddings(20, seed=start))
+
+
+def test_writers_in_different_processes_take_turns(tmp_path):
+    """Test concurrent appends from several processes keep IDs and vectors in step."""
+    context = multiprocessing.get_context("fork")
+    writers = [context.Process(target=_add_batches, args=(str(tmp_path), first)) for first in (1, 1001, 2001)]
+    for writer in writers:
+        writer.start()
+    for writer in writers:
+        writer.join()
+    snapshot = vectors.VectorIndex(str(tmp_path)).snapshot()
+    assert snapshot.rows == 600 and os.path.getsize(tmp_path / vectors.VECTORS_FILE) == 600 * 16
+    row = snapshot.row_of(1005)
+    assert np.array_equal(snapshot.vectors[row], vectors.quantize(random_embeddings(20, seed=1001)[4]))
+
+
+def test_ivf_search_finds_nearest(tmp_path):
+    """Test the inverted-file index is trained past the threshold and still finds the nearest story."""
+    index = vectors.VectorIndex(str(tmp_path), ivf_min_rows=500)
+    embeddings = random_embeddings(800)
+    index.add(list(range(400)), embeddings[:400])
+    assert index.snapshot().centroids is None
+    index.add(list(range(400, 800)), embeddings[400:])
+
+    snapshot = index.snapshot()
+    assert snapshot.centroids is not None and snapshot.listed == 800
+    hits = [snapshot.search(embeddings[i], 1, probes=len(snapshot.centroids))[0][0] for i in range(0, 800, 40)]
+    assert hits == list(range(0, 800, 40))
+
+
+@pytest.fixture
+def semantic_index(monkeypatch, tmp_path):
+    """Index stories in a throwaway directory, encoding titles by the topics they mention."""
+    topics = ["database", "rust", "garden", "bread"]
+
+    def encode(texts):
+        embeddings = np.array([[1.0 if t in text.lower() else 0.0 for t in topics] + [0.1] for text in texts])
+        return embeddings / np.linalg.norm(embeddings, axis=1, keepdims=True)
+
+    monkeypatch.setattr(vectors, "_index", vectors.VectorIndex(str(tmp_path)))
+    monkeypatch.setattr(vectors, "encode_texts", encode)
+    setup_db()
+    stories = [
+        {"id": 990301, "title": "A database written in Rust", "time": 1},
+        {"id": 990302, "title": "Why my Rust database is slow", "time": 2},
+        {"id": 990303, "title": "Planning a vegetable garden", "time": 3},
+    ]
+    for story in stories:
+        upsert_stories([dict(story, category="Programming")])
+    vectors.index_stories(stories)
+    yield
+    execute_and_commit("DELETE FROM hackernews WHERE id BETWEEN 990301 AND 990303")
+
+
+def test_related_and_semantic_search(semantic_index):
+    """Test related stories and semantic search rank by title meaning."""
+    assert vectors.related_stories(990301, 1)[0][0] == 990302
+    assert vectors.semantic_search("gardening: which garden plants?", 1)[0][0] == 990303
+    assert vectors.related_stories(990399) is None
+
+    columns = vectors.load_matches(vectors.related_stories(990301, 2), limit=2, fetch="numpy")
+    assert list(columns["id"]) == [990302, 990303]
+
+
+def test_queued_stories_are_indexed_by_the_worker(semantic_index, monkeypatch):
+    """Test ingest only queues titles, and draining the queue indexes them."""
+    monkeypatch.setattr(vectors, "_queued", {})
+    # Keep a worker started by an earlier test from draining the queue first
+    monkeypatch.setattr(vectors, "_queue_event", threading.Event())
+    monkeypatch.setattr(vectors, "start_index_worker", lambda: None)
+    vectors.queue_stories([{"id": 990304, "title": "Baking bread"}, {"id": 990305, "title": None}])
+    assert vectors._index.snapshot().row_of(990304) is None
+    assert vectors.index_queued_stories() == 1
+    assert vectors._index.snapshot().row_of(990304) is not None